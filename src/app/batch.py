@@ -0,0 +1,147 @@
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, NamedTuple, Optional
+
+
+class QueueFile:
+    """
+    Файл каталога-очереди, темы которого обрабатываются.
+
+    Файл переименовывается в *.jsonl.done, только когда обработаны все его темы,
+    поэтому после падения программы необработанные файлы читаются снова.
+    """
+
+    def __init__(self, path: str, count: int):
+        self.path = path
+        self.left = count
+        self._lock = threading.Lock()
+        if not count:
+            self._finish()
+
+    def task_done(self) -> None:
+        """Отмечает, что одна тема файла обработана (успешно или с ошибкой)."""
+        with self._lock:
+            self.left -= 1
+            if self.left == 0:
+                self._finish()
+
+    def _finish(self) -> None:
+        os.replace(self.path, self.path + ".done")
+
+
+class Topic(NamedTuple):
+    """
+    Тема поста из входного источника.
+
+    Атрибуты:
+        text (str): Тема.
+        file (Optional[QueueFile]): Файл каталога-очереди, из которого прочитана тема.
+    """
+    text: str
+    file: Optional[QueueFile] = None
+
+
+def _parse_topic(line: str) -> str:
+    """
+    Извлекает тему из строки входного файла.
+
+    Строка может быть обычным текстом или JSON-объектом вида {"topic": "..."}.
+    """
+    line = line.strip()
+    if line.startswith("{"):
+        return str(json.loads(line).get("topic", "")).strip()
+    return line
+
+
+def read_topics(source: str) -> Iterator[Topic]:
+    """
+    Читает темы постов из файла, стандартного ввода или каталога-очереди.
+
+    Параметры:
+        source (str): Путь к файлу (одна тема или JSON-объект на строку),
+            "-" для чтения из стандартного ввода, либо путь к каталогу-очереди.
+            В каталоге читаются все файлы *.jsonl; после обработки всех тем файла
+            (Topic.file, run_batch) он переименовывается в *.jsonl.done, чтобы не
+            обработать его повторно.
+
+    Возвращает:
+        Iterator[Topic]: Непустые темы в порядке следования.
+    """
+    if source == "-":
+        for line in sys.stdin:
+            topic = _parse_topic(line)
+            if topic:
+                yield Topic(topic)
+        return
+
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if not name.endswith(".jsonl"):
+                continue
+            path = os.path.join(source, name)
+            with open(path, encoding="utf-8") as file:
+                topics = [topic for topic in (_parse_topic(line) for line in file) if topic]
+            queue_file = QueueFile(path, len(topics))
+            yield from (Topic(topic, queue_file) for topic in topics)
+        return
+
+    with open(source, encoding="utf-8") as file:
+        for line in file:
+            topic = _parse_topic(line)
+            if topic:
+                yield Topic(topic)
+
+
+def run_batch(
+        topics: Iterator[Topic],
+        process: Callable[[str], dict[str, Any]],
+        manifest_path: str,
+        workers: int = 4
+) -> list[dict[str, Any]]:
+    """
+    Обрабатывает множество тем параллельно и записывает манифест с результатами.
+
+    Параметры:
+        topics (Iterator[Topic]): Темы постов (read_topics).
+        process (callable): Функция, которая создаёт и публикует пост по теме
+            и возвращает словарь с описанием результата.
+        manifest_path (str): Путь к файлу манифеста в формате JSONL,
+            куда по мере готовности дописывается запись по каждой теме.
+        workers (int): Сколько тем обрабатывается одновременно.
+
+    Возвращает:
+        list[dict[str, Any]]: Записи манифеста в порядке завершения обработки.
+
+    Особенности:
+        - Ошибка при обработке одной темы не останавливает остальные:
+          она попадает в манифест с полем "ok": false.
+        - Файл каталога-очереди отмечается обработанным после записи в манифест
+          последней из его тем.
+    """
+    records = []
+    lock = threading.Lock()
+
+    def handle(topic: Topic) -> None:
+        started = time.perf_counter()
+        try:
+            record = {"topic": topic.text, "ok": True, **process(topic.text)}
+        except Exception as err:
+            traceback.print_exc()
+            record = {"topic": topic.text, "ok": False, "error": f"{type(err).__name__}: {err}"}
+        record["seconds"] = round(time.perf_counter() - started, 3)
+        with lock:
+            records.append(record)
+            with open(manifest_path, "a", encoding="utf-8") as manifest:
+                manifest.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if topic.file is not None:
+            topic.file.task_done()
+        print(f"Topic {topic.text} done: ok={record['ok']} in {record['seconds']}s")
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        list(executor.map(handle, topics))
+    return records
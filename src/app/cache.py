@@ -0,0 +1,164 @@
+import functools
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Callable, Optional
+
+from .settings import CacheSettings
+
+_MISSING = object()
+
+
+class DiskCache:
+    """
+    Постоянный кеш на диске поверх SQLite.
+
+    Значения сериализуются через pickle и сжимаются zlib. У каждой записи есть
+    пространство имён (например, "serp", "article", "wiki"), ключ и время жизни.
+    Если суммарный размер записей превышает max_bytes, удаляются записи,
+    к которым дольше всего не обращались (LRU).
+
+    Атрибуты:
+        hits (dict[str, int]): Количество попаданий в кеш по пространствам имён.
+        misses (dict[str, int]): Количество промахов по пространствам имён.
+
+    Пример использования:
+        cache = DiskCache("cache.sqlite3", max_bytes=100 * 1024 * 1024)
+        cache.set("wiki", "Москва", text, ttl=3600)
+        text = cache.get("wiki", "Москва")
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits: dict[str, int] = {}
+        self.misses: dict[str, int] = {}
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        """
+        Возвращает значение из кеша или `default`, если записи нет или она устарела.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    self._connection.execute(
+                        "DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+                    )
+                self.misses[namespace] = self.misses.get(namespace, 0) + 1
+                return default
+            self._connection.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, namespace, key)
+            )
+            self.hits[namespace] = self.hits.get(namespace, 0) + 1
+        return pickle.loads(zlib.decompress(row[0]))
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        """
+        Сохраняет значение в кеш на `ttl` секунд и при необходимости вытесняет старые записи.
+        """
+        blob = zlib.compress(pickle.dumps(value))
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, size, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, blob, len(blob), now + ttl, now)
+            )
+            self._evict(now)
+
+    def delete(self, namespace: str, key: str) -> None:
+        """Удаляет запись из кеша."""
+        with self._lock:
+            self._connection.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Возвращает количество попаданий и промахов по пространствам имён."""
+        with self._lock:
+            return {
+                namespace: {"hits": self.hits.get(namespace, 0), "misses": self.misses.get(namespace, 0)}
+                for namespace in sorted(set(self.hits) | set(self.misses))
+            }
+
+    def _evict(self, now: float) -> None:
+        self._connection.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._connection.execute("SELECT namespace, key, size FROM cache ORDER BY accessed_at")
+        to_delete = []
+        for namespace, key, size in rows:
+            if total <= self.max_bytes:
+                break
+            to_delete.append((namespace, key))
+            total -= size
+        self._connection.executemany("DELETE FROM cache WHERE namespace = ? AND key = ?", to_delete)
+
+
+@functools.cache
+def get_cache() -> Optional[DiskCache]:
+    """
+    Возвращает общий для процесса дисковый кеш, либо None, если кеш отключён настройками.
+    """
+    settings = CacheSettings()
+    if not settings.cache_enabled:
+        return None
+    return DiskCache(settings.cache_path, settings.cache_max_mb * 1024 * 1024)
+
+
+def disk_cached(namespace: str, ttl: Callable[[], float], key: Callable[..., str] = str) -> Callable:
+    """
+    Декоратор, кеширующий результат функции в общем дисковом кеше.
+
+    Параметры:
+        namespace (str): Пространство имён записей.
+        ttl (callable): Функция, возвращающая время жизни записи в секундах
+            (вычисляется при каждом сохранении, чтобы учитывать настройки).
+        key (callable): Функция, строящая ключ кеша из аргументов декорируемой функции.
+
+    Особенности:
+        - Пустые результаты ("" , [], None) не кешируются, чтобы неудачные
+          попытки не закреплялись в кеше.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            if cache is None:
+                return func(*args, **kwargs)
+            cache_key = key(*args, **kwargs)
+            value = cache.get(namespace, cache_key, _MISSING)
+            if value is not _MISSING:
+                return value
+            value = func(*args, **kwargs)
+            if value:
+                cache.set(namespace, cache_key, value, ttl())
+            return value
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,137 @@
+import math
+import re
+from collections import Counter
+from typing import NamedTuple
+
+WORD_RE = re.compile(r"\w+")
+HEADING_RE = re.compile(r"^=+.*=+$")
+SENTENCE_END_RE = re.compile(r"[.!?…](?=\s|$)")
+
+# Слова сравниваются по первым буквам, чтобы формы одного слова ("статья", "статьи") совпадали
+STEM_LENGTH = 6
+
+
+class CompressionReport(NamedTuple):
+    """
+    Отчёт о сжатии контекста.
+
+    Атрибуты:
+        original_chars (int): Длина исходного текста.
+        compressed_chars (int): Длина сжатого текста.
+        passages_total (int): Количество абзацев в исходном тексте.
+        passages_kept (int): Количество абзацев, оставленных в сжатом тексте.
+    """
+    original_chars: int
+    compressed_chars: int
+    passages_total: int
+    passages_kept: int
+
+    @property
+    def ratio(self) -> float:
+        """Доля исходного текста, оставшаяся после сжатия."""
+        return self.compressed_chars / self.original_chars if self.original_chars else 1.0
+
+
+def tokenize(text: str) -> list[str]:
+    """Разбивает текст на слова в нижнем регистре, обрезанные до STEM_LENGTH букв."""
+    return [word[:STEM_LENGTH] for word in WORD_RE.findall(text.lower())]
+
+
+def split_passages(text: str) -> list[str]:
+    """Разбивает текст на абзацы, пропуская пустые строки и заголовки разделов Википедии."""
+    return [
+        line.strip() for line in text.splitlines()
+        if line.strip() and not HEADING_RE.match(line.strip())
+    ]
+
+
+def bm25_scores(passages: list[str], query: str, k1: float = 1.5, b: float = 0.75) -> list[float]:
+    """
+    Оценивает релевантность абзацев запросу по формуле BM25.
+
+    Параметры:
+        passages (list[str]): Абзацы текста.
+        query (str): Запрос (тема поста).
+        k1 (float): Насыщение частоты слова.
+        b (float): Влияние длины абзаца.
+
+    Возвращает:
+        list[float]: Оценки абзацев в том же порядке.
+    """
+    documents = [Counter(tokenize(passage)) for passage in passages]
+    lengths = [sum(document.values()) for document in documents]
+    average_length = sum(lengths) / len(lengths) if lengths else 0
+    terms = set(tokenize(query))
+    count = len(documents)
+    idf = {}
+    for term in terms:
+        frequency = sum(1 for document in documents if term in document)
+        idf[term] = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+
+    scores = []
+    for document, length in zip(documents, lengths):
+        norm = k1 * (1 - b + b * length / average_length) if average_length else k1
+        scores.append(sum(
+            idf[term] * document[term] * (k1 + 1) / (document[term] + norm)
+            for term in terms if term in document
+        ))
+    return scores
+
+
+def truncate_passage(passage: str, max_chars: int) -> str:
+    """
+    Обрезает абзац до max_chars символов по концу предложения, а если в бюджет
+    не помещается ни одно предложение — по границе слова.
+    """
+    if len(passage) <= max_chars:
+        return passage
+    head = passage[:max_chars]
+    sentence_ends = [match.end() for match in SENTENCE_END_RE.finditer(head)]
+    if sentence_ends:
+        return head[:sentence_ends[-1]]
+    # Граница слова: пробел внутри бюджета или конец слова ровно на границе бюджета
+    if not passage[max_chars].isspace() and " " in head:
+        head = head.rsplit(" ", 1)[0]
+    return head.rstrip()
+
+
+def compress_context(text: str, query: str, max_chars: int) -> tuple[str, CompressionReport]:
+    """
+    Оставляет в тексте только самые релевантные теме абзацы, укладывающиеся в бюджет.
+
+    Логика работы:
+    1. Разбивает текст на абзацы.
+    2. Оценивает каждый абзац относительно запроса по BM25.
+    3. Набирает абзацы в порядке убывания оценки, пропуская те, что не помещаются в бюджет.
+    4. Возвращает выбранные абзацы в исходном порядке, чтобы сохранить связность текста.
+       Если в бюджет не помещается ни один абзац, возвращает самый релевантный абзац,
+       обрезанный по концу предложения или слова (truncate_passage).
+
+    Параметры:
+        text (str): Исходная статья.
+        query (str): Тема поста.
+        max_chars (int): Максимальная длина результата в символах. 0 отключает сжатие.
+
+    Возвращает:
+        tuple[str, CompressionReport]: Сжатый текст и отчёт о сжатии.
+    """
+    passages = split_passages(text)
+    if not max_chars or len(text) <= max_chars:
+        return text, CompressionReport(len(text), len(text), len(passages), len(passages))
+
+    scores = bm25_scores(passages, query)
+    ranked = sorted(range(len(passages)), key=lambda i: (-scores[i], i))
+    kept = []
+    length = 0
+    for i in ranked:
+        extra = len(passages[i]) + (1 if kept else 0)  # +1 для учёта разделителя '\n'
+        if length + extra <= max_chars:
+            kept.append(i)
+            length += extra
+
+    if not kept and ranked:
+        compressed = truncate_passage(passages[ranked[0]], max_chars)
+        return compressed, CompressionReport(len(text), len(compressed), len(passages), 1)
+
+    compressed = "\n".join(passages[i] for i in sorted(kept))
+    return compressed, CompressionReport(len(text), len(compressed), len(passages), len(kept))
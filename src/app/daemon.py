@@ -0,0 +1,213 @@
+import collections
+import datetime
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, NamedTuple, Optional
+
+from . import metrics
+from .schedule import ScheduleEntry
+
+
+class Job(NamedTuple):
+    """
+    Задание на создание и публикацию поста.
+
+    Атрибуты:
+        id (str): Идентификатор задания.
+        topic (str): Тема поста.
+        channels (Optional[list[str]]): Каналы для публикации; None — каналы по умолчанию.
+        source (str): Откуда пришло задание: имя записи расписания или "api".
+    """
+    id: str
+    topic: str
+    channels: Optional[list[str]] = None
+    source: str = "api"
+
+
+class Daemon:
+    """
+    Постоянно работающий сервис публикации постов.
+
+    Логика работы:
+    1. Раз в минуту проверяет расписание и ставит в очередь следующую тему каждой
+       сработавшей записи (темы записи публикуются по кругу).
+    2. Выполняет задания в пуле из `workers` потоков, поэтому одновременно создаётся
+       не больше `workers` постов, а остальные ждут в очереди.
+    3. Принимает задания и отдаёт статус через локальный HTTP API (serve).
+
+    Браузеры, HTTP-сессии и клиент GigaChat живут в процессе между заданиями,
+    поэтому каждое задание тратит время только на собственную работу.
+
+    Параметры:
+        process (callable): Выполняет задание и возвращает результат, сохраняемый в истории.
+        entries (list[ScheduleEntry]): Записи расписания.
+        workers (int): Сколько заданий выполняется одновременно.
+        history (int): Сколько последних заданий хранится для статуса.
+    """
+
+    def __init__(
+            self,
+            process: Callable[[Job], Any],
+            entries: list[ScheduleEntry],
+            workers: int = 2,
+            history: int = 100
+    ):
+        self.process = process
+        self.entries = entries
+        self.started_at = time.time()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="job")
+        self._positions = {entry.name: 0 for entry in entries}
+        self._records: collections.OrderedDict[str, dict] = collections.OrderedDict()
+        self._history = history
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def enqueue(self, topic: str, channels: Optional[list[str]] = None, source: str = "api") -> Job:
+        """Ставит задание в очередь и возвращает его."""
+        job = Job(id=uuid.uuid4().hex[:12], topic=topic, channels=channels, source=source)
+        with self._lock:
+            self._records[job.id] = {**job._asdict(), "state": "queued", "enqueued_at": time.time()}
+            while len(self._records) > self._history:
+                oldest = next(iter(self._records))
+                if self._records[oldest]["state"] in ("queued", "running"):
+                    break
+                self._records.popitem(last=False)
+        metrics.inc("daemon_jobs_total", source=source)
+        self._executor.submit(self._run, job)
+        print(f"Job {job.id} enqueued: {topic} ({source})")
+        return job
+
+    def status(self) -> dict:
+        """Возвращает состояние сервиса: счётчики заданий, ближайшие срабатывания и историю."""
+        now = datetime.datetime.now()
+        with self._lock:
+            records = list(self._records.values())
+        states = collections.Counter(record["state"] for record in records)
+        return {
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "jobs": dict(states),
+            "schedule": [
+                {
+                    "name": entry.name,
+                    "cron": entry.cron.expression,
+                    "next_topic": entry.topics[self._positions[entry.name] % len(entry.topics)],
+                    "next_run": (entry.cron.next_after(now) or now).isoformat(timespec="minutes"),
+                }
+                for entry in self.entries
+            ],
+            "recent": records[-20:],
+        }
+
+    def tick(self, moment: datetime.datetime) -> list[Job]:
+        """Ставит в очередь задания всех записей расписания, срабатывающих в минуту `moment`."""
+        jobs = []
+        for entry in self.entries:
+            if not entry.cron.matches(moment):
+                continue
+            with self._lock:
+                position = self._positions[entry.name]
+                self._positions[entry.name] = position + 1
+            jobs.append(self.enqueue(entry.topics[position % len(entry.topics)], entry.channels, entry.name))
+        return jobs
+
+    def run_scheduler(self) -> None:
+        """Проверяет расписание в начале каждой минуты, пока сервис не остановлен."""
+        moment = datetime.datetime.now().replace(second=0, microsecond=0)
+        while not self._stop.is_set():
+            moment += datetime.timedelta(minutes=1)
+            if self._stop.wait(max(0.0, (moment - datetime.datetime.now()).total_seconds())):
+                return
+            self.tick(moment)
+
+    def serve(self, host: str = "127.0.0.1", port: int = 8080) -> None:
+        """
+        Запускает планировщик и локальный HTTP API и блокируется до вызова stop.
+        После остановки дожидается выполняющихся заданий, а ожидающие в очереди отменяет.
+
+        API:
+            POST /enqueue  {"topic": "...", "channels": ["@a"]}  — поставить тему в очередь;
+            GET  /status                                        — состояние сервиса и история заданий;
+            GET  /metrics                                       — метрики в формате Prometheus.
+        """
+        threading.Thread(target=self.run_scheduler, name="scheduler", daemon=True).start()
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        print(f"Daemon listening on http://{host}:{port}")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def stop(self) -> None:
+        """Останавливает планировщик и API. Можно вызывать из обработчика сигнала."""
+        self._stop.set()
+        if self._server is not None:
+            # shutdown ждёт выхода из serve_forever, поэтому вызывается из отдельного потока
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+    def _run(self, job: Job) -> None:
+        self._update(job.id, state="running", started_at=time.time())
+        started = time.perf_counter()
+        try:
+            with metrics.span("daemon_job", source=job.source):
+                result = self.process(job)
+        except Exception as err:
+            print(f'Exception in job {job.id} ({job.topic}) \n {err}')
+            self._update(job.id, state="failed", error=f"{type(err).__name__}: {err}")
+        else:
+            self._update(job.id, state="done", result=result)
+        self._update(job.id, seconds=round(time.perf_counter() - started, 3))
+
+    def _update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            if job_id in self._records:
+                self._records[job_id].update(fields)
+
+
+def _make_handler(daemon: Daemon):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path == "/status":
+                self._json(200, daemon.status())
+            elif self.path == "/metrics":
+                self._send(200, metrics.render().encode("utf-8"), "text/plain; version=0.0.4")
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/enqueue":
+                self._json(404, {"error": "not found"})
+                return
+            try:
+                data = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                topic = str(data["topic"]).strip()
+                channels = data.get("channels")
+                if not topic or (channels is not None and not isinstance(channels, list)):
+                    raise ValueError("topic must be a non-empty string and channels a list")
+            except (ValueError, KeyError, TypeError) as err:
+                self._json(400, {"error": str(err)})
+                return
+            job = daemon.enqueue(topic, channels)
+            self._json(202, job._asdict())
+
+        def log_message(self, format, *args):
+            pass
+
+        def _json(self, status: int, data: Any):
+            self._send(status, json.dumps(data, ensure_ascii=False, default=str).encode("utf-8"), "application/json")
+
+        def _send(self, status: int, body: bytes, content_type: str):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
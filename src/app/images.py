@@ -0,0 +1,204 @@
+import contextlib
+import fcntl
+import functools
+import io
+import json
+import os
+import threading
+import time
+from typing import Iterator
+
+from PIL import Image, UnidentifiedImageError
+
+from .settings import ImageSettings
+
+ALLOWED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF", "BMP"}
+
+# Ограничения Telegram для фотографий: сумма сторон и соотношение сторон
+TELEGRAM_MAX_SIDES_SUM = 10000
+TELEGRAM_MAX_RATIO = 20
+
+
+class ImageRejected(ValueError):
+    """Изображение не подходит для публикации."""
+
+
+def dhash(image: Image.Image) -> int:
+    """
+    Вычисляет 64-битный разностный перцептивный хеш изображения.
+
+    Изображение уменьшается до 9x8 в оттенках серого, и каждый бит хеша
+    показывает, светлее ли пиксель своего правого соседа. Похожие изображения
+    (в том числе в разном размере и качестве) дают близкие хеши.
+    """
+    pixels = list(image.convert("L").resize((9, 8), Image.BILINEAR).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+def prepare_image(data: bytes, settings: ImageSettings) -> tuple[bytes, int]:
+    """
+    Проверяет, уменьшает и пережимает изображение для отправки в Telegram.
+
+    Логика работы:
+    1. Проверяет, что данные являются изображением допустимого формата, и декодирует его один раз.
+    2. Отклоняет миниатюры и изображения с недопустимым для Telegram соотношением сторон.
+    3. Уменьшает изображение так, чтобы большая сторона не превышала image_max_side.
+    4. Сжимает в image_format, снижая качество, пока файл не уложится в image_max_bytes.
+
+    Параметры:
+        data (bytes): Исходные байты изображения.
+        settings (ImageSettings): Настройки обработки.
+
+    Возвращает:
+        tuple[bytes, int]: Готовые байты изображения и его перцептивный хеш.
+
+    Исключения:
+        ImageRejected: Если данные не являются подходящим изображением.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        image_format = image.format
+        image.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as err:
+        raise ImageRejected(f"Not an image: {err}")
+    if image_format not in ALLOWED_FORMATS:
+        raise ImageRejected(f"Unsupported image format {image_format}")
+
+    width, height = image.size
+    if min(width, height) < settings.image_min_side:
+        raise ImageRejected(f"Image is too small: {width}x{height}")
+    if max(width, height) / min(width, height) > TELEGRAM_MAX_RATIO:
+        raise ImageRejected(f"Image aspect ratio is too large: {width}x{height}")
+
+    image = image.convert("RGB")
+    max_side = min(settings.image_max_side, TELEGRAM_MAX_SIDES_SUM // 2)
+    if max(width, height) > max_side:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    quality = settings.image_quality
+    while True:
+        buffer = io.BytesIO()
+        image.save(buffer, format=settings.image_format, quality=quality, optimize=True)
+        if buffer.tell() <= settings.image_max_bytes or quality <= 30:
+            break
+        quality -= 10
+    if buffer.tell() > settings.image_max_bytes:
+        raise ImageRejected(f"Image does not fit into {settings.image_max_bytes} bytes")
+    return buffer.getvalue(), dhash(image)
+
+
+def picture_hash(picture: bytes) -> int:
+    """Вычисляет перцептивный хеш готового изображения в байтах."""
+    return dhash(Image.open(io.BytesIO(picture)))
+
+
+class PerceptualIndex:
+    """
+    Индекс перцептивных хешей недавно опубликованных изображений.
+
+    Хранится в JSON-файле и помнит последние `size` изображений, чтобы
+    повторно не публиковать одну и ту же картинку.
+
+    Особенности:
+        - Найденное изображение резервируется (reserve) под той же блокировкой, под которой
+          проверяется на повтор, поэтому одновременные посты не выберут одну картинку.
+        - В индекс изображение попадает только после публикации (add); резерв снимается
+          при неудачной публикации (release) или истекает через reservation_seconds.
+        - Резервы хранятся в том же файле, а каждая операция выполняется под файловой
+          блокировкой, поэтому индекс общий для основного процесса и рабочих процессов
+          поиска (yandex.workers): резерв, сделанный в рабочем процессе, виден и снимается
+          в основном.
+    """
+
+    def __init__(self, path: str, size: int, max_distance: int, reservation_seconds: float = 600):
+        self.path = path
+        self.size = size
+        self.max_distance = max_distance
+        self.reservation_seconds = reservation_seconds
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def is_duplicate(self, image_hash: int) -> bool:
+        """Проверяет, публиковалось ли недавно похожее изображение."""
+        with self._locked():
+            entries, _ = self._read()
+        return self._near(image_hash, [int(entry, 16) for entry, _ in entries])
+
+    def reserve(self, image_hash: int) -> bool:
+        """
+        Резервирует изображение за готовящимся постом.
+
+        Возвращает:
+            bool: False, если похожее изображение уже опубликовано или зарезервировано другим постом.
+        """
+        with self._locked():
+            entries, reserved = self._read()
+            known = [int(entry, 16) for entry, _ in entries] + [int(entry, 16) for entry, _ in reserved]
+            if self._near(image_hash, known):
+                return False
+            reserved.append([f"{image_hash:016x}", time.time() + self.reservation_seconds])
+            self._write(entries, reserved)
+            return True
+
+    def release(self, image_hash: int) -> None:
+        """Снимает резерв с изображения, которое не удалось опубликовать."""
+        with self._locked():
+            entries, reserved = self._read()
+            self._write(entries, self._without(reserved, image_hash))
+
+    def add(self, image_hash: int) -> None:
+        """Запоминает опубликованное изображение, снимает его резерв и сохраняет индекс на диск."""
+        with self._locked():
+            entries, reserved = self._read()
+            entries.append([f"{image_hash:016x}", time.time()])
+            self._write(entries[-self.size:], self._without(reserved, image_hash))
+
+    def _near(self, image_hash: int, hashes: list[int]) -> bool:
+        return any(bin(image_hash ^ other).count("1") <= self.max_distance for other in hashes)
+
+    def _without(self, reserved: list[list], image_hash: int) -> list[list]:
+        return [entry for entry in reserved if not self._near(image_hash, [int(entry[0], 16)])]
+
+    def _read(self) -> tuple[list[list], list[list]]:
+        """Читает опубликованные изображения и действующие резервы из файла."""
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                data = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return [], []
+        # Файлы, сохранённые до появления резервов, содержат только список изображений
+        if isinstance(data, list):
+            return data, []
+        now = time.time()
+        return data.get("entries", []), [entry for entry in data.get("reserved", []) if entry[1] > now]
+
+    def _write(self, entries: list[list], reserved: list[list]) -> None:
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"entries": entries, "reserved": reserved}, file)
+        os.replace(tmp_path, self.path)
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._lock, open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@functools.cache
+def posted_images() -> PerceptualIndex:
+    """Возвращает общий для процесса индекс недавно опубликованных изображений."""
+    settings = ImageSettings()
+    return PerceptualIndex(
+        settings.image_index_path,
+        settings.image_index_size,
+        settings.image_max_distance,
+        settings.image_reservation_seconds
+    )
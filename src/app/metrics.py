@@ -0,0 +1,289 @@
+import bisect
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+
+from .settings import MetricsSettings
+
+settings = MetricsSettings()
+
+logger = logging.getLogger("telegram_mailing.metrics")
+
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Registry:
+    """
+    Реестр счётчиков и гистограмм в формате Prometheus.
+
+    Значения хранятся по имени метрики и набору меток. Гистограммы используют
+    фиксированные границы корзин DEFAULT_BUCKETS (секунды).
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counters: dict[str, dict[Labels, float]] = {}
+        self._histograms: dict[str, dict[Labels, list]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """Увеличивает счётчик."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Добавляет наблюдение в гистограмму."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            # Счётчики по корзинам, сумма и количество наблюдений
+            state = series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> str:
+        """Возвращает все метрики в текстовом формате Prometheus."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in series.items():
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for labels, (counts, total, count) in series.items():
+                    cumulative = 0
+                    for bound, bucket_count in zip(self.buckets, counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for key, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+registry = Registry()
+
+# Наблюдатели за завершёнными участками: функции (name, seconds, ok, labels)
+_observers: list[Callable[[str, float, bool, dict[str, str]], None]] = []
+
+
+def enabled() -> bool:
+    """Проверяет, включён ли сбор метрик."""
+    return settings.metrics_enabled or bool(_observers)
+
+
+def add_observer(observer: Callable[[str, float, bool, dict[str, str]], None]) -> None:
+    """
+    Подписывает функцию на завершение каждого участка (span).
+
+    Пока есть хотя бы один наблюдатель, участки измеряются даже при выключенных метриках.
+    """
+    _observers.append(observer)
+
+
+def remove_observer(observer: Callable[[str, float, bool, dict[str, str]], None]) -> None:
+    """Отписывает функцию от завершения участков."""
+    _observers.remove(observer)
+
+
+def inc(name: str, value: float = 1, **labels: str) -> None:
+    """Увеличивает счётчик, если сбор метрик включён."""
+    if enabled():
+        registry.inc(name, value, **labels)
+
+
+class _Span:
+    __slots__ = ("name", "labels", "started")
+
+    def __init__(self, name: str, labels: dict[str, str]):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        seconds = time.perf_counter() - self.started
+        ok = exc_type is None
+        registry.observe("stage_duration_seconds", seconds, stage=self.name, **self.labels)
+        registry.inc("stage_calls_total", stage=self.name, ok=str(ok).lower(), **self.labels)
+        if settings.metrics_json_logs:
+            logger.info(json.dumps({
+                "event": "span",
+                "stage": self.name,
+                "seconds": round(seconds, 6),
+                "ok": ok,
+                "error": type(exc_val).__name__ if exc_val is not None else None,
+                **self.labels
+            }, ensure_ascii=False))
+        for observer in list(_observers):
+            observer(self.name, seconds, ok, self.labels)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **labels: str):
+    """
+    Контекстный менеджер, измеряющий время выполнения участка кода.
+
+    Записывает гистограмму stage_duration_seconds и счётчик stage_calls_total
+    с меткой stage=name и, если включено, структурированную JSON-запись в лог.
+    При выключенных метриках возвращает общий пустой контекстный менеджер.
+
+    Пример использования:
+        with span("get_article"):
+            article = get_article(title)
+    """
+    if not enabled():
+        return _NOOP
+    return _Span(name, labels)
+
+
+def timed(name: Optional[str] = None) -> Callable:
+    """
+    Декоратор, оборачивающий функцию (или корутину) в span.
+
+    Параметры:
+        name (Optional[str]): Имя участка, по умолчанию — имя функции.
+    """
+    def decorator(func):
+        stage = name or func.__name__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def render() -> str:
+    """
+    Возвращает метрики в формате Prometheus, дополняя их счётчиками
+    повторов (app.resilience) и попаданий в дисковый кеш (app.cache).
+    """
+    from . import resilience
+    from .cache import get_cache
+
+    lines = [registry.render().rstrip("\n")]
+    dependencies = resilience.stats()
+    for key in ("calls", "attempts", "retries", "failures", "rejected", "retry_seconds"):
+        lines.append(f"# TYPE dependency_{key}_total counter")
+        for dependency, values in dependencies.items():
+            lines.append(f'dependency_{key}_total{{dependency="{dependency}"}} {values[key]}')
+    lines.append("# TYPE dependency_circuit_open gauge")
+    for dependency, values in dependencies.items():
+        lines.append(f'dependency_circuit_open{{dependency="{dependency}"}} {int(values["circuit"] != "closed")}')
+    cache = get_cache()
+    if cache is not None:
+        namespaces = cache.stats()
+        for key in ("hits", "misses"):
+            lines.append(f"# TYPE cache_{key}_total counter")
+            for namespace, values in namespaces.items():
+                lines.append(f'cache_{key}_total{{namespace="{namespace}"}} {values[key]}')
+    return "\n".join(line for line in lines if line) + "\n"
+
+
+def write_prometheus(path: Optional[str] = None) -> None:
+    """Записывает метрики в файл (по умолчанию metrics_file) для node_exporter textfile collector."""
+    path = path or settings.metrics_file
+    if not path:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write(render())
+    os.replace(tmp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def serve_prometheus(port: Optional[int] = None) -> Optional[ThreadingHTTPServer]:
+    """
+    Запускает в фоновом потоке HTTP-сервер, отдающий метрики по адресу /metrics.
+
+    Параметры:
+        port (Optional[int]): Порт, по умолчанию metrics_port. Если порт не задан, сервер не запускается.
+    """
+    port = port or settings.metrics_port
+    if not port:
+        return None
+    server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+def setup() -> None:
+    """
+    Включает экспорт метрик по настройкам: JSON-логи, HTTP-сервер и файл,
+    который перезаписывается при завершении процесса.
+
+    Настройки перечитываются, поэтому функцию нужно вызывать после загрузки .env.
+    """
+    global settings
+    settings = MetricsSettings()
+    if not settings.metrics_enabled:
+        return
+    if settings.metrics_json_logs:
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+    serve_prometheus()
+    if settings.metrics_file:
+        import atexit
+        atexit.register(write_prometheus)
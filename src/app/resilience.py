@@ -0,0 +1,413 @@
+import asyncio
+import contextlib
+import contextvars
+import datetime
+import functools
+import inspect
+import random
+import threading
+import time
+from typing import Any, Callable, Iterator, NamedTuple, Optional
+
+from .settings import ResilienceSettings
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+# Ошибки, повтор которых бессмысленен (неверный токен, нет прав и т.п.): типы исключений
+# или функции-проверки. Модули сервисов дополняют этот список через register_fatal.
+_fatal_errors: list[type[BaseException] | Callable[[BaseException], bool]] = []
+
+
+class DeadlineExceeded(TimeoutError):
+    """Истёк срок выполнения вызова или всего конвейера."""
+
+
+class CircuitOpenError(RuntimeError):
+    """Сервис временно считается недоступным, вызов отклонён без обращения к нему."""
+
+
+class RetryPolicy(NamedTuple):
+    """
+    Политика повторов с экспоненциальной задержкой и случайным разбросом.
+
+    Атрибуты:
+        max_attempts (Optional[int]): Максимальное число попыток, None — без ограничения
+            (повторы всё равно ограничены сроком конвейера).
+        base_delay (float): Задержка перед первым повтором в секундах.
+        max_delay (float): Максимальная задержка между попытками.
+        multiplier (float): Во сколько раз растёт задержка с каждой попыткой.
+    """
+    max_attempts: Optional[int] = 5
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+    multiplier: float = 2.0
+
+    def delay(self, attempt: int) -> float:
+        """Возвращает задержку перед повтором после попытки `attempt` (full jitter)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1)))
+
+
+@functools.cache
+def get_settings() -> ResilienceSettings:
+    """Возвращает настройки повторов и выключателей; читаются при первом обращении, уже после load_dotenv."""
+    return ResilienceSettings()
+
+
+def default_policy() -> RetryPolicy:
+    """Возвращает политику повторов по умолчанию из ResilienceSettings."""
+    settings = get_settings()
+    return RetryPolicy(
+        max_attempts=settings.retry_max_attempts,
+        base_delay=settings.retry_base_delay,
+        max_delay=settings.retry_max_delay
+    )
+
+
+class DependencyStats:
+    """
+    Счётчики вызовов одного внешнего сервиса.
+
+    Атрибуты:
+        calls (int): Количество вызовов.
+        attempts (int): Количество попыток, включая повторы.
+        retries (int): Количество повторов.
+        failures (int): Количество вызовов, завершившихся ошибкой после всех повторов.
+        rejected (int): Количество вызовов, отклонённых открытым автоматическим выключателем.
+        retry_seconds (float): Суммарное время ожидания между повторами.
+
+    Счётчики одного сервиса меняют одновременно несколько потоков (StageGraph, hedged,
+    пул статей), а "+=" не атомарен, поэтому они изменяются только через `add`.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+        self.retry_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, **deltas: float) -> None:
+        """Увеличивает счётчики на заданные величины, например add(retries=1, retry_seconds=0.5)."""
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def as_dict(self) -> dict[str, Any]:
+        with self._lock:
+            return {name: value for name, value in vars(self).items() if not name.startswith("_")}
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель для внешнего сервиса.
+
+    После `failure_threshold` ошибок подряд выключатель размыкается, и вызовы
+    отклоняются сразу, не нагружая недоступный сервис. Через `reset_timeout` секунд
+    пропускается один пробный вызов: при успехе выключатель замыкается, при ошибке
+    снова размыкается. Если пробный вызов прерван без результата (отмена, KeyboardInterrupt),
+    флаг пробного вызова снимается (release_probe), и пробу выполняет следующий вызов.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Состояние выключателя: "closed", "open" или "half_open"."""
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """
+        Проверяет, можно ли обратиться к сервису, иначе выбрасывает CircuitOpenError.
+
+        Возвращает:
+            bool: True, если вызов пропущен как пробный в полуоткрытом состоянии.
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return False
+            if state == "half_open" and not self._probe:
+                self._probe = True
+                return True
+        raise CircuitOpenError(f"Circuit for {self.name} is open")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probe = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probe or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._probe = False
+
+    def release_probe(self) -> None:
+        """Снимает флаг пробного вызова, не меняя состояния выключателя."""
+        with self._lock:
+            self._probe = False
+
+
+_stats: dict[str, DependencyStats] = {}
+_breakers: dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_stats(dependency: str) -> DependencyStats:
+    """Возвращает счётчики сервиса, создавая их при первом обращении."""
+    with _registry_lock:
+        return _stats.setdefault(dependency, DependencyStats())
+
+
+def get_breaker(dependency: str) -> CircuitBreaker:
+    """Возвращает автоматический выключатель сервиса, создавая его при первом обращении."""
+    with _registry_lock:
+        if dependency not in _breakers:
+            settings = get_settings()
+            _breakers[dependency] = CircuitBreaker(
+                dependency,
+                settings.breaker_failure_threshold,
+                settings.breaker_reset_seconds
+            )
+        return _breakers[dependency]
+
+
+def stats() -> dict[str, dict[str, Any]]:
+    """Возвращает счётчики и состояние выключателей по всем сервисам."""
+    with _registry_lock:
+        names = sorted(set(_stats) | set(_breakers))
+    return {
+        name: {**get_stats(name).as_dict(), "circuit": get_breaker(name).state}
+        for name in names
+    }
+
+
+def register_fatal(*errors: type[BaseException] | Callable[[BaseException], bool]) -> None:
+    """
+    Регистрирует ошибки, которые не нужно повторять.
+
+    Параметры:
+        errors: Типы исключений или функции, принимающие исключение и возвращающие True,
+            если его повтор бессмысленен.
+    """
+    _fatal_errors.extend(errors)
+
+
+def is_retryable(error: BaseException, retry_on: tuple[type[BaseException], ...] = (Exception,)) -> bool:
+    """Определяет, имеет ли смысл повторять вызов после ошибки."""
+    if isinstance(error, (DeadlineExceeded, CircuitOpenError)):
+        return False
+    for fatal in _fatal_errors:
+        if isinstance(fatal, type):
+            if isinstance(error, fatal):
+                return False
+        elif fatal(error):
+            return False
+    return isinstance(error, retry_on)
+
+
+@contextlib.contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Устанавливает срок выполнения для всех вызовов внутри блока.
+
+    Вложенный срок не может быть позже внешнего. Срок передаётся через contextvars,
+    поэтому действует и в потоках, запущенных с копией контекста (StageGraph, hedged).
+    """
+    if seconds is None:
+        yield
+        return
+    current = _deadline.get()
+    new = time.monotonic() + seconds
+    token = _deadline.set(new if current is None else min(current, new))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Возвращает, сколько секунд осталось до срока, или None, если срок не задан."""
+    current = _deadline.get()
+    return None if current is None else current - time.monotonic()
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Возвращает задержку, которую запросил сам сервис (например, RetryAfter в Telegram)."""
+    value = getattr(error, "retry_after", None)
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, (int, float)):
+        return float(value)
+    return None
+
+
+def _next_delay(
+        dependency: str,
+        error: BaseException,
+        attempt: int,
+        policy: RetryPolicy,
+        retry_on: tuple[type[BaseException], ...]
+) -> float:
+    """
+    Решает, повторять ли вызов после ошибки, и возвращает задержку перед повтором.
+    Если повторять не нужно, пробрасывает ошибку.
+    """
+    stats_ = get_stats(dependency)
+    if not is_retryable(error, retry_on):
+        # Неисправимые ошибки, срок и открытый вложенный выключатель ничего не говорят
+        # о доступности сервиса, поэтому выключатель не меняется
+        stats_.add(failures=1)
+        raise error
+    get_breaker(dependency).record_failure()
+    if policy.max_attempts is not None and attempt >= policy.max_attempts:
+        stats_.add(failures=1)
+        raise error
+    left = remaining()
+    delay = retry_after(error)
+    delay = policy.delay(attempt) if delay is None else delay
+    if left is not None and left <= delay:
+        stats_.add(failures=1)
+        raise DeadlineExceeded(f"Deadline exceeded while retrying {dependency}") from error
+    print(f'Exception in {dependency} (attempt {attempt}), retry in {delay:.1f}s \n {error}')
+    stats_.add(retries=1, retry_seconds=delay)
+    return delay
+
+
+def _before_attempt(dependency: str) -> bool:
+    """Проверяет срок и выключатель перед попыткой; возвращает True для пробного вызова выключателя."""
+    left = remaining()
+    if left is not None and left <= 0:
+        get_stats(dependency).add(failures=1)
+        raise DeadlineExceeded(f"Deadline exceeded before calling {dependency}")
+    try:
+        probe = get_breaker(dependency).allow()
+    except CircuitOpenError:
+        get_stats(dependency).add(rejected=1, failures=1)
+        raise
+    get_stats(dependency).add(attempts=1)
+    return probe
+
+
+def call_with_retry(
+        dependency: str,
+        func: Callable[..., Any],
+        *args,
+        policy: Optional[RetryPolicy] = None,
+        retry_on: tuple[type[BaseException], ...] = (Exception,),
+        timeout: Optional[float] = None,
+        **kwargs
+) -> Any:
+    """
+    Вызывает функцию с повторами, сроком и автоматическим выключателем сервиса.
+
+    Параметры:
+        dependency (str): Имя внешнего сервиса ("yandex", "wikipedia", "gigachat", "telegram").
+        func (callable): Вызываемая функция.
+        policy (Optional[RetryPolicy]): Политика повторов, по умолчанию из ResilienceSettings.
+        retry_on (tuple): Типы ошибок, после которых вызов повторяется.
+        timeout (Optional[float]): Срок всего вызова вместе с повторами в секундах.
+
+    Особенности:
+        - Между попытками выдерживается экспоненциальная задержка со случайным разбросом,
+          либо задержка, которую запросил сервис (атрибут retry_after у ошибки).
+        - Ошибки из register_fatal и не входящие в retry_on не повторяются.
+        - Если задан срок (deadline), повторы прекращаются с DeadlineExceeded.
+    """
+    policy = policy or default_policy()
+    get_stats(dependency).add(calls=1)
+    attempt = 0
+    with deadline(timeout):
+        while True:
+            attempt += 1
+            probe = _before_attempt(dependency)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as err:
+                delay = _next_delay(dependency, err, attempt, policy, retry_on)
+            else:
+                get_breaker(dependency).record_success()
+                return result
+            finally:
+                # Пробный вызов, прерванный без результата, не должен навсегда оставить выключатель открытым
+                if probe:
+                    get_breaker(dependency).release_probe()
+            time.sleep(delay)
+
+
+async def call_with_retry_async(
+        dependency: str,
+        func: Callable[..., Any],
+        *args,
+        policy: Optional[RetryPolicy] = None,
+        retry_on: tuple[type[BaseException], ...] = (Exception,),
+        timeout: Optional[float] = None,
+        **kwargs
+) -> Any:
+    """Асинхронный вариант call_with_retry для корутинных функций."""
+    policy = policy or default_policy()
+    get_stats(dependency).add(calls=1)
+    attempt = 0
+    with deadline(timeout):
+        while True:
+            attempt += 1
+            probe = _before_attempt(dependency)
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as err:
+                delay = _next_delay(dependency, err, attempt, policy, retry_on)
+            else:
+                get_breaker(dependency).record_success()
+                return result
+            finally:
+                if probe:
+                    get_breaker(dependency).release_probe()
+            await asyncio.sleep(delay)
+
+
+def resilient(
+        dependency: str,
+        policy: Optional[RetryPolicy] = None,
+        retry_on: tuple[type[BaseException], ...] = (Exception,),
+        timeout: Optional[float] = None
+) -> Callable:
+    """
+    Декоратор, выполняющий функцию через call_with_retry (или call_with_retry_async для корутин).
+
+    Пример использования:
+        @resilient("yandex")
+        def get_picture(q: str) -> bytes:
+            ...
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await call_with_retry_async(
+                    dependency, func, *args, policy=policy, retry_on=retry_on, timeout=timeout, **kwargs
+                )
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return call_with_retry(
+                dependency, func, *args, policy=policy, retry_on=retry_on, timeout=timeout, **kwargs
+            )
+        return wrapper
+
+    return decorator
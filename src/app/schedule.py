@@ -0,0 +1,111 @@
+import datetime
+import json
+from typing import NamedTuple, Optional
+
+# Допустимые значения полей cron: минута, час, день месяца, месяц, день недели
+FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def _parse_field(field: str, low: int, high: int) -> frozenset[int]:
+    values = set()
+    for part in field.split(","):
+        part, _, step = part.partition("/")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(value) for value in part.split("-", 1))
+        else:
+            start = end = int(part)
+        if step and part != "*" and "-" not in part:
+            end = high
+        if not low <= start <= end <= high:
+            raise ValueError(f"Value {part} out of range {low}-{high}")
+        values.update(range(start, end + 1, int(step) if step else 1))
+    return frozenset(values)
+
+
+class CronSchedule:
+    """
+    Расписание в формате cron из пяти полей: минута, час, день месяца, месяц, день недели.
+
+    Поддерживаются "*", числа, диапазоны "a-b", списки через запятую и шаг "/n".
+    День недели 0 и 7 — воскресенье. Как и в cron, если ограничены и день месяца,
+    и день недели, расписание срабатывает при совпадении любого из них.
+
+    Пример использования:
+        CronSchedule("0 9,18 * * 1-5").matches(datetime.datetime.now())
+    """
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression must have 5 fields: {expression}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_field(field, low, high) for field, (low, high) in zip(fields, FIELD_RANGES)
+        )
+        self.weekdays = frozenset(day % 7 for day in weekdays)
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def matches(self, moment: datetime.datetime) -> bool:
+        """Проверяет, срабатывает ли расписание в минуту `moment`."""
+        if moment.minute not in self.minutes or moment.hour not in self.hours or moment.month not in self.months:
+            return False
+        day = moment.day in self.days
+        # В Python понедельник — 0, в cron — 1
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, moment: datetime.datetime) -> Optional[datetime.datetime]:
+        """Возвращает ближайшую минуту после `moment`, в которую срабатывает расписание (в пределах года)."""
+        candidate = moment.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        for _ in range(366 * 24 * 60):
+            if self.matches(candidate):
+                return candidate
+            candidate += datetime.timedelta(minutes=1)
+        return None
+
+    def __repr__(self) -> str:
+        return f"CronSchedule({self.expression!r})"
+
+
+class ScheduleEntry(NamedTuple):
+    """
+    Запись расписания публикаций.
+
+    Атрибуты:
+        name (str): Имя записи для статуса и логов.
+        cron (CronSchedule): Когда публиковать.
+        topics (list[str]): Темы, которые публикуются по очереди при каждом срабатывании.
+        channels (Optional[list[str]]): Каналы для публикации; если не заданы — chanel_names из TgSettings.
+    """
+    name: str
+    cron: CronSchedule
+    topics: list[str]
+    channels: Optional[list[str]] = None
+
+
+def load_schedule(path: str) -> list[ScheduleEntry]:
+    """
+    Загружает расписание из JSON-файла вида:
+        {"jobs": [{"name": "утро", "cron": "0 9 * * *", "topics": ["Эрмитаж", "Байкал"], "channels": ["@a"]}]}
+
+    Возвращает:
+        list[ScheduleEntry]: Записи расписания.
+    """
+    with open(path, encoding="utf-8") as file:
+        data = json.load(file)
+    entries = []
+    for number, job in enumerate(data.get("jobs", [])):
+        if not job.get("topics"):
+            raise ValueError(f"Schedule job {number} has no topics")
+        entries.append(ScheduleEntry(
+            name=job.get("name") or f"job{number}",
+            cron=CronSchedule(job["cron"]),
+            topics=list(job["topics"]),
+            channels=job.get("channels")
+        ))
+    return entries
@@ -1,3 +1,6 @@
+import datetime
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -21,8 +24,179 @@ class TgSettings(BaseSettings):
         chanel_names (list[str]): Список имён или идентификаторов Telegram-каналов,
          куда бот будет отправлять сообщения.
         bot_token (str): Токен Telegram-бота для аутентификации и отправки сообщений.
+        send_concurrency (int): Максимальное число одновременных отправок в каналы.
+        send_attempts (int): Количество попыток отправки поста в один канал.
+        telegram_base_url (str): Адрес Bot API, например локального сервера Bot API
+            или заглушки из бенчмарка (bench).
+        outbox_path (Optional[str]): Путь к базе SQLite очереди отправки (tg.outbox).
+            Если не задан, посты отправляются без сохранения состояния доставки.
+        outbox_lease_seconds (float): Сколько секунд пост в очереди принадлежит заданию,
+            которое его рассылает, без продления; после этого его может дослать другое задание.
+        send_rate_per_second (float): Сколько сообщений в секунду бот отправляет всего.
+        send_chat_interval_seconds (float): Минимальный интервал между сообщениями в один канал.
 
     Значения загружаются из переменных окружения или .env файла.
     """
     chanel_names: list[str]
     bot_token: str
+    send_concurrency: int = 5
+    send_attempts: int = 3
+    telegram_base_url: str = "https://api.telegram.org/bot"
+    outbox_path: Optional[str] = ".cache/outbox.sqlite3"
+    outbox_lease_seconds: float = 600.0
+    send_rate_per_second: float = 25.0
+    send_chat_interval_seconds: float = 1.0
+
+
+class PipelineSettings(BaseSettings):
+    """
+    Настройки конвейера создания поста.
+
+    Атрибуты:
+        wiki_hedge_after_seconds (Optional[float]): Через сколько секунд ожидания ответа первого
+            источника статьи (Яндекса) параллельно запрашивать остальные (Википедию). Если не задано,
+            остальные источники используются только после того, как первый не вернул статью.
+        pipeline_deadline_seconds (Optional[float]): Срок создания и публикации одного поста;
+            по его истечении повторы запросов прекращаются. Если не задан, срок не ограничен.
+        article_sources (str): Источники статьи через запятую в порядке использования (app.sources).
+        picture_sources (str): Источники изображения через запятую в порядке использования.
+    """
+    wiki_hedge_after_seconds: Optional[float] = 20.0
+    pipeline_deadline_seconds: Optional[float] = 600.0
+    article_sources: str = "yandex,wikipedia"
+    picture_sources: str = "yandex"
+
+
+class BatchSettings(BaseSettings):
+    """
+    Настройки пакетного режима.
+
+    Атрибуты:
+        batch_workers (int): Сколько тем обрабатывается одновременно.
+        batch_article_concurrency (int): Сколько поисков статей выполняется одновременно.
+        batch_post_concurrency (int): Сколько генераций постов выполняется одновременно.
+        batch_picture_concurrency (int): Сколько поисков изображений выполняется одновременно.
+        batch_publish_concurrency (int): Сколько рассылок выполняется одновременно.
+    """
+    batch_workers: int = 4
+    batch_article_concurrency: int = 2
+    batch_post_concurrency: int = 4
+    batch_picture_concurrency: int = 2
+    batch_publish_concurrency: int = 2
+
+
+class CacheSettings(BaseSettings):
+    """
+    Настройки постоянного дискового кеша.
+
+    Атрибуты:
+        cache_enabled (bool): Включает кеширование результатов поиска и статей на диске.
+        cache_path (str): Путь к файлу базы SQLite с кешем.
+        cache_max_mb (int): Максимальный размер кеша в мегабайтах, после которого
+            вытесняются давно не использованные записи.
+        cache_serp_ttl_seconds (int): Время жизни списков ссылок из поисковой выдачи.
+        cache_article_ttl_seconds (int): Время жизни текстов статей, скачанных по ссылке.
+        cache_wiki_ttl_seconds (int): Время жизни статей Википедии.
+        cache_generation_ttl_seconds (int): Время жизни постов, сгенерированных GigaChat.
+        cache_generation_similarity (Optional[float]): Порог схожести тем (0..1), при котором
+            пост на почти совпадающую тему с тем же контекстом берётся из кеша. None — только точное совпадение.
+    """
+    cache_enabled: bool = True
+    cache_path: str = ".cache/telegram_mailing.sqlite3"
+    cache_max_mb: int = 200
+    cache_serp_ttl_seconds: int = int(datetime.timedelta(hours=12).total_seconds())
+    cache_article_ttl_seconds: int = int(datetime.timedelta(days=7).total_seconds())
+    cache_wiki_ttl_seconds: int = int(datetime.timedelta(days=30).total_seconds())
+    cache_generation_ttl_seconds: int = int(datetime.timedelta(days=3).total_seconds())
+    cache_generation_similarity: Optional[float] = 0.8
+
+
+class ContextSettings(BaseSettings):
+    """
+    Настройки сжатия контекста перед запросом к GigaChat.
+
+    Атрибуты:
+        context_max_chars (int): Максимальная длина статьи в контексте запроса.
+            Из статьи остаются только самые релевантные теме абзацы. 0 отключает сжатие.
+    """
+    context_max_chars: int = 4000
+
+
+class ImageSettings(BaseSettings):
+    """
+    Настройки обработки изображений перед отправкой в Telegram.
+
+    Атрибуты:
+        image_max_side (int): Максимальный размер большей стороны изображения в пикселях.
+        image_max_bytes (int): Максимальный размер файла изображения после сжатия.
+        image_format (str): Формат, в который перекодируется изображение ("JPEG" или "WEBP").
+        image_quality (int): Начальное качество сжатия, которое снижается, пока файл не уложится в image_max_bytes.
+        image_min_side (int): Минимальный размер меньшей стороны; изображения меньше считаются миниатюрами.
+        image_index_path (str): Файл с перцептивными хешами недавно опубликованных изображений.
+        image_index_size (int): Сколько последних изображений помнить для отсева повторов.
+        image_max_distance (int): Максимальное расстояние Хэмминга между хешами, при котором изображения считаются одинаковыми.
+        image_reservation_seconds (float): Сколько секунд найденное изображение зарезервировано за постом,
+            который ещё не опубликован; похожие изображения в это время пропускаются.
+    """
+    image_max_side: int = 1280
+    image_max_bytes: int = 1024 * 1024
+    image_format: str = "JPEG"
+    image_quality: int = 85
+    image_min_side: int = 200
+    image_index_path: str = ".cache/posted_images.json"
+    image_index_size: int = 500
+    image_max_distance: int = 6
+    image_reservation_seconds: float = 600.0
+
+
+class ResilienceSettings(BaseSettings):
+    """
+    Настройки повторов запросов к внешним сервисам.
+
+    Атрибуты:
+        retry_max_attempts (int): Максимальное число попыток одного вызова.
+        retry_base_delay (float): Задержка перед первым повтором в секундах, дальше она растёт экспоненциально.
+        retry_max_delay (float): Максимальная задержка между попытками в секундах.
+        breaker_failure_threshold (int): После скольких ошибок подряд сервис считается недоступным.
+        breaker_reset_seconds (float): Через сколько секунд снова пробовать обратиться к недоступному сервису.
+    """
+    retry_max_attempts: int = 5
+    retry_base_delay: float = 1.0
+    retry_max_delay: float = 30.0
+    breaker_failure_threshold: int = 5
+    breaker_reset_seconds: float = 60.0
+
+
+class MetricsSettings(BaseSettings):
+    """
+    Настройки сбора метрик.
+
+    Атрибуты:
+        metrics_enabled (bool): Включает измерение времени этапов и счётчики.
+            При выключенных метриках накладные расходы сводятся к одной проверке флага.
+        metrics_port (Optional[int]): Порт локального HTTP-сервера с метриками в формате Prometheus (/metrics).
+        metrics_file (Optional[str]): Файл, в который метрики записываются при завершении программы.
+        metrics_json_logs (bool): Писать завершение каждого этапа в лог в виде JSON.
+    """
+    metrics_enabled: bool = False
+    metrics_port: Optional[int] = None
+    metrics_file: Optional[str] = None
+    metrics_json_logs: bool = False
+
+
+class DaemonSettings(BaseSettings):
+    """
+    Настройки постоянно работающего сервиса (main.py --daemon).
+
+    Атрибуты:
+        daemon_workers (int): Сколько постов создаётся одновременно.
+        daemon_host (str): Адрес локального HTTP API управления.
+        daemon_port (int): Порт локального HTTP API управления.
+        daemon_history (int): Сколько последних заданий хранится для /status.
+        daemon_warm_up (bool): Заранее запускать браузеры, HTTP-сессию и получать токен GigaChat.
+    """
+    daemon_workers: int = 2
+    daemon_host: str = "127.0.0.1"
+    daemon_port: int = 8080
+    daemon_history: int = 100
+    daemon_warm_up: bool = True
@@ -0,0 +1,117 @@
+"""
+Реестр источников статей и изображений для постов.
+
+Источник регистрируется под видом ("article" или "picture") и именем и указывает
+функцию строкой "модуль:функция". Модуль импортируется только при первом обращении
+к источнику, поэтому запуск, при котором ответ дал кеш или другой источник, не
+загружает Selenium, newspaper или wikipedia.
+
+Пример регистрации нового источника:
+    sources.register("article", "my_site", "my_package.articles:get_article")
+После этого его можно указать в ARTICLE_SOURCES=my_site,yandex,wikipedia.
+"""
+import functools
+import importlib
+from typing import Any, Callable, NamedTuple, Optional
+
+ARTICLE = "article"
+PICTURE = "picture"
+
+
+class Source(NamedTuple):
+    """
+    Зарегистрированный источник.
+
+    Атрибуты:
+        kind (str): Что возвращает источник: "article" (текст) или "picture" (изображение в байтах).
+        name (str): Имя источника в настройках.
+        target (str): Функция источника "модуль:функция", принимающая тему поста.
+        warm_up (Optional[str]): Функция без параметров "модуль:функция", заранее готовящая ресурсы источника.
+    """
+    kind: str
+    name: str
+    target: str
+    warm_up: Optional[str] = None
+
+
+_sources: dict[str, dict[str, Source]] = {ARTICLE: {}, PICTURE: {}}
+_warmed: set[str] = set()
+
+
+def register(kind: str, name: str, target: str, warm_up: Optional[str] = None) -> None:
+    """Регистрирует источник; повторная регистрация с тем же именем заменяет прежнюю."""
+    if kind not in _sources:
+        raise ValueError(f"Unknown source kind {kind}")
+    _sources[kind][name] = Source(kind, name, target, warm_up)
+
+
+def names(kind: str) -> list[str]:
+    """Возвращает имена зарегистрированных источников вида `kind`."""
+    return list(_sources[kind])
+
+
+def parse(value: str) -> list[str]:
+    """Разбирает список имён источников через запятую."""
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+@functools.cache
+def _resolve(target: str) -> Callable:
+    module, _, attribute = target.partition(":")
+    return getattr(importlib.import_module(module), attribute)
+
+
+def get_source(kind: str, name: str) -> Source:
+    """Возвращает источник по виду и имени."""
+    try:
+        return _sources[kind][name]
+    except KeyError:
+        raise ValueError(f"Unknown {kind} source {name}, available: {', '.join(names(kind))}") from None
+
+
+def load(kind: str, name: str) -> Callable[[str], Any]:
+    """Импортирует модуль источника (один раз) и возвращает его функцию."""
+    return _resolve(get_source(kind, name).target)
+
+
+def fetch(kind: str, name: str, query: str) -> Any:
+    """Запрашивает у источника статью или изображение на тему `query`."""
+    return load(kind, name)(query)
+
+
+def first(kind: str, sources: list[str], query: str) -> Any:
+    """
+    Перебирает источники по порядку и возвращает первый непустой результат.
+
+    Ошибки источника выводятся и не прерывают перебор. Если ни один источник не дал
+    результата, возвращается None, а если все упали — пробрасывается последняя ошибка.
+    """
+    last_error = None
+    failed = 0
+    for name in sources:
+        try:
+            result = fetch(kind, name, query)
+        except Exception as err:
+            print(f'Exception in {kind} source {name} \n {err}')
+            last_error = err
+            failed += 1
+            continue
+        if result:
+            return result
+    if last_error is not None and failed == len(sources):
+        raise last_error
+    return None
+
+
+def warm_up(kind: str, sources: list[str]) -> None:
+    """Вызывает функции прогрева источников, у которых они заданы (каждую — один раз за процесс)."""
+    for name in sources:
+        source = get_source(kind, name)
+        if source.warm_up and source.warm_up not in _warmed:
+            _resolve(source.warm_up)()
+            _warmed.add(source.warm_up)
+
+
+register(ARTICLE, "yandex", "yandex.workers:scrape_article", warm_up="yandex.workers:warm_up")
+register(ARTICLE, "wikipedia", "wiki:get_article_from_wiki")
+register(PICTURE, "yandex", "yandex.workers:scrape_picture", warm_up="yandex.workers:warm_up")
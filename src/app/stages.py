@@ -0,0 +1,186 @@
+import contextvars
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Optional
+
+
+class StageCancelled(RuntimeError):
+    """Этап не запущен, потому что другой этап графа завершился с ошибкой."""
+
+
+class StageGraph:
+    """
+    Небольшой граф этапов обработки, выполняемых в пуле потоков.
+
+    Каждый этап — функция, которая получает результаты своих зависимостей
+    в виде именованных аргументов. Этап запускается сразу, как только готовы
+    все его зависимости, поэтому независимые ветки выполняются одновременно,
+    и общее время работы определяется самой длинной веткой графа.
+
+    Пример использования:
+        graph = StageGraph()
+        graph.add("article", lambda: get_article(title))
+        graph.add("picture", lambda: get_picture(title))
+        graph.add("post", lambda article: make_post(article), deps=["article"])
+        results = graph.run()
+
+    Этапы выполняются с копией контекста (contextvars) вызывающего потока,
+    поэтому срок конвейера из app.resilience.deadline действует во всех этапах.
+
+    Параметр `limits` позволяет ограничить число одновременно выполняющихся этапов
+    с одним именем, если несколько графов работают параллельно (пакетный режим).
+    """
+
+    def __init__(
+            self,
+            max_workers: Optional[int] = None,
+            limits: Optional[dict[str, threading.Semaphore]] = None
+    ):
+        self.max_workers = max_workers
+        self.limits = limits or {}
+        self._stages: dict[str, tuple[Callable[..., Any], tuple[str, ...]]] = {}
+
+    def add(self, name: str, func: Callable[..., Any], deps: tuple[str, ...] | list[str] = ()) -> None:
+        """
+        Добавляет этап в граф.
+
+        Параметры:
+            name (str): Уникальное имя этапа, под ним этап передаёт результат зависимым этапам.
+            func (callable): Функция этапа, принимающая результаты зависимостей по их именам.
+            deps (list[str]): Имена этапов, результаты которых нужны этой функции.
+        """
+        if name in self._stages:
+            raise ValueError(f"Stage {name} already exists")
+        self._stages[name] = (func, tuple(deps))
+
+    def run(self) -> dict[str, Any]:
+        """
+        Выполняет все этапы графа с учётом зависимостей.
+
+        Возвращает:
+            dict[str, Any]: Результаты всех этапов по их именам.
+
+        Особенности:
+            - Если какой-то этап завершился с ошибкой, исключение сразу пробрасывается
+              вызывающему коду, не дожидаясь выполняющихся этапов; незапущенные этапы
+              (в том числе ждущие ограничения limits) отменяются.
+        """
+        for name, (_, deps) in self._stages.items():
+            unknown = [dep for dep in deps if dep not in self._stages]
+            if unknown:
+                raise ValueError(f"Stage {name} depends on unknown stages {unknown}")
+
+        results: dict[str, Any] = {}
+        waiting = dict(self._stages)
+        running: dict[Future, str] = {}
+        max_workers = self.max_workers or max(1, len(self._stages))
+        cancelled = threading.Event()
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            while waiting or running:
+                for name, (func, deps) in list(waiting.items()):
+                    if all(dep in results for dep in deps):
+                        del waiting[name]
+                        kwargs = {dep: results[dep] for dep in deps}
+                        running[executor.submit(
+                            contextvars.copy_context().run, self._call, name, func, kwargs, cancelled
+                        )] = name
+                if not running:
+                    raise ValueError(f"Stages {list(waiting)} have cyclic dependencies")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    results[name] = future.result()
+        except BaseException:
+            # Не дожидаемся соседних этапов: их результаты больше не нужны
+            cancelled.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
+        return results
+
+    def _call(
+            self,
+            name: str,
+            func: Callable[..., Any],
+            kwargs: dict[str, Any],
+            cancelled: threading.Event
+    ) -> Any:
+        limit = self.limits.get(name)
+        if limit is None:
+            return self._call_unless_cancelled(name, func, kwargs, cancelled)
+        with limit:
+            return self._call_unless_cancelled(name, func, kwargs, cancelled)
+
+    @staticmethod
+    def _call_unless_cancelled(
+            name: str,
+            func: Callable[..., Any],
+            kwargs: dict[str, Any],
+            cancelled: threading.Event
+    ) -> Any:
+        # Этап, дождавшийся места в пуле или ограничения уже после ошибки другого этапа, не запускается
+        if cancelled.is_set():
+            raise StageCancelled(f"Stage {name} cancelled")
+        return func(**kwargs)
+
+
+def hedged(
+        primary: Callable[[], Any],
+        fallback: Callable[[], Any],
+        delay: Optional[float],
+        accept: Callable[[Any], bool] = bool
+) -> Any:
+    """
+    Выполняет основной запрос и, если он не ответил вовремя, параллельно запускает запасной.
+
+    Логика работы:
+    1. Запускает `primary` и ждёт его не дольше `delay` секунд.
+    2. Если за это время результат не получен, не подходит или основной запрос упал,
+       запускает `fallback`, не отменяя основной запрос.
+    3. Возвращает первый подходящий результат любого из запросов.
+
+    Параметры:
+        primary (callable): Основной запрос.
+        fallback (callable): Запасной запрос.
+        delay (Optional[float]): Через сколько секунд запускать запасной запрос.
+            Если None, запасной запрос запускается только после неудачи основного.
+        accept (callable): Проверка, подходит ли результат (по умолчанию — непустой).
+
+    Возвращает:
+        Any: Первый подходящий результат, либо результат запасного запроса,
+        если подходящих результатов нет.
+    """
+    executor = ThreadPoolExecutor(max_workers=2)
+    try:
+        running = {executor.submit(contextvars.copy_context().run, primary): "primary"}
+        fallback_started = False
+        last_result = None
+        last_error = None
+        timeout = delay
+        while running:
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as err:
+                    print(f'Exception in {name} request \n {err}')
+                    last_error = err
+                    continue
+                if accept(result):
+                    return result
+                if name == "fallback" or last_result is None:
+                    last_result = result
+            if not fallback_started and (not done or not running):
+                running[executor.submit(contextvars.copy_context().run, fallback)] = "fallback"
+                fallback_started = True
+                timeout = None
+        if last_result is None and last_error is not None:
+            raise last_error
+        return last_result
+    finally:
+        # Не дожидаемся зависшего запроса: его результат больше не нужен
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,103 @@
+"""
+Замер времени импорта модулей при запуске (main.py --profile-startup).
+
+Каждый замер выполняется в отдельном интерпретаторе с ключом -X importtime,
+поэтому уже загруженные модули текущего процесса не искажают результат.
+"""
+import subprocess
+import sys
+from typing import NamedTuple
+
+from . import sources
+
+# Тяжёлые библиотеки, которые загружаются лениво, только когда запрос действительно их использует
+LAZY_LIBRARIES = ("newspaper", "wikipedia", "selenium.webdriver", "selenium_stealth", "webdriver_manager.chrome")
+
+
+class ImportTime(NamedTuple):
+    """
+    Время импорта одного модуля по данным -X importtime.
+
+    Атрибуты:
+        module (str): Имя модуля.
+        depth (int): Вложенность импорта (0 — импортирован напрямую замеряемым кодом).
+        self_ms (float): Время выполнения самого модуля в миллисекундах.
+        cumulative_ms (float): Время вместе с модулями, которые он импортировал.
+    """
+    module: str
+    depth: int
+    self_ms: float
+    cumulative_ms: float
+
+
+def import_times(code: str, cwd: str) -> list[ImportTime]:
+    """Выполняет `code` в новом интерпретаторе и возвращает время импорта каждого модуля."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd,
+        capture_output=True,
+        text=True
+    )
+    if completed.returncode:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else code)
+    times = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        times.append(ImportTime(name.strip(), depth, int(self_us) / 1000, int(cumulative_us) / 1000))
+    return times
+
+
+def subtree(times: list[ImportTime], module: str) -> list[ImportTime]:
+    """Возвращает модуль, импортированный напрямую, вместе со всеми модулями, которые он загрузил."""
+    # -X importtime выводит вложенные импорты перед модулем, который их выполнил
+    end = next(index for index, item in enumerate(times) if item.depth == 0 and item.module == module)
+    start = end
+    while start > 0 and times[start - 1].depth > 0:
+        start -= 1
+    return times[start:end + 1]
+
+
+def profile_startup(cwd: str, top: int = 15) -> None:
+    """
+    Выводит, сколько стоит импорт main и его самых тяжёлых зависимостей,
+    сколько добавляет загрузка каждого источника статей и изображений (app.sources)
+    и каждой тяжёлой библиотеки, которая импортируется только при первом запросе к ней.
+
+    Параметры:
+        cwd (str): Каталог, из которого импортируется main.
+        top (int): Сколько самых тяжёлых модулей показать.
+    """
+    base = subtree(import_times("import main", cwd), "main")
+    print(f"import main: {base[-1].cumulative_ms:.0f} ms, {len(base)} modules")
+    print(f"  {'module':<40} {'cumulative ms':>14} {'self ms':>9}")
+    heaviest = sorted((item for item in base if 1 <= item.depth <= 2), key=lambda item: -item.cumulative_ms)
+    for item in heaviest[:top]:
+        print(f"  {item.module:<40} {item.cumulative_ms:>14.1f} {item.self_ms:>9.1f}")
+
+    print("Sources (loaded on first use):")
+    for kind in (sources.ARTICLE, sources.PICTURE):
+        for name in sources.names(kind):
+            code = f"from app import sources; sources.load({kind!r}, {name!r})"
+            _print_added(f"{kind}/{name}", code, cwd, base, sources.get_source(kind, name).target)
+    print("Libraries (imported only when a request needs them):")
+    for library in LAZY_LIBRARIES:
+        _print_added(library, f"import {library}", cwd, base)
+
+
+def _print_added(label: str, code: str, cwd: str, base: list[ImportTime], note: str = "") -> None:
+    try:
+        times = import_times(f"import main; {code}", cwd)
+    except Exception as err:
+        print(f"  {label}: failed to load \n {err}")
+        return
+    # Учитывается только собственное время модулей, которых не было после запуска интерпретатора и импорта main
+    main_start = times.index(subtree(times, "main")[0])
+    known = {item.module for item in base} | {item.module for item in times[:main_start]}
+    added = [item for item in times if item.module not in known]
+    print(
+        f"  {label:<28} +{sum(item.self_ms for item in added):>5.0f} ms, +{len(added):>3} modules"
+        + (f" ({note})" if note else "")
+    )
@@ -1,28 +1,3 @@
-def connection_problems_decorator(func):
-    """
-    Декоратор, который бесконечно повторяет выполнение функции
-    до тех пор, пока она не выполнится успешно, перехватывая и
-    выводя любые возникающие исключения.
-
-    Аргументы:
-        func (callable): Функция, которую нужно декорировать.
-
-    Возвращает:
-        callable: Обернутая функция, которая будет продолжать
-        вызывать оригинальную функцию до тех пор, пока она не
-        выполнится без ошибок.
-    """
-    def wrapper(*args, **kwargs):
-        while True:
-            try:
-                return func(*args, **kwargs)
-            except Exception as err:
-                print(f'Exception in {func.__name__} \n {err}')
-                continue
-
-    return wrapper
-
-
 def shorten_text_by_paragraphs(text: str, max_chars: int) -> str:
     """
     Сокращает текст до заданного максимального количества символов,
@@ -52,4 +27,20 @@ def shorten_text_by_paragraphs(text: str, max_chars: int) -> str:
         else:
             break
 
-    return '\n\n'.join(result)
\ No newline at end of file
+    return '\n\n'.join(result)
+
+
+def normalize(text):
+    """
+    Нормализует текст для упрощения сравнения строк.
+
+    Приводит строку к нижнему регистру, удаляет запятые и сортирует слова в алфавитном порядке.
+    Это помогает сравнивать строки, игнорируя порядок слов и пунктуацию.
+
+    Args:
+        text (str): Исходный текст для нормализации.
+
+    Returns:
+        str: Нормализованная строка с отсортированными словами в нижнем регистре без запятых.
+    """
+    return ' '.join(sorted(text.lower().replace(',', '').split()))
@@ -0,0 +1,7 @@
+"""
+Бенчмарк конвейера создания и рассылки постов.
+
+Конвейер запускается целиком, но вместо Telegram, GigaChat, Яндекса и сайтов
+со статьями используются локальные заглушки (bench.fakes) с настраиваемыми
+задержками и долей ошибок. Подробнее — в bench.runner.
+"""
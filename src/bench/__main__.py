@@ -0,0 +1,3 @@
+from .runner import _main
+
+_main()
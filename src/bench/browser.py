@@ -0,0 +1,146 @@
+"""
+Замер загрузки страниц выдачи в браузере Selenium: полный режим против облегчённого.
+
+Страницы выдачи отдают локальные заглушки (bench.fakes) вместе с тяжёлыми ресурсами:
+стилями, шрифтами, видео, миниатюрами, счётчиком и рекламным скриптом. Каждый режим
+запускается в отдельном процессе со своим браузером; для каждой страницы замеряется
+время от driver.get до появления результатов выдачи, память JS-кучи и число узлов
+DOM (CDP Performance.getMetrics), а также суммарная память процессов браузера.
+
+Запуск (нужны Chrome и ChromeDriver):
+    python -m bench browser --pages 10 --latency static=0.2
+"""
+import multiprocessing
+import os
+import queue as queues
+import time
+
+from .fakes import SERVICES, Fault, FakeServices
+from .runner import summarize, topics
+
+MODES = ("full", "lean")
+
+
+def tree_rss_mb(pid: int) -> float:
+    """Возвращает суммарную резидентную память процесса и всех его потомков в МБ (Linux /proc)."""
+    children: dict[int, list[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as file:
+                parent = int(file.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+    total_kb = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/status") as file:
+                total_kb += next((int(line.split()[1]) for line in file if line.startswith("VmRSS:")), 0)
+        except OSError:
+            continue
+    return total_kb / 1024
+
+
+def _mode(environ: dict[str, str], titles: list[str], queue) -> None:
+    """Открывает страницы выдачи в одном режиме в дочернем процессе и кладёт результат в очередь."""
+    os.environ.update(environ)
+    # Модули читают настройки при импорте, поэтому импортируются после настройки окружения
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+    from yandex.backends import image_page_url, search_page_url
+    from yandex.browser import IMAGE_SELECTOR, URL_SELECTOR, SDriver
+    from yandex.pool import driver_pool, image_driver_pool
+
+    samples: dict[str, dict[str, list[float]]] = {}
+    for title in titles:
+        for kind, url, selector in (
+                ("urls", search_page_url(title), URL_SELECTOR),
+                ("images", image_page_url(title), IMAGE_SELECTOR),
+        ):
+            with SDriver(images=kind == "images") as driver:
+                driver.execute_cdp_cmd("Performance.enable", {})
+                started = time.perf_counter()
+                driver.get(url)
+                WebDriverWait(driver, 30).until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, selector)))
+                seconds = time.perf_counter() - started
+                page = {
+                    metric["name"]: metric["value"]
+                    for metric in driver.execute_cdp_cmd("Performance.getMetrics", {})["metrics"]
+                }
+                values = samples.setdefault(kind, {"load": [], "heap_mb": [], "nodes": [], "rss_mb": []})
+                values["load"].append(seconds)
+                values["heap_mb"].append(page.get("JSHeapUsedSize", 0) / 1024 / 1024)
+                values["nodes"].append(page.get("Nodes", 0))
+                values["rss_mb"].append(tree_rss_mb(driver.service.process.pid))
+    driver_pool.close()
+    image_driver_pool.close()
+    queue.put({
+        kind: {name: summarize(series) for name, series in values.items()}
+        for kind, values in samples.items()
+    })
+
+
+def run_mode(environ: dict[str, str], titles: list[str]) -> dict:
+    """Запускает замер режима в отдельном процессе и возвращает его результат."""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_mode, args=(environ, titles, queue))
+    process.start()
+    while True:
+        try:
+            result = queue.get(timeout=1)
+            break
+        except queues.Empty:
+            # Без Chrome или ChromeDriver дочерний процесс завершается, не положив результат
+            if not process.is_alive():
+                raise RuntimeError(f"Browser benchmark process exited with code {process.exitcode}")
+    process.join()
+    return result
+
+
+def run_browser(pages: int, faults: dict[str, Fault], modes: tuple[str, ...] = MODES) -> dict:
+    """
+    Замеряет загрузку `pages` страниц поиска статей и изображений в каждом режиме браузера.
+
+    Возвращает:
+        dict: Для каждого режима — перцентили времени загрузки, памяти и числа узлов
+            по видам страниц, а также число запросов к заглушкам (заблокированные
+            ресурсы до заглушек не доходят).
+    """
+    titles = topics(pages)
+    results = {}
+    with FakeServices(faults) as fakes:
+        for mode in modes:
+            before = dict(fakes.requests)
+            environ = {
+                "SEARCH_BASE_URL": fakes.url,
+                "DRIVER_LEAN_MODE": str(mode == "lean").lower(),
+                "DRIVER_POOL_SIZE": "1",
+                "DRIVER_WARM_SIZE": "1",
+            }
+            results[mode] = {
+                "pages": run_mode(environ, titles),
+                "requests": {service: fakes.requests[service] - before[service] for service in SERVICES},
+            }
+            print(format_mode(mode, results[mode]))
+    return {"pages": pages, "faults": {service: fault._asdict() for service, fault in faults.items()}, "modes": results}
+
+
+def format_mode(mode: str, result: dict) -> str:
+    """Возвращает результат режима в виде текстовой таблицы."""
+    lines = [
+        f"{mode}: requests {', '.join(f'{service}={count}' for service, count in result['requests'].items() if count)}",
+        f"  {'page':<8}{'load p50':>10}{'load p95':>10}{'heap MB':>9}{'nodes':>8}{'RSS MB':>9}",
+    ]
+    for kind, values in result["pages"].items():
+        lines.append(
+            f"  {kind:<8}{values['load']['p50']:>10.3f}{values['load']['p95']:>10.3f}"
+            f"{values['heap_mb']['p50']:>9.1f}{values['nodes']['p50']:>8.0f}{values['rss_mb']['p50']:>9.0f}"
+        )
+    return "\n".join(lines)
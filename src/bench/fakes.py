@@ -0,0 +1,308 @@
+"""
+Локальные заглушки внешних сервисов для бенчмарка.
+
+Один HTTP-сервер отвечает за все сервисы, различая их по пути запроса:
+    /bot<token>/<method>          — Telegram Bot API (getMe, sendPhoto);
+    /api/v2/oauth                 — получение токена GigaChat;
+    /api/v1/chat/completions      — генерация GigaChat, в том числе потоковая (SSE);
+    /search/, /images/search      — страницы выдачи Яндекса с теми же CSS-классами;
+    /img/<n>.jpg                  — изображения из выдачи;
+    /articles/<n>                 — сайт со статьями;
+    /static/, /metrika/, /ads/    — тяжёлые ресурсы страниц выдачи: стили, шрифты, видео,
+                                    миниатюры, счётчик и рекламный скрипт (для замеров браузера).
+
+Для каждого сервиса можно задать задержку ответа и долю ответов с ошибкой 500.
+"""
+import functools
+import io
+import json
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple, Optional
+from urllib.parse import parse_qs, quote, urlparse
+
+from PIL import Image
+
+SERVICES = ("telegram", "gigachat", "search", "articles", "static")
+
+# Скрипт, который, как счётчики и реклама, занимает процессор и память страницы
+TRACKER_JS = (
+    "window.__events = window.__events || [];"
+    "for (let i = 0; i < 200000; i++) { window.__events.push({id: i, label: 'event-' + i}); }"
+)
+
+WORDS = (
+    "история город музей народ культура традиция архитектура путешествие праздник"
+    " искусство природа озеро гора древний известный столица собор площадь улица"
+    " и в на с по не что как это для был его от"
+).split()
+
+
+class Fault(NamedTuple):
+    """
+    Поведение заглушки одного сервиса.
+
+    Атрибуты:
+        latency (float): Задержка перед ответом в секундах.
+        jitter (float): Случайная добавка к задержке от 0 до jitter секунд.
+        failure_rate (float): Доля запросов, на которые сервис отвечает ошибкой 500.
+    """
+    latency: float = 0.0
+    jitter: float = 0.0
+    failure_rate: float = 0.0
+
+    def apply(self) -> bool:
+        """Выдерживает задержку и возвращает True, если запрос должен завершиться ошибкой."""
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        return random.random() < self.failure_rate
+
+
+def russian_text(seed: str, paragraphs: int = 6) -> list[str]:
+    """Возвращает детерминированный по seed текст из абзацев на русском языке."""
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(WORDS) for _ in range(45)).capitalize() + "."
+        for _ in range(paragraphs)
+    ]
+
+
+def jpeg(seed: int, size: int = 640) -> bytes:
+    """Возвращает JPEG из случайных цветных блоков, чтобы изображения не считались дубликатами."""
+    rng = random.Random(seed)
+    image = Image.new("RGB", (8, 8))
+    image.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(64)])
+    buffer = io.BytesIO()
+    image.resize((size, size)).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+@functools.cache
+def static_resource(name: str) -> tuple[bytes, str]:
+    """Возвращает содержимое и тип тяжёлого ресурса страницы выдачи."""
+    if name.endswith(".css"):
+        rules = "".join(f".serp-item-{i}{{margin:{i % 7}px;color:#{i % 4096:03x};}}" for i in range(20000))
+        fonts = "".join(
+            f"@font-face{{font-family:f{i};src:url(/static/font-{i}.woff2)}} body{{font-family:f{i}}}"
+            for i in range(3)
+        )
+        return (fonts + rules).encode(), "text/css"
+    if name.endswith(".woff2"):
+        return random.Random(name).randbytes(200 * 1024), "font/woff2"
+    if name.endswith(".mp4"):
+        return random.Random(name).randbytes(1024 * 1024), "video/mp4"
+    if name.endswith(".jpg"):
+        return jpeg(zlib.crc32(name.encode()), size=320), "image/jpeg"
+    return TRACKER_JS.encode(), "application/javascript"
+
+
+def serp_head() -> str:
+    """Возвращает заголовок страницы выдачи с подключением тяжёлых ресурсов."""
+    return (
+        "<link rel='stylesheet' href='/static/serp.css'>"
+        "<script src='/metrika/tag.js'></script>"
+        "<script src='/ads/banner.js'></script>"
+    )
+
+
+def serp_extras(seed: int, thumbnails: int = 10) -> str:
+    """Возвращает поле ввода, видео и миниатюры, которые есть на настоящей странице выдачи."""
+    images = "".join(f"<img src='/static/thumb-{seed}-{i}.jpg' width='160'>" for i in range(thumbnails))
+    return f"<input name='text'><video src='/static/promo.mp4' autoplay muted preload='auto'></video>{images}"
+
+
+class FakeServices:
+    """
+    HTTP-сервер с заглушками Telegram, GigaChat, выдачи Яндекса и сайта со статьями.
+
+    Пример использования:
+        with FakeServices({"gigachat": Fault(latency=0.5)}) as fakes:
+            os.environ.update(fakes.environ())
+            ...
+            print(fakes.requests)
+    """
+
+    def __init__(
+            self,
+            faults: Optional[dict[str, Fault]] = None,
+            results: int = 5,
+            host: str = "127.0.0.1",
+            port: int = 0
+    ):
+        self.faults = {service: Fault() for service in SERVICES}
+        self.faults.update(faults or {})
+        self.results = results
+        self.requests = {service: 0 for service in SERVICES}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def environ(self) -> dict[str, str]:
+        """Возвращает переменные окружения, направляющие программу на заглушки."""
+        return {
+            "TELEGRAM_BASE_URL": f"{self.url}/bot",
+            "TOKEN_URL": f"{self.url}/api/v2/oauth",
+            "COMPLETIONS_URL": f"{self.url}/api/v1/chat/completions",
+            "SEARCH_BASE_URL": self.url,
+            "SEARCH_BACKEND": "http",
+        }
+
+    def start(self) -> "FakeServices":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="bench-fakes", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def count(self, service: str) -> None:
+        with self._lock:
+            self.requests[service] += 1
+
+
+def _make_handler(fakes: FakeServices):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            self._dispatch()
+
+        def do_POST(self):
+            self._dispatch()
+
+        def log_message(self, format, *args):
+            pass
+
+        def _dispatch(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            url = urlparse(self.path)
+            if url.path.startswith("/bot"):
+                service, handler = "telegram", self._telegram
+            elif url.path.startswith("/api/"):
+                service, handler = "gigachat", self._gigachat
+            elif url.path.startswith(("/search", "/images", "/img/")):
+                service, handler = "search", self._search
+            elif url.path.startswith("/articles/"):
+                service, handler = "articles", self._article
+            elif url.path.startswith(("/static/", "/metrika/", "/ads/")):
+                service, handler = "static", self._static
+            else:
+                self._send(404, b"Not found", "text/plain")
+                return
+            fakes.count(service)
+            if fakes.faults[service].apply():
+                if service == "telegram":
+                    self._json({"ok": False, "error_code": 500, "description": "Internal Server Error"}, 500)
+                else:
+                    self._send(500, b"Internal Server Error", "text/plain")
+                return
+            handler(url, body)
+
+        def _telegram(self, url, body):
+            method = url.path.rsplit("/", 1)[-1]
+            if method == "getMe":
+                result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+            elif method == "sendPhoto":
+                chat = re.search(rb'name="chat_id"\r\n\r\n([^\r]*)', body)
+                file_id = re.search(rb'name="photo"\r\n\r\n([^\r]*)', body)
+                file_id = file_id.group(1).decode() if file_id else uuid.uuid4().hex
+                result = {
+                    "message_id": random.randrange(1, 10 ** 6),
+                    "date": int(time.time()),
+                    "chat": {"id": -100, "type": "channel", "title": chat.group(1).decode() if chat else "bench"},
+                    "photo": [{"file_id": file_id, "file_unique_id": file_id[:16], "width": 640, "height": 640}],
+                }
+            else:
+                result = True
+            self._json({"ok": True, "result": result})
+
+        def _gigachat(self, url, body):
+            if url.path.endswith("/oauth"):
+                self._json({"access_token": uuid.uuid4().hex, "expires_at": int((time.time() + 1800) * 1000)})
+                return
+            request = json.loads(body or b"{}")
+            topic = request.get("messages", [{}])[-1].get("content", "")
+            text = "\n\n".join(russian_text(topic, paragraphs=8))
+            if not request.get("stream"):
+                self._json({"choices": [{"message": {"role": "assistant", "content": text}}]})
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            try:
+                for start in range(0, len(text), 40):
+                    chunk = {"choices": [{"delta": {"content": text[start:start + 40]}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+                self.wfile.write(b"data: [DONE]\n\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # Клиент закрыл поток, набрав нужную длину текста
+                pass
+            self.close_connection = True
+
+        def _search(self, url, body):
+            query = parse_qs(url.query).get("text", [""])[0]
+            seed = zlib.crc32(query.encode()) % 10 ** 6
+            if url.path.startswith("/img/"):
+                number = int(re.sub(r"\D", "", url.path) or 0)
+                self._send(200, jpeg(number), "image/jpeg")
+            elif url.path.startswith("/images"):
+                items = "".join(
+                    f'<img class="ImagesContentImage-Image" src="/img/{seed * 100 + i}.jpg">'
+                    for i in range(fakes.results)
+                )
+                self._html(serp_extras(seed, thumbnails=0) + items, head=serp_head())
+            else:
+                items = "".join(
+                    f'<li><a class="Link organic__greenurl" href="/articles/{i}?q={quote(query)}">Статья {i}</a></li>'
+                    for i in range(fakes.results)
+                )
+                self._html(f"{serp_extras(seed)}<ul>{items}</ul>", head=serp_head())
+
+        def _static(self, url, body):
+            content, content_type = static_resource(url.path.rsplit("/", 1)[-1])
+            self._send(200, content, content_type)
+
+        def _article(self, url, body):
+            paragraphs = "".join(f"<p>{paragraph}</p>" for paragraph in russian_text(self.path))
+            self._html(f"<h1>Статья</h1><article>{paragraphs}</article>", title="Статья")
+
+        def _html(self, content: str, title: str = "Поиск", head: str = ""):
+            page = (
+                f"<html><head><meta charset='utf-8'><title>{title}</title>{head}</head>"
+                f"<body>{content}</body></html>"
+            )
+            self._send(200, page.encode("utf-8"), "text/html; charset=utf-8")
+
+        def _json(self, data, status: int = 200):
+            self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"), "application/json")
+
+        def _send(self, status: int, body: bytes, content_type: str):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
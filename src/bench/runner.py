@@ -0,0 +1,332 @@
+"""
+Бенчмарк полного конвейера main против локальных заглушек внешних сервисов.
+
+Каждый сценарий (число одновременно обрабатываемых тем) запускается в отдельном
+процессе, чтобы пулы соединений, кеши и пиковое потребление памяти не переходили
+из одного сценария в другой. Время этапов собирается через наблюдателя app.metrics.
+
+Запуск:
+    python -m bench run --topics 20 --workers 1,4,8 --latency gigachat=0.5 --failure-rate telegram=0.05
+Сравнение с предыдущим запуском:
+    python -m bench compare bench_results/old.json bench_results/new.json
+Загрузка страниц выдачи в полном и облегчённом режимах браузера (bench.browser):
+    python -m bench browser --pages 10 --latency static=0.2
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+from .fakes import SERVICES, Fault, FakeServices, russian_text
+
+TOPICS = (
+    "Эрмитаж", "Байкал", "Казанский собор", "Кижи", "Эльбрус", "Суздаль", "Петергоф", "Алтай",
+    "Исаакиевский собор", "Онежское озеро", "Красная площадь", "Мамаев курган", "Ладожское озеро",
+    "Ростов Великий", "Куршская коса", "Царское Село", "Соловецкие острова", "Камчатка",
+)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Возвращает перцентиль q (от 0 до 100) методом ближайшего ранга."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, round(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    """Возвращает количество, среднее и перцентили p50/p95/p99 выборки времён."""
+    return {
+        "count": len(samples),
+        "mean": statistics.fmean(samples) if samples else 0.0,
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+    }
+
+
+def topics(count: int) -> list[str]:
+    """Возвращает `count` тем, добавляя номер, если стандартных тем не хватает."""
+    return [
+        TOPICS[i % len(TOPICS)] + ("" if i < len(TOPICS) else f" {i // len(TOPICS)}")
+        for i in range(count)
+    ]
+
+
+def write_wiki_dump(path: str, titles: list[str]) -> None:
+    """Записывает небольшой дамп Википедии со статьями на все темы бенчмарка."""
+    pages = "".join(
+        f"<page><title>{title}</title><ns>0</ns><revision><text>{' '.join(russian_text(title))}</text></revision></page>"
+        for title in titles
+    )
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(f"<mediawiki>{pages}</mediawiki>")
+
+
+def _scenario(environ: dict[str, str], titles: list[str], workers: int, verbose: bool, queue) -> None:
+    """Выполняет один сценарий в дочернем процессе и кладёт результат в очередь."""
+    if not verbose:
+        sys.stdout = open(os.devnull, "w")
+    directory = environ["BENCH_DIR"]
+    os.environ.update(environ)
+    os.environ.update({
+        "IMAGE_INDEX_PATH": os.path.join(directory, f"posted_images-{workers}.json"),
+        "OUTBOX_PATH": os.path.join(directory, f"outbox-{workers}.sqlite3"),
+        "BATCH_WORKERS": str(workers),
+        "BATCH_ARTICLE_CONCURRENCY": str(workers),
+        "BATCH_POST_CONCURRENCY": str(workers),
+        "BATCH_PICTURE_CONCURRENCY": str(workers),
+        "BATCH_PUBLISH_CONCURRENCY": str(workers),
+    })
+    # Модули читают настройки при импорте, поэтому импортируются после настройки окружения
+    from app import metrics, resilience
+    import main
+
+    samples: dict[str, list[float]] = {}
+    failures: dict[str, int] = {}
+
+    def observe(name: str, seconds: float, ok: bool, labels: dict[str, str]) -> None:
+        samples.setdefault(name, []).append(seconds)
+        if not ok:
+            failures[name] = failures.get(name, 0) + 1
+
+    metrics.add_observer(observe)
+    source = os.path.join(directory, f"topics-{workers}.txt")
+    manifest = os.path.join(directory, f"manifest-{workers}.jsonl")
+    with open(source, "w", encoding="utf-8") as file:
+        file.write("\n".join(titles) + "\n")
+
+    started = time.perf_counter()
+    main.batch_main(source, manifest)
+    seconds = time.perf_counter() - started
+
+    with open(manifest, encoding="utf-8") as file:
+        records = [json.loads(line) for line in file if line.strip()]
+    samples["topic"] = [record["seconds"] for record in records]
+    queue.put({
+        "workers": workers,
+        "topics": len(records),
+        "ok": sum(record["ok"] for record in records),
+        "seconds": seconds,
+        "throughput": len(records) / seconds if seconds else 0.0,
+        # ru_maxrss в Linux измеряется в килобайтах
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "stages": {name: summarize(values) for name, values in sorted(samples.items())},
+        "failures": failures,
+        "dependencies": resilience.stats(),
+    })
+
+
+def run_scenario(environ: dict[str, str], titles: list[str], workers: int, verbose: bool = False) -> dict:
+    """Запускает сценарий в отдельном процессе и возвращает его результат."""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_scenario, args=(environ, titles, workers, verbose, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def run(
+        count: int,
+        workers: list[int],
+        faults: dict[str, Fault],
+        channels: int = 3,
+        cache: bool = False,
+        verbose: bool = False
+) -> dict:
+    """
+    Выполняет бенчмарк для каждого значения числа одновременно обрабатываемых тем.
+
+    Параметры:
+        count (int): Количество тем в каждом сценарии.
+        workers (list[int]): Значения batch_workers (и ограничений этапов) по сценариям.
+        faults (dict[str, Fault]): Задержки и доли ошибок заглушек по сервисам.
+        channels (int): Количество Telegram-каналов для рассылки.
+        cache (bool): Использовать ли дисковый кеш (общий для всех сценариев).
+        verbose (bool): Выводить ли сообщения конвейера (посты, ошибки отправки).
+
+    Возвращает:
+        dict: Параметры запуска и результаты сценариев.
+    """
+    from wiki.offline import build_index
+
+    titles = topics(count)
+    with tempfile.TemporaryDirectory(prefix="bench-") as directory, FakeServices(faults) as fakes:
+        dump = os.path.join(directory, "wiki.xml")
+        write_wiki_dump(dump, titles)
+        build_index(dump, os.path.join(directory, "wiki"))
+        environ = {
+            **fakes.environ(),
+            "BENCH_DIR": directory,
+            "AUTHORIZATION_SB_CODE": "bench",
+            "BOT_TOKEN": "123:bench",
+            "CHANEL_NAMES": json.dumps([f"@bench{i}" for i in range(channels)]),
+            "WIKI_OFFLINE_DIR": os.path.join(directory, "wiki"),
+            "CACHE_ENABLED": str(cache).lower(),
+            "CACHE_PATH": os.path.join(directory, "cache.sqlite3"),
+            "TOKEN_STORE_PATH": "",
+            # Ограничения частоты Telegram не относятся к заглушке и скрыли бы время остальных этапов
+            "SEND_RATE_PER_SECOND": "0",
+            "SEND_CHAT_INTERVAL_SECONDS": "0",
+        }
+        scenarios = []
+        for value in workers:
+            result = run_scenario(environ, titles, value, verbose)
+            print(format_scenario(result))
+            scenarios.append(result)
+        requests_made = dict(fakes.requests)
+
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "topics": count,
+        "channels": channels,
+        "cache": cache,
+        "faults": {service: fault._asdict() for service, fault in faults.items()},
+        "requests": requests_made,
+        "scenarios": scenarios,
+    }
+
+
+def format_scenario(result: dict) -> str:
+    """Возвращает результат сценария в виде текстовой таблицы."""
+    lines = [
+        f"workers={result['workers']}: {result['ok']}/{result['topics']} ok in {result['seconds']:.2f}s, "
+        f"{result['throughput']:.2f} topics/s, peak RSS {result['peak_rss_mb']:.0f} MB",
+        f"  {'stage':<24}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}",
+    ]
+    for name, stage in result["stages"].items():
+        lines.append(
+            f"  {name:<24}{stage['count']:>7}{stage['p50']:>9.3f}{stage['p95']:>9.3f}{stage['p99']:>9.3f}"
+        )
+    return "\n".join(lines)
+
+
+def compare(old: dict, new: dict, threshold: float = 0.1) -> list[str]:
+    """
+    Сравнивает два запуска и возвращает описания регрессий.
+
+    Регрессией считается падение пропускной способности или рост p95 этапа
+    больше чем на долю `threshold` в сценарии с тем же числом workers.
+    """
+    regressions = []
+    old_scenarios = {scenario["workers"]: scenario for scenario in old["scenarios"]}
+    for scenario in new["scenarios"]:
+        before = old_scenarios.get(scenario["workers"])
+        if before is None:
+            continue
+        workers = scenario["workers"]
+        if scenario["throughput"] < before["throughput"] * (1 - threshold):
+            regressions.append(
+                f"workers={workers}: throughput {before['throughput']:.2f} -> {scenario['throughput']:.2f} topics/s"
+            )
+        for name, stage in scenario["stages"].items():
+            old_stage = before["stages"].get(name)
+            if old_stage and stage["p95"] > old_stage["p95"] * (1 + threshold):
+                regressions.append(
+                    f"workers={workers}: {name} p95 {old_stage['p95']:.3f} -> {stage['p95']:.3f}s"
+                )
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _parse_service_values(values: list[str], option: str) -> dict[str, float]:
+    parsed = {}
+    for value in values:
+        service, _, number = value.partition("=")
+        if service not in SERVICES or not number:
+            raise SystemExit(f"{option}: expected SERVICE=NUMBER with SERVICE in {', '.join(SERVICES)}, got {value}")
+        parsed[service] = float(number)
+    return parsed
+
+
+def _save(results: dict, out: str) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
+    print(f"Results saved to {out}")
+
+
+def _main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк конвейера с заглушками внешних сервисов")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="выполнить бенчмарк")
+    run_parser.add_argument("--topics", type=int, default=10, help="количество тем в сценарии")
+    run_parser.add_argument("--workers", default="1,4", help="значения batch_workers через запятую")
+    run_parser.add_argument("--channels", type=int, default=3, help="количество Telegram-каналов")
+    run_parser.add_argument("--latency", action="append", default=[], metavar="SERVICE=SECONDS")
+    run_parser.add_argument("--jitter", action="append", default=[], metavar="SERVICE=SECONDS")
+    run_parser.add_argument("--failure-rate", action="append", default=[], metavar="SERVICE=SHARE")
+    run_parser.add_argument("--cache", action="store_true", help="включить дисковый кеш")
+    run_parser.add_argument("--verbose", action="store_true", help="выводить сообщения конвейера")
+    run_parser.add_argument("--out", help="файл результатов (по умолчанию bench_results/<время>.json)")
+    compare_parser = commands.add_parser("compare", help="сравнить два запуска")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="допустимое ухудшение, доля")
+    browser_parser = commands.add_parser("browser", help="сравнить полный и облегчённый режимы браузера")
+    browser_parser.add_argument("--pages", type=int, default=10, help="количество страниц каждого вида")
+    browser_parser.add_argument("--modes", default="full,lean", help="режимы браузера через запятую")
+    browser_parser.add_argument("--latency", action="append", default=[], metavar="SERVICE=SECONDS")
+    browser_parser.add_argument("--out", help="файл результатов (по умолчанию bench_results/browser-<время>.json)")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.old, encoding="utf-8") as file:
+            old = json.load(file)
+        with open(args.new, encoding="utf-8") as file:
+            new = json.load(file)
+        regressions = compare(old, new, args.threshold)
+        for regression in regressions:
+            print(regression)
+        print(f"{len(regressions)} regressions")
+        sys.exit(1 if regressions else 0)
+
+    if args.command == "browser":
+        from .browser import run_browser
+
+        latency = _parse_service_values(args.latency, "--latency")
+        results = run_browser(
+            pages=args.pages,
+            faults={service: Fault(latency.get(service, 0.0)) for service in SERVICES},
+            modes=tuple(mode.strip() for mode in args.modes.split(",") if mode.strip())
+        )
+        _save(results, args.out or os.path.join("bench_results", f"browser-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"))
+        return
+
+    latency = _parse_service_values(args.latency, "--latency")
+    jitter = _parse_service_values(args.jitter, "--jitter")
+    failure_rate = _parse_service_values(args.failure_rate, "--failure-rate")
+    faults = {
+        service: Fault(latency.get(service, 0.0), jitter.get(service, 0.0), failure_rate.get(service, 0.0))
+        for service in SERVICES
+    }
+    results = run(
+        count=args.topics,
+        workers=[int(value) for value in args.workers.split(",")],
+        faults=faults,
+        channels=args.channels,
+        cache=args.cache,
+        verbose=args.verbose
+    )
+    _save(results, args.out or os.path.join("bench_results", f"{datetime.datetime.now():%Y%m%d-%H%M%S}.json"))
+
@@ -0,0 +1,103 @@
+import hashlib
+import re
+from typing import Optional
+
+from app.cache import DiskCache
+from app.utils import normalize
+
+NAMESPACE = "generation"
+INDEX_NAMESPACE = "generation_index"
+
+# Количество хеш-функций MinHash и модуль для их перестановок (простое число Мерсенна 2^61 - 1)
+SIGNATURE_SIZE = 32
+PRIME = (1 << 61) - 1
+_PERMUTATIONS = [
+    (int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "little") % PRIME | 1,
+     int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "little") % PRIME)
+    for i in range(SIGNATURE_SIZE)
+]
+# Сколько похожих тем хранится для одного контекста
+INDEX_SIZE = 20
+
+
+def topic_key(topic: str) -> str:
+    """
+    Нормализует тему для ключа кеша: без регистра, пунктуации и порядка слов (app.utils.normalize).
+    """
+    return normalize(re.sub(r"[^\w\s]", " ", topic))
+
+
+def fingerprint(context: str, max_chars: Optional[int] = None) -> str:
+    """Возвращает отпечаток системного сообщения (промпт и сжатый контекст) и бюджета длины ответа."""
+    return hashlib.sha256(f"{max_chars}\0{context}".encode("utf-8")).hexdigest()[:32]
+
+
+def shingles(text: str, size: int = 3) -> set[str]:
+    """Возвращает множество символьных n-грамм строки, дополненной пробелами по краям."""
+    padded = f" {text} "
+    return {padded[i:i + size] for i in range(max(1, len(padded) - size + 1))}
+
+
+def minhash(text: str) -> tuple[int, ...]:
+    """Возвращает MinHash-подпись множества шинглов текста."""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        for shingle in shingles(text)
+    ]
+    return tuple(min((a * value + b) % PRIME for value in hashes) for a, b in _PERMUTATIONS)
+
+
+def similarity(first: tuple[int, ...], second: tuple[int, ...]) -> float:
+    """Оценивает коэффициент Жаккара двух множеств по их MinHash-подписям."""
+    return sum(x == y for x, y in zip(first, second)) / len(first)
+
+
+class GenerationCache:
+    """
+    Кеш сгенерированных постов поверх общего дискового кеша (app.cache.DiskCache).
+
+    Ключ записи — нормализованная тема и отпечаток системного сообщения, поэтому
+    темы, отличающиеся только регистром, пунктуацией или порядком слов, а также повторы
+    неудавшихся публикаций обслуживаются без обращения к GigaChat.
+
+    Если задан порог similarity_threshold, для каждого отпечатка контекста хранятся
+    MinHash-подписи тем, и при промахе ищется почти совпадающая тема
+    (например, отличающаяся окончанием) с тем же контекстом.
+
+    Пример использования:
+        cache = GenerationCache(get_cache(), ttl=86400, similarity_threshold=0.8)
+        post = cache.get(topic, context, max_chars)
+    """
+
+    def __init__(self, disk_cache: DiskCache, ttl: float, similarity_threshold: Optional[float] = None):
+        self.disk_cache = disk_cache
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+
+    def get(self, topic: str, context: str, max_chars: Optional[int] = None) -> Optional[str]:
+        """Возвращает сохранённый ответ на тему с тем же контекстом, либо None."""
+        key = topic_key(topic)
+        context_print = fingerprint(context, max_chars)
+        answer = self.disk_cache.get(NAMESPACE, f"{context_print}:{key}")
+        if answer is not None or self.similarity_threshold is None:
+            return answer
+        signature = minhash(key)
+        candidates = self.disk_cache.get(INDEX_NAMESPACE, context_print, [])
+        best = max(candidates, key=lambda candidate: similarity(signature, candidate[1]), default=None)
+        if best is None or similarity(signature, best[1]) < self.similarity_threshold:
+            return None
+        return self.disk_cache.get(NAMESPACE, f"{context_print}:{best[0]}")
+
+    def set(self, topic: str, context: str, answer: str, max_chars: Optional[int] = None) -> None:
+        """Сохраняет ответ и, если включён поиск похожих тем, добавляет тему в индекс контекста."""
+        key = topic_key(topic)
+        context_print = fingerprint(context, max_chars)
+        self.disk_cache.set(NAMESPACE, f"{context_print}:{key}", answer, self.ttl)
+        if self.similarity_threshold is None:
+            return
+        candidates = [
+            candidate for candidate in self.disk_cache.get(INDEX_NAMESPACE, context_print, [])
+            if candidate[0] != key
+        ]
+        candidates.append((key, minhash(key)))
+        self.disk_cache.set(INDEX_NAMESPACE, context_print, candidates[-INDEX_SIZE:], self.ttl)
@@ -1,52 +1,58 @@
-import json
-import uuid
+import functools
+from typing import Optional
 
-import requests
-from cachetools import TTLCache, cached
+import httpx
 
-from .config import Config, SbUrls
-from app.utils import connection_problems_decorator
+from app import metrics
+from app.cache import get_cache
+from app.resilience import call_with_retry, register_fatal
+from app.settings import CacheSettings
+from .cache import GenerationCache
+from .client import GigaChatClient
+from .config import Config
 
-config = Config()
-urls = SbUrls()
+# Ошибки авторизации и неверные запросы повторять бессмысленно, в отличие от 429 и 5xx
+register_fatal(lambda err: (
+    isinstance(err, httpx.HTTPStatusError)
+    and 400 <= err.response.status_code < 500
+    and err.response.status_code != 429
+))
 
 
-@cached(TTLCache(ttl=config.token_leave_time_in_seconds, maxsize=10))
-@connection_problems_decorator
-def __get_token(authorization_sb_code: str) -> str:
+@functools.cache
+def get_client(authorization_sb_code: str) -> GigaChatClient:
     """
-    Получает и кеширует OAuth токен доступа для GigaChat API.
+    Возвращает общий для процесса клиент GigaChat для кода авторизации.
 
-    Параметры:
-        authorization_sb_code (str): Код авторизации в формате Basic для получения токена.
+    Клиент создаётся один раз, держит пул соединений открытым и
+    обновляет токен доступа в фоне до его истечения.
+    """
+    client = GigaChatClient(authorization_sb_code)
+    client.start_refresh()
+    return client
 
-    Возвращает:
-        str: Токен доступа (access_token).
 
-    Особенности:
-        - Использует POST-запрос с заголовками и payload для получения токена.
-        - Кеширует результат с помощью TTLCache на время, заданное в конфигурации (token_leave_time_in_seconds).
-        - Максимальный размер кеша — 10 токенов.
-        - Генерирует уникальный RqUID для каждого запроса.
-    """
-    payload ='scope=GIGACHAT_API_PERS'
-    headers = {
-        'Content-Type': 'application/x-www-form-urlencoded',
-        'Accept': 'application/json',
-        'RqUID': str(uuid.uuid4()),
-        'Authorization': f'Basic {authorization_sb_code}'
-    }
-    response = requests.request(
-        "POST",
-        urls.token_url,
-        headers=headers,
-        data=payload,
-        verify=False
+@functools.cache
+def get_generation_cache() -> Optional[GenerationCache]:
+    """Возвращает кеш сгенерированных постов, либо None, если дисковый кеш отключён."""
+    disk_cache = get_cache()
+    if disk_cache is None:
+        return None
+    cache_settings = CacheSettings()
+    return GenerationCache(
+        disk_cache,
+        ttl=cache_settings.cache_generation_ttl_seconds,
+        similarity_threshold=cache_settings.cache_generation_similarity
     )
-    return response.json()["access_token"]
 
 
-def get_giga_chat_answer(message: str, context: str, authorization_sb_code: str) -> str:
+@metrics.timed()
+def get_giga_chat_answer(
+        message: str,
+        context: str,
+        authorization_sb_code: str,
+        max_chars: Optional[int] = None
+) -> str:
     """
     Отправляет запрос к GigaChat API для получения ответа на заданное сообщение в указанном контексте.
 
@@ -54,47 +60,32 @@ def get_giga_chat_answer(message: str, context: str, authorization_sb_code: str)
         message (str): Текст запроса пользователя.
         context (str): Контекст системного сообщения, задающий стиль и цель ответа.
         authorization_sb_code (str): Код авторизации для получения токена доступа.
+        max_chars (Optional[int]): Максимальная длина ответа. Если задана и включён
+            потоковый режим (gigachat_stream), генерация прекращается, как только
+            набран текст из целых абзацев этой длины.
 
     Возвращает:
         str: Текст ответа, сгенерированного GigaChat.
 
     Особенности:
-        - Формирует JSON payload с моделью, сообщениями и параметрами.
-        - Использует токен доступа, полученный через __get_token, в заголовках.
-        - В случае сетевых ошибок повторяет попытку запроса бесконечно с выводом сообщения об ошибке.
+        - Использует общий GigaChatClient с пулом keep-alive соединений и заранее обновляемым токеном.
+        - В случае сетевых ошибок повторяет запрос с экспоненциальной задержкой (app.resilience).
+        - Ответы на ту же (с точностью до регистра, пунктуации и порядка слов) или почти
+          ту же тему с тем же контекстом берутся из кеша (GenerationCache) без запроса к GigaChat.
     """
-    payload = json.dumps({
-        "model": "GigaChat",
-        "messages": [
-            {
-                "role": "system",
-                "content": context
-            },
-            {
-                "role": "user",
-                "content": message
-            }
-        ],
-        "stream": False,
-        "update_interval": 0
-    })
-    headers = {
-        'Content-Type': 'application/json',
-        'Accept': 'application/json',
-        'Authorization': f'Bearer {__get_token(authorization_sb_code)}'
-    }
-    while True:
-        try:
-            response = requests.request(
-                "POST",
-                urls.completions_url,
-                headers=headers,
-                data=payload,
-                verify=False
-            )
-            return response.json()["choices"][0]["message"]["content"]
-        except requests.exceptions.RequestException:
-            print("Can't connect to gigachat.. try again")
-            continue
-
+    cache = get_generation_cache()
+    if cache is not None:
+        answer = cache.get(message, context, max_chars)
+        if answer is not None:
+            return answer
 
+    client = get_client(authorization_sb_code)
+    if max_chars and Config().gigachat_stream:
+        answer = call_with_retry(
+            "gigachat", client.answer_within, message, context, max_chars, retry_on=(httpx.HTTPError,)
+        )
+    else:
+        answer = call_with_retry("gigachat", client.answer, message, context, retry_on=(httpx.HTTPError,))
+    if cache is not None and answer:
+        cache.set(message, context, answer, max_chars)
+    return answer
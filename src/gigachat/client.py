@@ -0,0 +1,431 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+import threading
+import time
+import uuid
+from typing import AsyncIterator, Callable, Iterable, Iterator, Optional
+
+import httpx
+
+from app.resilience import DeadlineExceeded, remaining
+from app.utils import shorten_text_by_paragraphs
+from .config import Config, SbUrls
+from .tokens import FileTokenStore, TokenStore
+
+
+def make_token_store(config: Config) -> TokenStore:
+    """Создаёт хранилище токенов по настройкам: файловое, если задан token_store_path, иначе в памяти."""
+    if config.token_store_path:
+        return FileTokenStore(config.token_store_path)
+    return TokenStore()
+
+
+class SseParser:
+    """
+    Построчный разборщик потока server-sent events.
+
+    Строки одного события, начинающиеся с "data:", склеиваются через перевод строки,
+    событие заканчивается пустой строкой. Комментарии и другие поля игнорируются.
+    """
+
+    def __init__(self):
+        self._data: list[str] = []
+
+    def feed(self, line: str) -> Optional[str]:
+        """Принимает строку без перевода строки и возвращает данные события, если оно завершилось."""
+        if not line:
+            return self.flush()
+        if line.startswith("data:"):
+            self._data.append(line[5:].lstrip(" "))
+        return None
+
+    def flush(self) -> Optional[str]:
+        """Возвращает данные незавершённого события, если они есть."""
+        if not self._data:
+            return None
+        data, self._data = "\n".join(self._data), []
+        return data
+
+
+def parse_delta(data: str) -> Optional[str]:
+    """Возвращает фрагмент текста из данных события потокового ответа GigaChat."""
+    choices = json.loads(data).get("choices") or [{}]
+    return choices[0].get("delta", {}).get("content") or None
+
+
+def _stream_truncated() -> httpx.RemoteProtocolError:
+    """Ошибка для потока, оборвавшегося до события [DONE]; call_with_retry повторяет такой запрос."""
+    return httpx.RemoteProtocolError("GigaChat stream ended before [DONE]")
+
+
+def iter_deltas(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Возвращает фрагменты текста из потокового ответа GigaChat до события [DONE].
+
+    Параметры:
+        lines (Iterable[str]): Строки ответа сервера без завершающих переводов строки.
+
+    Особенности:
+        - Если поток закончился без [DONE], ответ считается оборванным и выбрасывается
+          httpx.RemoteProtocolError; незавершённое последнее событие не разбирается.
+    """
+    parser = SseParser()
+    for line in lines:
+        data = parser.feed(line)
+        if data is None:
+            continue
+        if data == "[DONE]":
+            return
+        delta = parse_delta(data)
+        if delta:
+            yield delta
+    if parser.flush() == "[DONE]":
+        return
+    raise _stream_truncated()
+
+
+class GigaChatClient:
+    """
+    Клиент GigaChat API с пулом keep-alive соединений.
+
+    Особенности:
+        - Синхронный (`answer`) и асинхронный (`aanswer`) интерфейсы используют
+          собственные пулы соединений httpx, поэтому TLS-соединение устанавливается один раз.
+          Асинхронный пул открывается в `async with` и закрывается при выходе из него;
+          вне `async with` каждый асинхронный вызов открывает и закрывает своё соединение.
+        - Токен доступа хранится в TokenStore, которое можно разделить между процессами
+          (FileTokenStore), и обновляется фоновым потоком заранее — за
+          token_refresh_margin_seconds до истечения. Если сервер всё же отвечает 401,
+          токен получается заново и запрос повторяется один раз.
+
+    Пример использования:
+        with GigaChatClient(authorization_sb_code) as client:
+            post = client.answer("Тема", "Контекст")
+    """
+
+    def __init__(
+            self,
+            authorization_sb_code: str,
+            store: Optional[TokenStore] = None,
+            config: Optional[Config] = None,
+            urls: Optional[SbUrls] = None
+    ):
+        self.config = config or Config()
+        self.urls = urls or SbUrls()
+        self.store = store or make_token_store(self.config)
+        self._authorization_sb_code = authorization_sb_code
+        self._key = hashlib.sha256(authorization_sb_code.encode()).hexdigest()
+        limits = httpx.Limits(
+            max_connections=self.config.gigachat_pool_size,
+            max_keepalive_connections=self.config.gigachat_pool_size
+        )
+        self._limits = limits
+        self._http = httpx.Client(verify=False, limits=limits, timeout=self.config.gigachat_timeout)
+        self._ahttp: Optional[httpx.AsyncClient] = None
+        self._ahttp_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+
+    def token(self) -> str:
+        """
+        Возвращает действующий токен доступа, при необходимости получая новый.
+
+        Токен считается устаревшим за token_refresh_margin_seconds до истечения,
+        поэтому запросы никогда не уходят с токеном, который вот-вот истечёт.
+        """
+        token = self._valid_token()
+        if token:
+            return token
+        with self.store.locked():
+            # Пока ждали блокировку, токен мог обновить другой поток или процесс
+            return self._valid_token() or self._refresh_token()
+
+    def answer(self, message: str, context: str) -> str:
+        """
+        Отправляет запрос к GigaChat и возвращает текст ответа.
+
+        Параметры:
+            message (str): Текст запроса пользователя.
+            context (str): Контекст системного сообщения, задающий стиль и цель ответа.
+        """
+        token = self.token()
+        for attempt in range(2):
+            response = self._http.post(
+                self.urls.completions_url,
+                headers=self._headers(token),
+                content=self._payload(message, context),
+                timeout=self._timeout()
+            )
+            if response.status_code == httpx.codes.UNAUTHORIZED and attempt == 0:
+                token = self._renew_token(token)
+                continue
+            response.raise_for_status()
+            return response.json()["choices"][0]["message"]["content"]
+
+    def stream(self, message: str, context: str) -> Iterator[str]:
+        """
+        Отправляет потоковый запрос к GigaChat и возвращает фрагменты ответа по мере их поступления.
+
+        Если генератор закрыть раньше времени, соединение с сервером закрывается,
+        и генерация оставшегося текста прекращается.
+        """
+        token = self.token()
+        for attempt in range(2):
+            with self._http.stream(
+                "POST",
+                self.urls.completions_url,
+                headers=self._headers(token, stream=True),
+                content=self._payload(message, context, stream=True),
+                timeout=self._timeout()
+            ) as response:
+                if response.status_code == httpx.codes.UNAUTHORIZED and attempt == 0:
+                    token = self._renew_token(token)
+                    continue
+                response.raise_for_status()
+                yield from iter_deltas(response.iter_lines())
+                return
+
+    def answer_within(
+            self,
+            message: str,
+            context: str,
+            max_chars: int,
+            on_token: Optional[Callable[[str], None]] = None
+    ) -> str:
+        """
+        Получает ответ в потоковом режиме и обрывает генерацию, как только набран бюджет.
+
+        Как только текст превышает max_chars, результат сокращения по абзацам уже
+        не изменится, поэтому поток закрывается, а лишний текст не генерируется.
+        Если срок (app.resilience.deadline) истекает посреди генерации, возвращаются
+        уже полученные целые абзацы; если их нет, выбрасывается DeadlineExceeded.
+
+        Параметры:
+            message (str): Текст запроса пользователя.
+            context (str): Контекст системного сообщения.
+            max_chars (int): Максимальная длина итогового текста.
+            on_token (Optional[callable]): Вызывается для каждого полученного фрагмента.
+
+        Возвращает:
+            str: Текст из целых абзацев не длиннее max_chars символов.
+        """
+        parts = []
+        length = 0
+        expired = False
+        stream = self.stream(message, context)
+        try:
+            for token in stream:
+                if on_token is not None:
+                    on_token(token)
+                parts.append(token)
+                length += len(token)
+                if length > max_chars:
+                    break
+                left = remaining()
+                if left is not None and left <= 0:
+                    expired = True
+                    break
+        except httpx.TimeoutException:
+            # Таймаут чтения ограничен сроком, поэтому после его истечения
+            # обрыв потока не ошибка: ответ собирается из уже полученного текста
+            left = remaining()
+            if not parts or left is None or left > 0:
+                raise
+            expired = True
+        finally:
+            stream.close()
+        text = "".join(parts)
+        if expired:
+            # Последний абзац мог оборваться на полуслове, поэтому берутся только завершённые
+            text = text[:text.rfind("\n\n")] if "\n\n" in text else ""
+            if not text:
+                raise DeadlineExceeded("Deadline exceeded before GigaChat finished a paragraph")
+        return shorten_text_by_paragraphs(text, max_chars)
+
+    async def astream(self, message: str, context: str) -> AsyncIterator[str]:
+        """
+        Асинхронный вариант `stream`: возвращает фрагменты ответа по мере их поступления.
+        """
+        token = self._valid_token()
+        if not token:
+            token = await asyncio.to_thread(self.token)
+        async with self._async_http() as http:
+            for attempt in range(2):
+                async with http.stream(
+                    "POST",
+                    self.urls.completions_url,
+                    headers=self._headers(token, stream=True),
+                    content=self._payload(message, context, stream=True),
+                    timeout=self._timeout()
+                ) as response:
+                    if response.status_code == httpx.codes.UNAUTHORIZED and attempt == 0:
+                        token = await asyncio.to_thread(self._renew_token, token)
+                        continue
+                    response.raise_for_status()
+                    parser = SseParser()
+                    async for line in response.aiter_lines():
+                        data = parser.feed(line)
+                        if data is None:
+                            continue
+                        if data == "[DONE]":
+                            return
+                        delta = parse_delta(data)
+                        if delta:
+                            yield delta
+                    if parser.flush() == "[DONE]":
+                        return
+                    raise _stream_truncated()
+
+    async def aanswer(self, message: str, context: str) -> str:
+        """
+        Асинхронно отправляет запрос к GigaChat и возвращает текст ответа.
+
+        Позволяет выполнять много генераций одновременно в одном цикле событий.
+        """
+        token = self._valid_token()
+        if not token:
+            token = await asyncio.to_thread(self.token)
+        async with self._async_http() as http:
+            for attempt in range(2):
+                response = await http.post(
+                    self.urls.completions_url,
+                    headers=self._headers(token),
+                    content=self._payload(message, context),
+                    timeout=self._timeout()
+                )
+                if response.status_code != httpx.codes.UNAUTHORIZED or attempt:
+                    break
+                token = await asyncio.to_thread(self._renew_token, token)
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+
+    def start_refresh(self) -> None:
+        """Запускает фоновый поток, обновляющий токен до его истечения."""
+        if self._refresher is None:
+            self._refresher = threading.Thread(target=self._refresh_loop, name="gigachat-token", daemon=True)
+            self._refresher.start()
+
+    def close(self) -> None:
+        """Останавливает фоновое обновление токена и закрывает синхронный пул соединений."""
+        self._stop.set()
+        self._http.close()
+
+    async def aclose(self) -> None:
+        """Закрывает клиент, включая асинхронный пул соединений."""
+        self.close()
+        if self._ahttp is not None:
+            await self._ahttp.aclose()
+            self._ahttp = None
+            self._ahttp_loop = None
+
+    def __enter__(self):
+        self.start_refresh()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    async def __aenter__(self):
+        self.start_refresh()
+        self._ahttp = self._new_async_http()
+        self._ahttp_loop = asyncio.get_running_loop()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    @contextlib.asynccontextmanager
+    async def _async_http(self) -> AsyncIterator[httpx.AsyncClient]:
+        # Соединения асинхронного клиента привязаны к циклу событий, в котором созданы,
+        # поэтому общий пул используется только в цикле, открывшем async with
+        if self._ahttp is not None and self._ahttp_loop is asyncio.get_running_loop():
+            yield self._ahttp
+            return
+        async with self._new_async_http() as http:
+            yield http
+
+    def _new_async_http(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(verify=False, limits=self._limits, timeout=self.config.gigachat_timeout)
+
+    def _valid_token(self) -> Optional[str]:
+        record = self.store.get(self._key)
+        if record and record[1] - self.config.token_refresh_margin_seconds > time.time():
+            return record[0]
+        return None
+
+    def _refresh_token(self) -> str:
+        response = self._http.post(
+            self.urls.token_url,
+            headers={
+                'Content-Type': 'application/x-www-form-urlencoded',
+                'Accept': 'application/json',
+                'RqUID': str(uuid.uuid4()),
+                'Authorization': f'Basic {self._authorization_sb_code}'
+            },
+            content='scope=GIGACHAT_API_PERS'
+        )
+        response.raise_for_status()
+        data = response.json()
+        # expires_at в ответе сервера указан в миллисекундах
+        expires_at = data["expires_at"] / 1000 if data.get("expires_at") else (
+            time.time() + self.config.token_leave_time_in_seconds
+        )
+        self.store.set(self._key, data["access_token"], expires_at)
+        return data["access_token"]
+
+    def _renew_token(self, rejected: str) -> str:
+        """
+        Заменяет токен, который сервер отклонил с 401, хотя по времени он ещё действителен
+        (например, отозван). Если его уже заменил другой поток или процесс, берётся новый.
+        """
+        with self.store.locked():
+            token = self._valid_token()
+            if token and token != rejected:
+                return token
+            return self._refresh_token()
+
+    def _timeout(self) -> float:
+        """Таймаут запроса, не выходящий за срок (app.resilience.deadline)."""
+        left = remaining()
+        if left is None:
+            return self.config.gigachat_timeout
+        return max(0.001, min(self.config.gigachat_timeout, left))
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.token()
+                record = self.store.get(self._key)
+                delay = record[1] - self.config.token_refresh_margin_seconds - time.time() if record else 0
+            except Exception as err:
+                print(f"Can't refresh gigachat token \n {err}")
+                delay = 5
+            self._stop.wait(max(1.0, delay))
+
+    @staticmethod
+    def _headers(token: str, stream: bool = False) -> dict[str, str]:
+        return {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream' if stream else 'application/json',
+            'Authorization': f'Bearer {token}'
+        }
+
+    @staticmethod
+    def _payload(message: str, context: str, stream: bool = False) -> str:
+        return json.dumps({
+            "model": "GigaChat",
+            "messages": [
+                {
+                    "role": "system",
+                    "content": context
+                },
+                {
+                    "role": "user",
+                    "content": message
+                }
+            ],
+            "stream": stream,
+            "update_interval": 0
+        })
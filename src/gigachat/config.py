@@ -1,4 +1,5 @@
 import datetime
+from typing import Optional
 
 from pydantic_settings import BaseSettings
 
@@ -10,9 +11,21 @@ class Config(BaseSettings):
     Атрибуты:
         token_leave_time_in_seconds (int): Время жизни токена в секундах.
             По умолчанию установлено в 30 минут (1800 секунд).
-            Используется для кеширования токена доступа с ограничением по времени.
+            Используется, если сервер не сообщил время истечения токена.
+        token_refresh_margin_seconds (int): За сколько секунд до истечения токен обновляется в фоне.
+        token_store_path (Optional[str]): Путь к файлу, в котором токен хранится совместно
+            для нескольких процессов. Если не задан, токен хранится в памяти процесса.
+        gigachat_pool_size (int): Максимальное число соединений в пуле HTTP-клиента GigaChat.
+        gigachat_timeout (float): Таймаут запроса к GigaChat в секундах.
+        gigachat_stream (bool): Получать ответ в потоковом режиме и прекращать генерацию,
+            как только набран нужный объём текста.
     """
     token_leave_time_in_seconds: int = int(datetime.timedelta(minutes=30).total_seconds())
+    token_refresh_margin_seconds: int = int(datetime.timedelta(minutes=2).total_seconds())
+    token_store_path: Optional[str] = None
+    gigachat_pool_size: int = 10
+    gigachat_timeout: float = 120
+    gigachat_stream: bool = True
 
 
 class SbUrls(BaseSettings):
@@ -0,0 +1,78 @@
+import contextlib
+import fcntl
+import json
+import os
+import threading
+from typing import Iterator, Optional
+
+
+class TokenStore:
+    """
+    Хранилище токенов доступа в памяти процесса.
+
+    Токены хранятся по ключу (хешу кода авторизации) вместе со временем истечения
+    в секундах Unix. Метод `locked` сериализует обновление токена, чтобы
+    одновременно к серверу авторизации обращался только один поток.
+    """
+
+    def __init__(self):
+        self._tokens: dict[str, tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[tuple[str, float]]:
+        """Возвращает пару (токен, время истечения) или None."""
+        return self._tokens.get(key)
+
+    def set(self, key: str, token: str, expires_at: float) -> None:
+        """Сохраняет токен и время его истечения."""
+        self._tokens[key] = (token, expires_at)
+
+    @contextlib.contextmanager
+    def locked(self) -> Iterator[None]:
+        """Блокировка на время обновления токена."""
+        with self._lock:
+            yield
+
+
+class FileTokenStore(TokenStore):
+    """
+    Хранилище токенов в JSON-файле, общее для нескольких процессов.
+
+    Обновление токена защищено файловой блокировкой, поэтому параллельные
+    процессы не запрашивают токен одновременно: второй процесс дождётся
+    первого и прочитает уже полученный токен из файла.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def get(self, key: str) -> Optional[tuple[str, float]]:
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                record = json.load(file).get(key)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return (record["token"], record["expires_at"]) if record else None
+
+    def set(self, key: str, token: str, expires_at: float) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                records = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            records = {}
+        records[key] = {"token": token, "expires_at": expires_at}
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as file:
+            json.dump(records, file)
+        os.replace(tmp_path, self.path)
+
+    @contextlib.contextmanager
+    def locked(self) -> Iterator[None]:
+        with self._lock, open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
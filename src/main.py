@@ -1,39 +1,316 @@
+import argparse
 import asyncio
+import os
+import signal
+import threading
 import warnings
+from typing import Optional
 
 from dotenv import load_dotenv
-from telegram import Bot
 
-from app.settings import SbSettings, TgSettings
+from app import metrics, sources
+from app.batch import read_topics, run_batch
+from app.daemon import Daemon, Job
+from app.context import compress_context
+from app.resilience import deadline
+from app.schedule import load_schedule
+from app.startup import profile_startup
+from app.settings import BatchSettings, ContextSettings, DaemonSettings, PipelineSettings, SbSettings, TgSettings
 from app.enums import ChatContext
+from app.stages import StageGraph, hedged
 from app.utils import shorten_text_by_paragraphs
-from gigachat.chat import get_giga_chat_answer
-from yandex import get_picture, get_article
-from wiki import get_article_from_wiki
+from gigachat.chat import get_client, get_giga_chat_answer
+from tg import SendResult, deliver_async, send_to_channels_async
+from tg.outbox import Outbox, RateLimiter, get_outbox, get_rate_limiter, new_owner
 
 
-def send_to_channels(channels: list[str], message: str, bot_token: str, picture: bytes) -> None:
+def get_outbox_for(tg_settings: TgSettings) -> Optional[Outbox]:
+    """Возвращает очередь отправки из настроек, либо None, если outbox_path не задан."""
+    return get_outbox(tg_settings.outbox_path, tg_settings.outbox_lease_seconds) if tg_settings.outbox_path else None
+
+
+def _report(results: list[SendResult]) -> list[SendResult]:
+    for result in results:
+        if not result.ok:
+            print(f"Post was not sent to {result.channel}: {result.error}")
+    return results
+
+
+@metrics.timed()
+def send_to_channels(
+        message: str,
+        picture: bytes,
+        tg_settings: TgSettings,
+        topic: str = ""
+) -> list[SendResult]:
     """
-    Отправляет сообщение с изображением в указанные Telegram-каналы.
+    Отправляет сообщение с изображением в Telegram-каналы из настроек.
 
     Параметры:
-    channels (list[str]): Список идентификаторов или имен каналов для отправки.
     message (str): Текст сообщения, который будет отправлен в канал.
-    bot_token (str): Токен Telegram-бота для аутентификации.
     picture (bytes): Изображение в байтовом формате, которое будет отправлено вместе с сообщением.
+    tg_settings (TgSettings): Настройки Telegram: каналы, токен, число попыток и одновременных
+        отправок, ограничения частоты и путь к очереди отправки.
+    topic (str): Тема поста, по которой недоставленный пост находится при повторном запуске.
 
     Поведение:
-    Для каждого канала из списка пытается отправить фото с подписью.
-    В случае ошибки отправки повторяет попытку бесконечно, выводя сообщение об ошибке.
+    Рассылка выполняется одним ботом в одном цикле событий: изображение загружается
+    один раз, в остальные каналы передаётся полученный file_id. Частота отправки
+    ограничена общим для процесса RateLimiter. Если задан outbox_path, пост сначала
+    сохраняется в очередь (tg.outbox), а состояние доставки в каждый канал записывается
+    по мере отправки. Возвращает результат отправки для каждого канала и выводит неудачные отправки.
+    """
+    limiter = get_rate_limiter(tg_settings.send_rate_per_second, tg_settings.send_chat_interval_seconds)
+    outbox = get_outbox_for(tg_settings)
+    if outbox is not None:
+        owner = new_owner()
+        post_id = outbox.add(topic, message, picture, tg_settings.chanel_names, owner)
+        return deliver(outbox, post_id, tg_settings, owner, limiter)
+    return _report(asyncio.run(send_to_channels_async(
+        channels=tg_settings.chanel_names,
+        message=message,
+        bot_token=tg_settings.bot_token,
+        picture=picture,
+        concurrency=tg_settings.send_concurrency,
+        attempts=tg_settings.send_attempts,
+        base_url=tg_settings.telegram_base_url,
+        limiter=limiter
+    )))
+
+
+def deliver(
+        outbox: Outbox,
+        post_id: int,
+        tg_settings: TgSettings,
+        owner: str,
+        limiter: Optional[RateLimiter] = None
+) -> list[SendResult]:
+    """
+    Досылает пост из очереди отправки в каналы, куда он ещё не доставлен (tg.deliver_async).
+    Пост должен принадлежать `owner` (Outbox.add или Outbox.claim); после рассылки владение снимается.
+    Если limiter не передан, используется общий для процесса ограничитель из настроек.
+
+    Возвращает:
+        list[SendResult]: Результаты по всем каналам поста.
+    """
+    return _report(asyncio.run(deliver_async(
+        outbox=outbox,
+        post_id=post_id,
+        bot_token=tg_settings.bot_token,
+        concurrency=tg_settings.send_concurrency,
+        attempts=tg_settings.send_attempts,
+        base_url=tg_settings.telegram_base_url,
+        limiter=limiter or get_rate_limiter(tg_settings.send_rate_per_second, tg_settings.send_chat_interval_seconds),
+        owner=owner
+    )))
+
+
+def publish(message: str, picture: bytes, tg_settings: TgSettings, topic: str) -> list[SendResult]:
+    """
+    Отправляет пост в каналы (send_to_channels) и, если он дошёл хотя бы до одного канала,
+    запоминает изображение в индексе опубликованных (app.images), иначе снимает его резерв.
+    """
+    # app.images загружает Pillow, поэтому импортируется только при публикации
+    from app.images import picture_hash, posted_images
+
+    results = send_to_channels(message, picture, tg_settings, topic=topic)
+    try:
+        image_hash = picture_hash(picture)
+    except Exception as err:
+        print(f'Exception in picture hash \n {err}')
+        return results
+    if any(result.ok for result in results):
+        posted_images().add(image_hash)
+    else:
+        posted_images().release(image_hash)
+    return results
+
+
+def get_context_article(title: str, wiki_hedge_after: Optional[float], article_sources: list[str]) -> str:
+    """
+    Получает статью для обогащения контекста поста из источников app.sources.
+
+    Сначала ищет статью в первом источнике (по умолчанию Яндекс). Если он не ответил
+    за `wiki_hedge_after` секунд или вернул пустой результат, параллельно запрашивает
+    статью у остальных источников по порядку (по умолчанию Википедия) и возвращает
+    первый непустой ответ.
+
+    Параметры:
+        title (str): Тема поста.
+        wiki_hedge_after (Optional[float]): Через сколько секунд запускать запасные источники.
+            Если None, они используются только после неудачи первого.
+        article_sources (list[str]): Имена источников статьи в порядке использования.
+
+    Возвращает:
+        str: Текст статьи, либо пустая строка, если статью найти не удалось.
+    """
+    primary, *fallbacks = article_sources
+    article = hedged(
+        primary=lambda: sources.fetch(sources.ARTICLE, primary, title),
+        fallback=lambda: sources.first(sources.ARTICLE, fallbacks, title),
+        delay=wiki_hedge_after
+    )
+    if not article:
+        warnings.warn("Cant get article from yandex and wiki")
+    return article or ""
+
+
+def get_post_picture(title: str, picture_sources: list[str]) -> bytes:
+    """
+    Получает изображение для поста у первого источника app.sources, который его нашёл.
+
+    Возвращает:
+        bytes: Изображение в байтах.
+    """
+    picture = sources.first(sources.PICTURE, picture_sources, title)
+    if not picture:
+        raise ValueError(f"No picture found for {title}")
+    return picture
+
+
+def create_post(title: str, article: str, authorization_sb_code: str) -> str:
     """
-    for ch in channels:
-        while True:
-            try:
-                bot = Bot(token=bot_token)
-                asyncio.run(bot.send_photo(chat_id=ch, caption=message.replace("*", ""), photo=picture))
-                break
-            except:
-                print("Can't send to telegram ....")
+    Генерирует текст поста через GigaChat и при необходимости сокращает его до 1000 символов по абзацам.
+
+    Перед запросом статья сжимается: в контексте остаются только самые
+    релевантные теме абзацы, укладывающиеся в бюджет context_max_chars.
+
+    Параметры:
+        title (str): Тема поста.
+        article (str): Статья, факты из которой используются в посте.
+        authorization_sb_code (str): Код авторизации GigaChat.
+
+    Возвращает:
+        str: Текст поста не длиннее 1000 символов.
+    """
+    article, report = compress_context(article, title, ContextSettings().context_max_chars)
+    if report.passages_kept < report.passages_total:
+        print(
+            f"Context compressed {report.original_chars} -> {report.compressed_chars} chars "
+            f"({report.passages_kept}/{report.passages_total} passages)"
+        )
+    context = ChatContext.GET_POST_CONTEXT.value + article
+
+    post = get_giga_chat_answer(
+        message=title,
+        context=context,
+        authorization_sb_code=authorization_sb_code,
+        max_chars=1000
+    )
+    print(post)
+
+    if len(post) > 1000:
+        post = shorten_text_by_paragraphs(post, 1000)
+        print("=" * 8)
+        print(post)
+    return post
+
+
+def build_pipeline(
+        title: str,
+        tg_settings: TgSettings,
+        sb_settings: SbSettings,
+        pipeline_settings: PipelineSettings,
+        limits: Optional[dict[str, threading.Semaphore]] = None
+) -> StageGraph:
+    """
+    Строит граф этапов создания и публикации поста на заданную тему.
+
+    Независимые ветки графа выполняются одновременно:
+        - поиск статьи в Яндексе (с запасным запросом в Википедию) и генерация поста через GigaChat;
+        - поиск изображения по теме с помощью функции get_picture.
+    Источники статьи и изображения берутся из реестра app.sources по настройкам
+    article_sources и picture_sources; их модули импортируются при первом обращении.
+    Если задан scrape_workers, поиск статьи и изображения выполняется в пуле рабочих
+    процессов (yandex.workers), чтобы браузеры не блокировали основной процесс.
+    Когда обе ветки готовы, пост с изображением отправляется в Telegram-каналы.
+
+    Параметры:
+        title (str): Тема поста.
+        tg_settings (TgSettings): Настройки Telegram.
+        sb_settings (SbSettings): Настройки GigaChat.
+        pipeline_settings (PipelineSettings): Настройки конвейера.
+        limits (Optional[dict[str, threading.Semaphore]]): Ограничения числа одновременно
+            выполняющихся этапов ("article", "post", "picture", "publish") в пакетном режиме.
+
+    Возвращает:
+        StageGraph: Граф, готовый к запуску.
+    """
+    graph = StageGraph(limits=limits)
+    graph.add("article", lambda: get_context_article(
+        title,
+        pipeline_settings.wiki_hedge_after_seconds,
+        sources.parse(pipeline_settings.article_sources)
+    ))
+    graph.add(
+        "post",
+        lambda article: create_post(title, article, sb_settings.authorization_sb_code),
+        deps=["article"]
+    )
+    graph.add("picture", lambda: get_post_picture(title, sources.parse(pipeline_settings.picture_sources)))
+    graph.add(
+        "publish",
+        lambda post, picture: publish(post, picture, tg_settings, topic=title),
+        deps=["post", "picture"]
+    )
+    return graph
+
+
+def run_topic(
+        title: str,
+        tg_settings: TgSettings,
+        sb_settings: SbSettings,
+        pipeline_settings: PipelineSettings,
+        limits: Optional[dict[str, threading.Semaphore]] = None
+) -> dict:
+    """
+    Создаёт и публикует пост на тему в пределах срока pipeline_deadline_seconds.
+
+    Если в очереди отправки есть недоставленный пост на эту тему для тех же каналов
+    (программа упала посреди рассылки или часть каналов не приняла пост), он досылается
+    в оставшиеся каналы без повторного поиска статьи, генерации и поиска изображения.
+    Пост, который ещё рассылает другое задание, не трогается.
+
+    Возвращает:
+        dict: Текст поста ("post") и результаты отправки по каналам ("publish").
+            Если досланы посты из очереди, "publish" содержит результаты по всем им,
+            а "resumed" — идентификатор, текст и результаты каждого досланного поста.
+    """
+    outbox = get_outbox_for(tg_settings)
+    resumed = []
+    with deadline(pipeline_settings.pipeline_deadline_seconds):
+        if outbox is not None:
+            for post_id in outbox.unfinished(title, tg_settings.chanel_names):
+                owner = new_owner()
+                if not outbox.claim(post_id, owner):
+                    continue
+                print(f"Resuming undelivered post {post_id} on {title}")
+                resumed.append({
+                    "id": post_id,
+                    "post": outbox.get(post_id).message,
+                    "publish": deliver(outbox, post_id, tg_settings, owner),
+                })
+        if not resumed:
+            return build_pipeline(title, tg_settings, sb_settings, pipeline_settings, limits).run()
+    return {
+        "post": resumed[-1]["post"],
+        "publish": [result for post in resumed for result in post["publish"]],
+        "resumed": resumed,
+    }
+
+
+def _record(results: dict) -> dict:
+    """Возвращает запись манифеста пакетного режима или сервиса по результату run_topic."""
+    record = {
+        "post": results["post"],
+        "channels": [result._asdict() for result in results["publish"]],
+    }
+    if "resumed" in results:
+        record["resumed"] = [
+            {"id": post["id"], "channels": [result._asdict() for result in post["publish"]]}
+            for post in results["resumed"]
+        ]
+    return record
 
 
 def main():
@@ -41,50 +318,179 @@ def main():
     Основная функция программы.
 
     Логика работы:
-    1. Загружает настройки Telegram и Sb из конфигурационных классов.
+    1. Загружает настройки Telegram, Sb и конвейера из конфигурационных классов.
     2. Запрашивает у пользователя тему поста.
-    3. Выполняет поиск подходящей статьи в поисковой системе Яндекс для обогащения контекста.
-    4. Получает текст поста с помощью функции get_giga_chat_answer, используя тему и расширенный контекст.
-    5. При необходимости сокращает текст поста до 1000 символов, обрезая по абзацам.
-    6. Получает изображение по теме с помощью функции get_picture.
-    7. Отправляет сформированный пост с изображением в указанные Telegram-каналы.
+    3. Создаёт пост и публикует его в Telegram-каналы с помощью графа этапов из build_pipeline,
+       ограничивая всё время работы сроком pipeline_deadline_seconds (run_topic).
     """
     tg_settings = TgSettings()
     sb_settings = SbSettings()
+    pipeline_settings = PipelineSettings()
 
     today_title = input("\n\n Введите тему поста: ")
     print(f"Тема {today_title}")
 
-    article = get_article(today_title)
-    if not article:
-        warnings.warn("Cant get article from yandex, try from wiki")
-        article = get_article_from_wiki(today_title)
-        if not article:
-            warnings.warn("Cant get article from wiki")
-    context = ChatContext.GET_POST_CONTEXT.value + article
+    run_topic(today_title, tg_settings, sb_settings, pipeline_settings)
 
-    today_post = get_giga_chat_answer(
-        message=today_title,
-        context=context,
-        authorization_sb_code=sb_settings.authorization_sb_code
+
+def batch_main(source: str, manifest_path: str) -> None:
+    """
+    Пакетный режим: создаёт и публикует посты сразу на множество тем.
+
+    Темы читаются из файла, стандартного ввода ("-") или каталога-очереди с файлами *.jsonl.
+    Несколько тем обрабатываются одновременно, а число одновременно выполняющихся
+    этапов каждого вида ограничено настройками BatchSettings. Результат по каждой теме
+    дописывается в манифест manifest_path в формате JSONL.
+
+    Параметры:
+        source (str): Источник тем.
+        manifest_path (str): Путь к файлу манифеста.
+    """
+    tg_settings = TgSettings()
+    sb_settings = SbSettings()
+    pipeline_settings = PipelineSettings()
+    batch_settings = BatchSettings()
+
+    limits = {
+        "article": threading.BoundedSemaphore(batch_settings.batch_article_concurrency),
+        "post": threading.BoundedSemaphore(batch_settings.batch_post_concurrency),
+        "picture": threading.BoundedSemaphore(batch_settings.batch_picture_concurrency),
+        "publish": threading.BoundedSemaphore(batch_settings.batch_publish_concurrency),
+    }
+
+    def process(topic: str) -> dict:
+        return _record(run_topic(topic, tg_settings, sb_settings, pipeline_settings, limits))
+
+    records = run_batch(
+        topics=read_topics(source),
+        process=process,
+        manifest_path=manifest_path,
+        workers=batch_settings.batch_workers
     )
-    print(today_post)
+    print(f"Done {sum(record['ok'] for record in records)}/{len(records)} topics, manifest: {manifest_path}")
 
-    if len(today_post) > 1000:
-        today_post = shorten_text_by_paragraphs(today_post, 1000)
-        print("=" * 8)
-        print(today_post)
 
-    send_to_channels(
-        channels=tg_settings.chanel_names,
-        message=today_post,
-        bot_token=tg_settings.bot_token,
-        picture=get_picture(today_title)
+def warm_up(sb_settings: SbSettings, pipeline_settings: PipelineSettings) -> None:
+    """
+    Заранее готовит ресурсы, которые переиспользуются между постами:
+    ресурсы выбранных источников статей и изображений (HTTP-сессию, браузеры и рабочие
+    процессы поиска), а также клиент GigaChat с действующим токеном.
+    Ошибки прогрева не мешают запуску — ресурсы будут созданы при первом использовании.
+    """
+    for name, warm in (
+        ("article sources", lambda: sources.warm_up(sources.ARTICLE, sources.parse(pipeline_settings.article_sources))),
+        ("picture sources", lambda: sources.warm_up(sources.PICTURE, sources.parse(pipeline_settings.picture_sources))),
+        ("gigachat", lambda: get_client(sb_settings.authorization_sb_code).token()),
+    ):
+        try:
+            warm()
+        except Exception as err:
+            print(f'Exception while warming up {name} \n {err}')
+
+
+def daemon_main(schedule_path: str) -> None:
+    """
+    Режим сервиса: публикует посты по расписанию и по запросам к локальному API.
+
+    Процесс запускается один раз, поэтому настройки, импорты модулей, браузеры,
+    HTTP-соединения и токен GigaChat переиспользуются всеми постами.
+    Останавливается сигналом SIGINT или SIGTERM, дождавшись выполняющихся заданий.
+
+    Параметры:
+        schedule_path (str): Путь к JSON-файлу расписания (app.schedule.load_schedule).
+    """
+    tg_settings = TgSettings()
+    sb_settings = SbSettings()
+    pipeline_settings = PipelineSettings()
+    daemon_settings = DaemonSettings()
+
+    if daemon_settings.daemon_warm_up:
+        warm_up(sb_settings, pipeline_settings)
+
+    def process(job: Job) -> dict:
+        settings = tg_settings
+        if job.channels:
+            settings = tg_settings.model_copy(update={"chanel_names": job.channels})
+        return _record(run_topic(job.topic, settings, sb_settings, pipeline_settings))
+
+    daemon = Daemon(
+        process=process,
+        entries=load_schedule(schedule_path),
+        workers=daemon_settings.daemon_workers,
+        history=daemon_settings.daemon_history
+    )
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+    signal.signal(signal.SIGINT, lambda *_: daemon.stop())
+    daemon.serve(daemon_settings.daemon_host, daemon_settings.daemon_port)
+
+
+def resume_main() -> None:
+    """
+    Досылает все посты из очереди отправки, которые доставлены не во все каналы,
+    например после падения программы посреди рассылки.
+    """
+    tg_settings = TgSettings()
+    outbox = get_outbox_for(tg_settings)
+    if outbox is None:
+        print("Outbox is disabled (OUTBOX_PATH is empty)")
+        return
+    resumed = 0
+    for post_id in outbox.unfinished():
+        owner = new_owner()
+        post = outbox.get(post_id)
+        if not outbox.claim(post_id, owner):
+            print(f"Post {post_id} ({post.topic}) is being sent by another job, skipped")
+            continue
+        results = deliver(outbox, post_id, tg_settings, owner)
+        print(f"Post {post_id} ({post.topic}): delivered to {sum(result.ok for result in results)}/{len(results)} channels")
+        resumed += 1
+    print(f"Resumed {resumed} posts")
+
+
+def parse_args() -> argparse.Namespace:
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(description="Создание и рассылка постов в Telegram-каналы")
+    parser.add_argument(
+        "--batch",
+        metavar="SOURCE",
+        help="пакетный режим: файл с темами, '-' для стандартного ввода или каталог-очередь с *.jsonl"
+    )
+    parser.add_argument(
+        "--manifest",
+        default="batch_manifest.jsonl",
+        help="файл JSONL с результатами пакетного режима (по умолчанию batch_manifest.jsonl)"
+    )
+    parser.add_argument(
+        "--daemon",
+        metavar="SCHEDULE",
+        help="режим сервиса: JSON-файл расписания публикаций, темы также принимаются через локальный API"
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="показать время импорта модулей при запуске и загрузки каждого источника статей и изображений"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="дослать посты из очереди отправки, доставленные не во все каналы, и завершиться"
     )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
     load_dotenv()
-    main()
+    args = parse_args()
+    metrics.setup()
+    if args.profile_startup:
+        profile_startup(os.path.dirname(os.path.abspath(__file__)))
+    elif args.resume:
+        resume_main()
+    elif args.daemon:
+        daemon_main(args.daemon)
+    elif args.batch:
+        batch_main(args.batch, args.manifest)
+    else:
+        main()
 
 
@@ -0,0 +1,181 @@
+"""
+Потоковый ответ GigaChat: разбор SSE, обрыв потока, срок и обновление токена после 401.
+
+Сервер подменяется httpx.MockTransport; тело ответа отдаётся заданными кусками,
+чтобы события и строки могли приходить разорванными между ними.
+"""
+import json
+import time
+
+import httpx
+import pytest
+
+from app.resilience import DeadlineExceeded, deadline
+from gigachat.client import GigaChatClient, SseParser, iter_deltas
+from gigachat.config import Config, SbUrls
+
+URLS = SbUrls(token_url="http://giga.test/oauth", completions_url="http://giga.test/completions")
+
+
+def event(content: str) -> str:
+    return f"data: {json.dumps({'choices': [{'delta': {'content': content}}]}, ensure_ascii=False)}\n\n"
+
+
+def lines(*chunks: str) -> list[str]:
+    """Собирает строки так же, как httpx.Response.iter_lines из кусков тела."""
+    return "".join(chunks).splitlines()
+
+
+class FakeGigaChat:
+    """Отвечает на запросы токена и генерации; completions — очередь ответов по порядку."""
+
+    def __init__(self, *completions):
+        self.completions = list(completions)
+        self.tokens = 0
+        self.authorizations = []
+        self.sent = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/oauth":
+            self.tokens += 1
+            return httpx.Response(200, json={
+                "access_token": f"token-{self.tokens}",
+                "expires_at": int((time.time() + 1800) * 1000)
+            })
+        self.authorizations.append(request.headers["Authorization"])
+        response = self.completions.pop(0)
+        return response() if callable(response) else response
+
+    def stream(self, *chunks, delay: float = 0.0):
+        """Ответ, тело которого приходит кусками chunks с задержкой delay перед каждым."""
+        def body():
+            for chunk in chunks:
+                if isinstance(chunk, BaseException):
+                    raise chunk
+                time.sleep(delay)
+                self.sent += 1
+                yield chunk.encode()
+        return lambda: httpx.Response(200, headers={"Content-Type": "text/event-stream"}, content=body())
+
+
+@pytest.fixture
+def make_client():
+    clients = []
+
+    def make(server: FakeGigaChat) -> GigaChatClient:
+        client = GigaChatClient("code", config=Config(), urls=URLS)
+        client._http = httpx.Client(transport=httpx.MockTransport(server))
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+def test_parser_joins_multiline_data_and_ignores_other_fields():
+    parser = SseParser()
+    assert parser.feed(": keep-alive") is None
+    assert parser.feed("event: message") is None
+    assert parser.feed("data: первая") is None
+    assert parser.feed("data:вторая") is None
+    assert parser.feed("") == "первая\nвторая"
+    assert parser.feed("") is None
+
+
+def test_event_split_across_chunks():
+    first, second = event("При"), event("вет")
+    chunks = (first[:9], first[9:-1], first[-1:] + second[:20], second[20:], "data: [DONE]\n\n")
+    assert list(iter_deltas(lines(*chunks))) == ["При", "вет"]
+
+
+def test_done_stops_reading_the_stream():
+    assert list(iter_deltas(lines(event("a"), "data: [DONE]\n\n", event("b")))) == ["a"]
+
+
+def test_done_without_trailing_blank_line():
+    assert list(iter_deltas(lines(event("a"), "data: [DONE]"))) == ["a"]
+
+
+def test_multiline_data_is_one_json_document():
+    multiline = 'data: {"choices": [{"delta":\ndata: {"content": "текст"}}]}\n\n'
+    assert list(iter_deltas(lines(multiline, "data: [DONE]\n\n"))) == ["текст"]
+
+
+@pytest.mark.parametrize("tail", ["", 'data: {"choices": [{"del'])
+def test_truncated_stream_raises_after_received_deltas(tail):
+    deltas = iter_deltas(lines(event("a"), tail))
+    assert next(deltas) == "a"
+    with pytest.raises(httpx.RemoteProtocolError):
+        next(deltas)
+
+
+def test_answer_within_stops_streaming_once_budget_is_reached(make_client):
+    server = FakeGigaChat()
+    chunks = [event("Абзац один.\n\n"), event("Абзац два."), *[event("\n\n" + "x" * 50)] * 100]
+    server.completions.append(server.stream(*chunks))
+    text = make_client(server).answer_within("тема", "контекст", max_chars=30)
+    assert text == "Абзац один.\n\nАбзац два."
+    assert server.sent < len(chunks)
+
+
+def test_answer_within_returns_complete_paragraphs_when_deadline_expires(make_client):
+    server = FakeGigaChat()
+    chunks = [event("Готовый абзац.\n\n"), event("Начало второго"), event(" абзаца.")]
+    server.completions.append(server.stream(*chunks, "data: [DONE]\n\n", delay=0.15))
+    client = make_client(server)
+    client.token()
+    with deadline(0.25):
+        text = client.answer_within("тема", "контекст", max_chars=1000)
+    assert text == "Готовый абзац."
+    assert server.sent == 2
+
+
+def test_answer_within_returns_partial_text_on_read_timeout_after_deadline(make_client):
+    server = FakeGigaChat()
+    chunks = [event("Готовый абзац.\n\nНеполный"), httpx.ReadTimeout("timed out")]
+    server.completions.append(server.stream(*chunks, delay=0.15))
+    client = make_client(server)
+    client.token()
+    with deadline(0.1):
+        assert client.answer_within("тема", "контекст", max_chars=1000) == "Готовый абзац."
+
+
+def test_answer_within_raises_when_deadline_expires_before_a_paragraph(make_client):
+    server = FakeGigaChat()
+    server.completions.append(server.stream(event("Без конца"), event(" абзаца"), delay=0.15))
+    client = make_client(server)
+    client.token()
+    with deadline(0.1), pytest.raises(DeadlineExceeded):
+        client.answer_within("тема", "контекст", max_chars=1000)
+
+
+def test_answer_within_raises_on_truncated_stream(make_client):
+    server = FakeGigaChat()
+    server.completions.append(server.stream(event("Абзац.\n\n"), event("Ещё")))
+    with pytest.raises(httpx.RemoteProtocolError):
+        make_client(server).answer_within("тема", "контекст", max_chars=1000)
+
+
+def test_stream_renews_rejected_token_once(make_client):
+    server = FakeGigaChat(httpx.Response(401))
+    server.completions.append(server.stream(event("ответ"), "data: [DONE]\n\n"))
+    client = make_client(server)
+    assert list(client.stream("тема", "контекст")) == ["ответ"]
+    assert server.authorizations == ["Bearer token-1", "Bearer token-2"]
+    assert client.token() == "token-2"
+
+
+def test_answer_renews_rejected_token_once(make_client):
+    answer = {"choices": [{"message": {"content": "ответ"}}]}
+    server = FakeGigaChat(httpx.Response(401), httpx.Response(200, json=answer))
+    assert make_client(server).answer("тема", "контекст") == "ответ"
+    assert server.tokens == 2
+
+
+def test_second_401_is_raised(make_client):
+    server = FakeGigaChat(httpx.Response(401), httpx.Response(401))
+    with pytest.raises(httpx.HTTPStatusError) as error:
+        list(make_client(server).stream("тема", "контекст"))
+    assert error.value.response.status_code == 401
+    assert server.tokens == 2
@@ -0,0 +1,102 @@
+"""
+Разбор сохранённых страниц выдачи Яндекса (tests/fixtures/yandex) HTTP-бэкендом.
+
+Страницы отдаёт локальный http.server: по запросу text=<имя> возвращается файл <имя>.html.
+"""
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import requests
+
+from yandex import backends
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "yandex")
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlsplit(self.path)
+        name = parse_qs(url.query).get("text", [""])[0]
+        path = os.path.join(FIXTURES, f"{name}.html")
+        if not url.path.startswith(("/search", "/images/search")) or not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, "rb") as file:
+            body = file.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def serp_url(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(backends.search_settings, "search_base_url", url)
+    yield url
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def backend():
+    with requests.Session() as session:
+        yield backends.HttpBackend(session)
+
+
+def test_search_urls_returns_organic_links_in_order(serp_url, backend):
+    assert backend.search_urls("search") == [
+        "https://ru.wikipedia.org/wiki/%D0%AD%D1%80%D0%BC%D0%B8%D1%82%D0%B0%D0%B6",
+        "https://www.hermitagemuseum.org/wps/portal/hermitage/",
+        "https://dzen.ru/a/ZmE3hermitage",
+        f"{serp_url}/turbo?text=https%3A%2F%2Fwww.culture.ru%2Finstitutes%2F10185",
+    ]
+
+
+def test_search_images_returns_result_images(serp_url, backend):
+    assert backend.search_images("images") == [
+        "http://avatars.mds.yandex.net/i?id=2a0000017a1b2c3d4e5f-4000000-images-thumbs&n=13",
+        "https://avatars.mds.yandex.net/i?id=9f8e7d6c5b4a-5263110-images-thumbs&n=13",
+        f"{serp_url}/images/static/placeholder.jpg",
+    ]
+
+
+def test_empty_results(serp_url, backend):
+    assert backend.search_urls("empty") == []
+    assert backend.search_images("empty") == []
+
+
+def test_changed_markup_yields_nothing(serp_url, backend):
+    assert backend.search_urls("changed") == []
+    assert backend.search_images("changed") == []
+
+
+def test_search_falls_back_to_next_backend_when_markup_changed(serp_url, monkeypatch):
+    class FallbackBackend(backends.SearchBackend):
+        name = "fallback"
+
+        def search_urls(self, q):
+            return ["https://fallback.example/"]
+
+        def search_images(self, q):
+            return []
+
+    http = backends.HttpBackend(requests.Session())
+    monkeypatch.setattr(backends, "get_backend", lambda name: http if name == "http" else FallbackBackend())
+    assert backends.search("urls", "changed", backend="http,fallback") == ["https://fallback.example/"]
+    assert backends.search("urls", "search", backend="http,fallback")[0].startswith("https://ru.wikipedia.org/")
+
+
+def test_http_error_is_raised(serp_url, backend):
+    with pytest.raises(requests.HTTPError):
+        backend.search_urls("missing")
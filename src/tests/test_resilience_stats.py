@@ -0,0 +1,57 @@
+"""
+Счётчики app.resilience при одновременных вызовах из нескольких потоков.
+"""
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import resilience
+from app.resilience import RetryPolicy, call_with_retry, stats
+
+
+@pytest.fixture(autouse=True)
+def frequent_switches():
+    # Частое переключение потоков повышает шанс потерять обновление в "+=" без блокировки
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_counters_are_not_lost_between_threads():
+    dependency = "test-threads"
+    flaky = {}
+    policy = RetryPolicy(max_attempts=2, base_delay=0)
+    # Ошибки идут вперемешку из многих потоков, выключатель здесь не проверяется
+    resilience.get_breaker(dependency).failure_threshold = 10 ** 9
+
+    def call(number: int) -> int:
+        # Каждый вызов один раз падает и успешно проходит со второй попытки
+        if not flaky.setdefault(number, False):
+            flaky[number] = True
+            raise ConnectionError("flaky")
+        return number
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda n: call_with_retry(dependency, call, n, policy=policy), range(2000)))
+
+    assert results == list(range(2000))
+    assert stats()[dependency] == {
+        "calls": 2000,
+        "attempts": 4000,
+        "retries": 2000,
+        "failures": 0,
+        "rejected": 0,
+        "retry_seconds": 0.0,
+        "circuit": "closed",
+    }
+
+
+def test_add_updates_several_counters():
+    counters = resilience.DependencyStats()
+    counters.add(retries=1, retry_seconds=0.5)
+    counters.add(retries=2)
+    assert counters.as_dict() == {
+        "calls": 0, "attempts": 0, "retries": 3, "failures": 0, "rejected": 0, "retry_seconds": 0.5
+    }
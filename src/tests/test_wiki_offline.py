@@ -0,0 +1,74 @@
+"""
+Офлайн-индекс Википедии: построение из небольшого дампа и поиск названий по триграммам.
+"""
+import pytest
+
+from wiki.offline import OfflineWiki, build_index, iter_dump, trigrams
+
+TITLES = ["Эрмитаж", "Эрмитажный театр", "Казанский собор", "Исаакиевский собор", "Москва"] + [
+    f"Улица {number}" for number in range(40)
+]
+
+
+def page(title: str, text: str, namespace: str = "0", redirect: bool = False) -> str:
+    redirect_tag = "<redirect title='x'/>" if redirect else ""
+    return (
+        f"<page><title>{title}</title><ns>{namespace}</ns>{redirect_tag}"
+        f"<revision><text>{text}</text></revision></page>"
+    )
+
+
+@pytest.fixture
+def dump(tmp_path):
+    pages = [page(title, f"'''{title}''' — статья о [[Санкт-Петербург|городе]].") for title in TITLES]
+    pages.append(page("Обсуждение:Эрмитаж", "обсуждение", namespace="1"))
+    pages.append(page("Hermitage", "#REDIRECT [[Эрмитаж]]", redirect=True))
+    path = tmp_path / "dump.xml"
+    path.write_text(
+        f'<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/"><siteinfo/>{"".join(pages)}</mediawiki>',
+        encoding="utf-8"
+    )
+    return str(path)
+
+
+@pytest.fixture
+def index(dump, tmp_path):
+    build_index(dump, str(tmp_path / "index"))
+    wiki = OfflineWiki(str(tmp_path / "index"))
+    yield wiki
+    wiki.close()
+
+
+def dice(query: str, title: str) -> float:
+    a, b = trigrams(query), trigrams(title)
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def test_iter_dump_skips_redirects_and_other_namespaces(dump):
+    articles = list(iter_dump(dump))
+    assert [title for title, _ in articles] == TITLES
+    assert articles[0][1] == "Эрмитаж — статья о городе."
+
+
+def test_search_ranks_titles_by_dice_similarity(index):
+    results = index.search("эрмитаж", limit=2)
+    assert [title for title, _ in results] == ["Эрмитаж", "Эрмитажный театр"]
+    assert results[0][1] == pytest.approx(1.0)
+    assert results[1][1] == pytest.approx(dice("эрмитаж", "Эрмитажный театр"))
+
+
+def test_frequent_trigrams_still_count_towards_the_score(index):
+    # " ул", "ули", "лиц", "ица", "ца " есть в большинстве названий, а "17 " — в одном
+    title, score, text = index.best_article("улица 17")
+    assert title == "Улица 17"
+    assert score == pytest.approx(1.0)
+    assert text == "Улица 17 — статья о городе."
+
+
+def test_query_made_only_of_frequent_trigrams(index):
+    assert index.search("улица", limit=1)[0][1] == pytest.approx(dice("улица", "Улица 0"))
+
+
+def test_unknown_query(index):
+    assert index.search("zzz") == []
+    assert index.best_article("") is None
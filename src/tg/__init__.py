@@ -0,0 +1,232 @@
+import asyncio
+from typing import NamedTuple, Optional
+
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden, InvalidToken, RetryAfter
+
+from app import metrics
+from app.resilience import (
+    CircuitOpenError,
+    DeadlineExceeded,
+    call_with_retry_async,
+    default_policy,
+    is_retryable,
+    register_fatal,
+    retry_after
+)
+from .outbox import FINAL_STATES, REJECTED, SENT, Outbox, RateLimiter
+
+# Неверный канал, нет прав или неверный токен не исправятся повтором
+register_fatal(BadRequest, Forbidden, InvalidToken)
+
+
+class SendResult(NamedTuple):
+    """
+    Результат отправки поста в один Telegram-канал.
+
+    Атрибуты:
+        channel (str): Имя или идентификатор канала.
+        ok (bool): True, если пост успешно отправлен.
+        attempts (int): Количество сделанных попыток отправки.
+        error (Optional[str]): Текст последней ошибки, если отправить не удалось.
+        rejected (bool): True, если канал отклонил пост ошибкой, которую повтор не исправит
+            (нет прав, неверный канал); в очереди такая доставка больше не повторяется.
+    """
+    channel: str
+    ok: bool
+    attempts: int
+    error: Optional[str] = None
+    rejected: bool = False
+
+
+async def _send_photo(
+        bot: Bot,
+        channel: str,
+        caption: str,
+        photo,
+        attempts: int,
+        limiter: Optional[RateLimiter] = None
+):
+    """
+    Отправляет фото с подписью в канал, делая не больше `attempts` попыток.
+
+    Между попытками выдерживается экспоненциальная задержка, а если Telegram
+    ответил RetryAfter — запрошенное им время (app.resilience). Если передан
+    limiter, каждая попытка ждёт своего слота, а RetryAfter блокирует канал
+    в ограничителе и для других постов.
+
+    Возвращает:
+        tuple: (SendResult, file_id загруженного фото или None).
+    """
+    made = 0
+
+    async def send():
+        nonlocal made
+        made += 1
+        if limiter is not None:
+            await limiter.wait(channel)
+        try:
+            return await bot.send_photo(chat_id=channel, caption=caption, photo=photo)
+        except RetryAfter as err:
+            if limiter is not None:
+                limiter.penalize(channel, retry_after(err) or 0.0)
+            raise
+
+    policy = default_policy()._replace(max_attempts=attempts)
+    try:
+        message = await call_with_retry_async("telegram", send, policy=policy)
+    except Exception as err:
+        error = f"{type(err).__name__}: {err}"
+        print(f"Can't send to telegram channel {channel} \n {error}")
+        rejected = not isinstance(err, (DeadlineExceeded, CircuitOpenError)) and not is_retryable(err)
+        return SendResult(channel=channel, ok=False, attempts=made, error=error, rejected=rejected), None
+    if isinstance(photo, bytes):
+        metrics.inc("telegram_upload_bytes_total", len(photo))
+    file_id = message.photo[-1].file_id if message.photo else None
+    return SendResult(channel=channel, ok=True, attempts=made), file_id
+
+
+async def send_to_channels_async(
+        channels: list[str],
+        message: str,
+        bot_token: str,
+        picture: bytes,
+        concurrency: int = 5,
+        attempts: int = 3,
+        base_url: str = "https://api.telegram.org/bot",
+        limiter: Optional[RateLimiter] = None
+) -> list[SendResult]:
+    """
+    Асинхронно рассылает пост с изображением по Telegram-каналам.
+
+    Логика работы:
+    1. Использует один экземпляр Bot и один цикл событий на всю рассылку.
+    2. Загружает изображение в первый канал, куда удалось отправить пост,
+       и запоминает file_id, который вернул Telegram.
+    3. В остальные каналы отправляет пост параллельно (не больше `concurrency`
+       одновременных запросов), передавая file_id вместо байтов изображения.
+
+    Параметры:
+        channels (list[str]): Список идентификаторов или имён каналов.
+        message (str): Текст поста.
+        bot_token (str): Токен Telegram-бота.
+        picture (bytes): Изображение в байтовом формате.
+        concurrency (int): Максимальное число одновременных отправок.
+        attempts (int): Количество попыток отправки в каждый канал.
+        base_url (str): Адрес Bot API.
+        limiter (Optional[RateLimiter]): Ограничитель частоты отправки (tg.outbox.RateLimiter).
+
+    Возвращает:
+        list[SendResult]: Результаты отправки в порядке следования каналов.
+    """
+    caption = message.replace("*", "")
+    results: dict[str, SendResult] = {}
+
+    bot = Bot(token=bot_token, base_url=base_url)
+    # Инициализация запрашивает getMe, который тоже может временно не пройти
+    await call_with_retry_async("telegram", bot.initialize)
+    async with bot:
+        photo = picture
+        pending = list(channels)
+        # Пока file_id не получен, каналы обходятся по одному, чтобы не загружать картинку несколько раз
+        while pending and photo is picture:
+            channel = pending.pop(0)
+            results[channel], file_id = await _send_photo(bot, channel, caption, photo, attempts, limiter)
+            if file_id:
+                photo = file_id
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def send(channel: str) -> None:
+            async with semaphore:
+                results[channel], _ = await _send_photo(bot, channel, caption, photo, attempts, limiter)
+
+        await asyncio.gather(*(send(channel) for channel in pending))
+
+    return [results[channel] for channel in channels]
+
+
+async def deliver_async(
+        outbox: Outbox,
+        post_id: int,
+        bot_token: str,
+        concurrency: int = 5,
+        attempts: int = 3,
+        base_url: str = "https://api.telegram.org/bot",
+        limiter: Optional[RateLimiter] = None,
+        owner: Optional[str] = None
+) -> list[SendResult]:
+    """
+    Отправляет пост из очереди (tg.outbox) в каналы, куда он ещё не доставлен.
+
+    Логика работы совпадает с send_to_channels_async, но состояние каждой доставки
+    и file_id изображения сразу записываются в очередь. Поэтому после падения
+    программы повторный вызов досылает пост только в оставшиеся каналы, а
+    изображение не загружается повторно, если file_id уже получен.
+
+    Параметры:
+        outbox (Outbox): Очередь постов.
+        post_id (int): Идентификатор поста в очереди.
+        bot_token (str): Токен Telegram-бота.
+        concurrency (int): Максимальное число одновременных отправок.
+        attempts (int): Количество попыток отправки в каждый канал за этот вызов.
+        base_url (str): Адрес Bot API.
+        limiter (Optional[RateLimiter]): Ограничитель частоты отправки.
+        owner (Optional[str]): Владелец поста (Outbox.claim). Перед каждой отправкой владение
+            продлевается, а после рассылки снимается; если пост перехватил другой владелец,
+            оставшиеся каналы не отправляются.
+
+    Возвращает:
+        list[SendResult]: Результаты по всем каналам поста в порядке следования каналов;
+            для доставленных ранее или отклонённых каналом — состояние и число попыток из очереди.
+    """
+    post = outbox.get(post_id)
+    deliveries = outbox.deliveries(post_id)
+    caption = post.message.replace("*", "")
+    results = {
+        delivery.channel: SendResult(
+            channel=delivery.channel,
+            ok=delivery.state == SENT,
+            attempts=delivery.attempts,
+            error=delivery.error,
+            rejected=delivery.state == REJECTED
+        )
+        for delivery in deliveries if delivery.state in FINAL_STATES
+    }
+    pending = [delivery.channel for delivery in deliveries if delivery.state not in FINAL_STATES]
+    if not pending:
+        return [results[delivery.channel] for delivery in deliveries]
+
+    async def send(channel: str, photo):
+        if owner is not None and not outbox.claim(post_id, owner):
+            results[channel] = SendResult(channel=channel, ok=False, attempts=0, error="Post is owned by another job")
+            return None
+        outbox.start(post_id, channel)
+        result, file_id = await _send_photo(bot, channel, caption, photo, attempts, limiter)
+        outbox.finish(post_id, channel, result.ok, result.attempts, result.error, result.rejected)
+        results[channel] = result
+        return file_id
+
+    try:
+        bot = Bot(token=bot_token, base_url=base_url)
+        await call_with_retry_async("telegram", bot.initialize)
+        async with bot:
+            photo = post.file_id or post.picture
+            while pending and photo is post.picture:
+                file_id = await send(pending.pop(0), photo)
+                if file_id:
+                    outbox.set_file_id(post_id, file_id)
+                    photo = file_id
+
+            semaphore = asyncio.Semaphore(max(1, concurrency))
+
+            async def send_limited(channel: str) -> None:
+                async with semaphore:
+                    await send(channel, photo)
+
+            await asyncio.gather(*(send_limited(channel) for channel in pending))
+    finally:
+        if owner is not None:
+            outbox.release(post_id, owner)
+
+    return [results[delivery.channel] for delivery in deliveries]
@@ -0,0 +1,344 @@
+import asyncio
+import functools
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import NamedTuple, Optional
+
+# Состояния доставки поста в канал
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+REJECTED = "rejected"
+# Конечные состояния: такие доставки при повторном запуске не отправляются
+FINAL_STATES = (SENT, REJECTED)
+
+
+class OutboxPost(NamedTuple):
+    """
+    Пост, сохранённый в очереди на отправку.
+
+    Атрибуты:
+        id (int): Идентификатор поста.
+        topic (str): Тема поста.
+        message (str): Текст поста.
+        picture (bytes): Изображение.
+        file_id (Optional[str]): file_id изображения после первой успешной загрузки в Telegram.
+    """
+    id: int
+    topic: str
+    message: str
+    picture: bytes
+    file_id: Optional[str]
+
+
+class Delivery(NamedTuple):
+    """
+    Состояние доставки поста в один канал.
+
+    Атрибуты:
+        channel (str): Канал.
+        state (str): "pending", "sending", "sent", "failed" (повторится при следующем запуске)
+            или "rejected" (канал отклонил пост ошибкой, которую повтор не исправит).
+        attempts (int): Сколько попыток отправки сделано, в том числе до перезапуска программы.
+        error (Optional[str]): Последняя ошибка.
+    """
+    channel: str
+    state: str
+    attempts: int
+    error: Optional[str] = None
+
+
+class Outbox:
+    """
+    Постоянная очередь постов на отправку в Telegram поверх SQLite.
+
+    Для каждого поста хранятся текст, изображение (и его file_id после первой загрузки)
+    и состояние доставки в каждый канал. Если программа упала посреди рассылки,
+    при следующем запуске пост досылается только в каналы, куда он ещё не доставлен,
+    без повторного поиска статьи, генерации и загрузки изображения.
+
+    Особенности:
+        - Перед отправкой доставка помечается как "sending". Такая доставка после падения
+          отправляется повторно, потому что Telegram не сообщает, дошёл ли прерванный запрос.
+        - Недоставленными считаются доставки "pending", "sending" и "failed": при повторном
+          запуске они отправляются снова. Доставки, отклонённые каналом ("rejected": нет прав,
+          неверный канал), не повторяются.
+        - Пост рассылает только его владелец (claim). Владение истекает через lease_seconds
+          без продления или сразу, если процесс-владелец на этой машине завершился, поэтому
+          одновременные задания на одну тему не рассылают чужой пост, который ещё отправляется.
+        - Через retention_seconds посты удаляются, а недоставленные перестают досылаться.
+
+    Пример использования:
+        outbox = Outbox(".cache/outbox.sqlite3")
+        owner = new_owner()
+        post_id = outbox.add("Эрмитаж", post, picture, ["@channel"], owner)
+    """
+
+    def __init__(self, path: str, retention_seconds: float = 7 * 24 * 3600, lease_seconds: float = 600):
+        self.path = path
+        self.retention_seconds = retention_seconds
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS posts ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " topic TEXT NOT NULL,"
+            " message TEXT NOT NULL,"
+            " picture BLOB NOT NULL,"
+            " file_id TEXT,"
+            " created_at REAL NOT NULL,"
+            " channels TEXT NOT NULL DEFAULT '',"
+            " owner TEXT,"
+            " lease_until REAL NOT NULL DEFAULT 0)"
+        )
+        # Базы, созданные до появления владельцев, дополняются новыми столбцами
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(posts)")}
+        for column, definition in (
+                ("channels", "TEXT NOT NULL DEFAULT ''"),
+                ("owner", "TEXT"),
+                ("lease_until", "REAL NOT NULL DEFAULT 0"),
+        ):
+            if column not in columns:
+                self._connection.execute(f"ALTER TABLE posts ADD COLUMN {column} {definition}")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS deliveries ("
+            " post_id INTEGER NOT NULL REFERENCES posts (id) ON DELETE CASCADE,"
+            " position INTEGER NOT NULL,"
+            " channel TEXT NOT NULL,"
+            " state TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " error TEXT,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (post_id, channel))"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS deliveries_state ON deliveries (state)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS posts_created_at ON posts (created_at)")
+        self._connection.execute("PRAGMA foreign_keys=ON")
+
+    def add(self, topic: str, message: str, picture: bytes, channels: list[str], owner: str) -> int:
+        """
+        Сохраняет пост и ожидающие доставки во все каналы, возвращает идентификатор поста.
+        Пост сразу принадлежит `owner` (new_owner).
+        """
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                post_id = self._connection.execute(
+                    "INSERT INTO posts (topic, message, picture, file_id, created_at, channels, owner, lease_until)"
+                    " VALUES (?, ?, ?, NULL, ?, ?, ?, ?)",
+                    (topic, message, picture, now, channels_key(channels), owner, now + self.lease_seconds)
+                ).lastrowid
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO deliveries (post_id, position, channel, state, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    [(post_id, position, channel, PENDING, now) for position, channel in enumerate(channels)]
+                )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+        return post_id
+
+    def get(self, post_id: int) -> OutboxPost:
+        """Возвращает пост по идентификатору."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT id, topic, message, picture, file_id FROM posts WHERE id = ?", (post_id,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(post_id)
+        return OutboxPost(*row)
+
+    def deliveries(self, post_id: int) -> list[Delivery]:
+        """Возвращает доставки поста в порядке каналов."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT channel, state, attempts, error FROM deliveries WHERE post_id = ? ORDER BY position",
+                (post_id,)
+            ).fetchall()
+        return [Delivery(*row) for row in rows]
+
+    def unfinished(self, topic: Optional[str] = None, channels: Optional[list[str]] = None) -> list[int]:
+        """
+        Возвращает идентификаторы постов моложе retention_seconds, доставленных не во все каналы
+        (есть доставки не в конечном состоянии "sent" или "rejected").
+        Если заданы topic и channels, возвращаются только посты на эту тему для того же набора каналов.
+        """
+        now = time.time()
+        query = (
+            "SELECT DISTINCT posts.id FROM posts JOIN deliveries ON deliveries.post_id = posts.id"
+            " WHERE deliveries.state NOT IN (?, ?) AND posts.created_at >= ?"
+        )
+        params: tuple = (*FINAL_STATES, now - self.retention_seconds)
+        if topic is not None:
+            query += " AND posts.topic = ?"
+            params += (topic,)
+        if channels is not None:
+            query += " AND posts.channels = ?"
+            params += (channels_key(channels),)
+        with self._lock:
+            self._prune(now)
+            return [row[0] for row in self._connection.execute(query + " ORDER BY posts.id", params)]
+
+    def claim(self, post_id: int, owner: str) -> bool:
+        """
+        Делает `owner` владельцем поста или продлевает его владение на lease_seconds.
+
+        Возвращает:
+            bool: False, если пост принадлежит другому владельцу, который ещё работает.
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._connection.execute(
+                    "SELECT owner, lease_until FROM posts WHERE id = ?", (post_id,)
+                ).fetchone()
+                free = row is not None and (
+                    row[0] is None or row[0] == owner or row[1] < now or _owner_gone(row[0])
+                )
+                if free:
+                    self._connection.execute(
+                        "UPDATE posts SET owner = ?, lease_until = ? WHERE id = ?",
+                        (owner, now + self.lease_seconds, post_id)
+                    )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+        return free
+
+    def release(self, post_id: int, owner: str) -> None:
+        """Снимает владение постом, если он принадлежит `owner`."""
+        with self._lock:
+            self._connection.execute(
+                "UPDATE posts SET owner = NULL, lease_until = 0 WHERE id = ? AND owner = ?", (post_id, owner)
+            )
+
+    def set_file_id(self, post_id: int, file_id: str) -> None:
+        """Запоминает file_id загруженного изображения, чтобы больше не загружать его байты."""
+        with self._lock:
+            self._connection.execute("UPDATE posts SET file_id = ? WHERE id = ?", (file_id, post_id))
+
+    def start(self, post_id: int, channel: str) -> None:
+        """Помечает, что пост отправляется в канал."""
+        self._set_state(post_id, channel, SENDING, None, 0)
+
+    def finish(
+            self,
+            post_id: int,
+            channel: str,
+            ok: bool,
+            attempts: int,
+            error: Optional[str] = None,
+            rejected: bool = False
+    ) -> None:
+        """Записывает результат отправки поста в канал; rejected — канал отклонил пост окончательно."""
+        self._set_state(post_id, channel, SENT if ok else REJECTED if rejected else FAILED, error, attempts)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _set_state(self, post_id: int, channel: str, state: str, error: Optional[str], attempts: int) -> None:
+        with self._lock:
+            self._connection.execute(
+                "UPDATE deliveries SET state = ?, error = ?, attempts = attempts + ?, updated_at = ?"
+                " WHERE post_id = ? AND channel = ?",
+                (state, error, attempts, time.time(), post_id, channel)
+            )
+
+    def _prune(self, now: float) -> None:
+        # Старые посты удаляются вместе с доставками: разосланные и отклонённые каналами
+        # больше не нужны, а недоставленные после retention_seconds уже не досылаются
+        self._connection.execute("DELETE FROM posts WHERE created_at < ?", (now - self.retention_seconds,))
+
+
+def channels_key(channels: list[str]) -> str:
+    """Возвращает ключ набора каналов, не зависящий от их порядка."""
+    return json.dumps(sorted(set(channels)), ensure_ascii=False)
+
+
+def new_owner() -> str:
+    """Возвращает уникальный идентификатор владельца поста: машина, процесс и случайная часть."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:12]}"
+
+
+def _owner_gone(owner: str) -> bool:
+    """Проверяет, что процесс-владелец на этой машине завершился (о других машинах судит только срок владения)."""
+    host, _, rest = owner.partition(":")
+    pid = rest.partition(":")[0]
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        return False
+    return False
+
+
+class RateLimiter:
+    """
+    Ограничитель частоты отправки сообщений в Telegram.
+
+    Выдерживает общий интервал между сообщениями бота (rate в секунду) и
+    минимальный интервал между сообщениями в один чат. Если Telegram ответил
+    RetryAfter, чат блокируется на запрошенное время (penalize).
+    Слоты резервируются под блокировкой потока, поэтому один ограничитель можно
+    использовать из нескольких потоков и циклов событий (пакетный режим, сервис).
+    """
+
+    def __init__(self, rate: float = 25.0, chat_interval: float = 1.0):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self.chat_interval = chat_interval
+        self._next = 0.0
+        self._chat_next: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    async def wait(self, chat: str) -> None:
+        """Ждёт, пока в чат `chat` можно отправить следующее сообщение."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                chat_at = self._chat_next.get(chat, 0.0)
+                if chat_at <= now:
+                    slot = max(now, self._next)
+                    self._next = slot + self.interval
+                    self._chat_next[chat] = max(chat_at, slot + self.chat_interval)
+                    delay = slot - now
+                else:
+                    slot = None
+                    delay = chat_at - now
+            await asyncio.sleep(delay)
+            if slot is not None:
+                return
+
+    def penalize(self, chat: str, seconds: float) -> None:
+        """Запрещает отправку в чат на `seconds` секунд (ответ RetryAfter)."""
+        with self._lock:
+            self._chat_next[chat] = max(self._chat_next.get(chat, 0.0), time.monotonic() + seconds)
+
+
+@functools.cache
+def get_outbox(path: str, lease_seconds: float = 600) -> Outbox:
+    """Возвращает общую для процесса очередь постов по пути к файлу."""
+    return Outbox(path, lease_seconds=lease_seconds)
+
+
+@functools.cache
+def get_rate_limiter(rate: float, chat_interval: float) -> RateLimiter:
+    """Возвращает общий для процесса ограничитель частоты отправки."""
+    return RateLimiter(rate, chat_interval)
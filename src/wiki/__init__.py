@@ -1,25 +1,38 @@
 import difflib
+import functools
 import warnings
 
-import wikipedia
+import requests
 
-wikipedia.set_lang("ru")
+from app import metrics
+from app.cache import disk_cached
+from app.resilience import resilient
+from app.settings import CacheSettings
+from app.utils import normalize
+from .config import WikiSettings
 
 
-def normalize(text):
-    """
-    Нормализует текст для упрощения сравнения строк.
+@functools.cache
+def get_wiki_settings() -> WikiSettings:
+    """Возвращает настройки Википедии; читаются при первом обращении, уже после load_dotenv."""
+    return WikiSettings()
 
-    Приводит строку к нижнему регистру, удаляет запятые и сортирует слова в алфавитном порядке.
-    Это помогает сравнивать строки, игнорируя порядок слов и пунктуацию.
 
-    Args:
-        text (str): Исходный текст для нормализации.
+@functools.cache
+def get_cache_settings() -> CacheSettings:
+    """Возвращает настройки дискового кеша; читаются при первом обращении, уже после load_dotenv."""
+    return CacheSettings()
 
-    Returns:
-        str: Нормализованная строка с отсортированными словами в нижнем регистре без запятых.
+
+@functools.cache
+def _wikipedia():
+    """
+    Импортирует библиотеку wikipedia при первом запросе к сети и включает русский язык,
+    чтобы офлайн-индекс и нормализация тем не требовали её загрузки.
     """
-    return ' '.join(sorted(text.lower().replace(',', '').split()))
+    import wikipedia
+    wikipedia.set_lang("ru")
+    return wikipedia
 
 
 def find_best_match_normalized(query, choices):
@@ -50,6 +63,53 @@ def find_best_match_normalized(query, choices):
     return best_choice
 
 
+@resilient("wikipedia", retry_on=(requests.RequestException,))
+def search_titles(query: str) -> list[str]:
+    """
+    Ищет названия статей Википедии по запросу.
+
+    Если Википедия предлагает исправление запроса, поиск повторяется.
+    Сетевые ошибки повторяются с экспоненциальной задержкой (app.resilience).
+    """
+    wikipedia = _wikipedia()
+    try:
+        s, r = wikipedia.search(query, suggestion=True)
+        if r:
+            s = wikipedia.search(query)
+    except wikipedia.exceptions.HTTPTimeoutError as err:
+        raise requests.Timeout(str(err)) from err
+    return s
+
+
+@disk_cached("wiki", ttl=lambda: get_cache_settings().cache_wiki_ttl_seconds)
+@resilient("wikipedia", retry_on=(requests.RequestException,))
+def get_page_content(title: str) -> str:
+    """
+    Возвращает текстовое содержимое страницы Википедии по её названию.
+
+    Результат кешируется на диске по названию страницы на время cache_wiki_ttl_seconds.
+    Сетевые ошибки повторяются с экспоненциальной задержкой (app.resilience).
+    """
+    wikipedia = _wikipedia()
+    try:
+        return wikipedia.page(title).content
+    except wikipedia.exceptions.HTTPTimeoutError as err:
+        raise requests.Timeout(str(err)) from err
+
+
+@functools.cache
+def get_offline_index():
+    """
+    Возвращает офлайн-индекс Википедии из каталога wiki_offline_dir, либо None, если он не задан.
+    """
+    wiki_settings = get_wiki_settings()
+    if not wiki_settings.wiki_offline_dir:
+        return None
+    from .offline import OfflineWiki
+    return OfflineWiki(wiki_settings.wiki_offline_dir)
+
+
+@metrics.timed()
 def get_article_from_wiki(query: str) -> str:
     """
     Выполняет поиск и получение содержимого статьи Википедии на русском языке по заданному запросу.
@@ -59,9 +119,13 @@ def get_article_from_wiki(query: str) -> str:
     Если предложение исправления присутствует, поиск повторяется по исправленному запросу.
     Затем из списка найденных статей выбирается наиболее подходящая по степени текстового сходства с
     исходным запросом с помощью функции find_best_match_normalized.
-    Возвращается содержимое страницы с названием, наиболее близким к запросу.
+    Возвращается содержимое страницы с названием, наиболее близким к запросу
+    (из дискового кеша, если страница уже загружалась).
     Если статьи не найдены, выводится предупреждение и возвращается пустая строка.
 
+    Если задан офлайн-индекс (wiki_offline_dir) и в нём нашлась статья с достаточно
+    похожим названием, она возвращается сразу, без обращения к сети.
+
     Args:
         query (str): Запрос для поиска статьи в Википедии.
 
@@ -69,14 +133,16 @@ def get_article_from_wiki(query: str) -> str:
         str: Текстовое содержимое наиболее релевантной статьи Википедии на русском языке,
              либо пустая строка, если статьи не найдены.
     """
+    offline_index = get_offline_index()
+    if offline_index is not None:
+        found = offline_index.best_article(query)
+        if found and found[1] >= get_wiki_settings().wiki_offline_min_score:
+            return found[2]
 
-    s, r = wikipedia.search(query, suggestion=True)
-    if r:
-        s = wikipedia.search(query)
-
+    s = search_titles(query)
     if not s:
         warnings.warn("Не найдено статей")
         return ""
 
     best_match = find_best_match_normalized(query=query,choices=s)
-    return wikipedia.page(best_match).content
\ No newline at end of file
+    return get_page_content(best_match)
\ No newline at end of file
@@ -0,0 +1,17 @@
+from typing import Optional
+
+from pydantic_settings import BaseSettings
+
+
+class WikiSettings(BaseSettings):
+    """
+    Настройки поиска статей в Википедии.
+
+    Атрибуты:
+        wiki_offline_dir (Optional[str]): Каталог офлайн-индекса, построенного командой
+            `python -m wiki.offline build`. Если задан, статьи сначала ищутся в нём без обращения к сети.
+        wiki_offline_min_score (float): Минимальная схожесть названия статьи с запросом (от 0 до 1),
+            при которой статья из офлайн-индекса принимается без обращения к сети.
+    """
+    wiki_offline_dir: Optional[str] = None
+    wiki_offline_min_score: float = 0.5
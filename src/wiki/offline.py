@@ -0,0 +1,327 @@
+"""
+Офлайн-индекс Википедии, построенный из локального дампа.
+
+Индекс состоит из нескольких файлов, которые открываются через mmap:
+    titles.bin / titles.idx     — названия статей (UTF-8) и смещения.
+    bodies.bin / bodies.idx     — тексты статей, сжатые zlib, и смещения.
+    trigrams.bin                — отсортированный словарь триграмм названий.
+    postings.bin                — номера статей для каждой триграммы.
+    tricount.bin                — число различных триграмм в каждом названии.
+
+Построение индекса:
+    python -m wiki.offline build ruwiki-latest-pages-articles.xml.bz2 wiki_index
+Поиск:
+    python -m wiki.offline search wiki_index "тема поста"
+"""
+import argparse
+import bisect
+import bz2
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+import xml.etree.ElementTree as ET
+import zlib
+from array import array
+from collections import defaultdict
+from typing import Iterator, Optional
+
+from app.utils import normalize
+
+TRIGRAM_RECORD = struct.Struct("<12sQI")
+
+# Триграммы, которые встречаются в названиях чаще этой доли статей (" ма", "ия "),
+# не перебираются при поиске, а только проверяются у найденных по редким триграммам статей
+FREQUENT_TRIGRAM_SHARE = 0.05
+
+TEMPLATE_RE = re.compile(r"\{\{[^{}]*\}\}")
+TABLE_RE = re.compile(r"\{\|.*?\|\}", re.S)
+REF_RE = re.compile(r"<ref[^>/]*/>|<ref[^>]*>.*?</ref>", re.S)
+COMMENT_RE = re.compile(r"<!--.*?-->", re.S)
+TAG_RE = re.compile(r"<[^>]+>")
+FILE_LINK_RE = re.compile(r"\[\[(?:Файл|File|Изображение|Image|Категория|Category):[^\[\]]*(?:\[\[[^\]]*\]\][^\[\]]*)*\]\]")
+LINK_RE = re.compile(r"\[\[(?:[^|\]]*\|)?([^\]]*)\]\]")
+EXTERNAL_LINK_RE = re.compile(r"\[https?://[^\s\]]+ ?([^\]]*)\]")
+EMPHASIS_RE = re.compile(r"'{2,}")
+
+
+def trigrams(text: str) -> set[str]:
+    """Возвращает множество триграмм нормализованной строки, дополненной пробелами по краям."""
+    padded = f" {normalize(text)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _trigram_key(trigram: str) -> bytes:
+    return trigram.encode("utf-8")[:12].ljust(12, b"\0")
+
+
+def strip_wikitext(text: str) -> str:
+    """
+    Грубо превращает вики-разметку в обычный текст.
+
+    Удаляет шаблоны, таблицы, сноски, комментарии, HTML-теги, файлы и категории,
+    заменяет ссылки их текстом. Заголовки разделов остаются в виде "== Заголовок ==",
+    как в текстах, которые возвращает библиотека wikipedia.
+    """
+    text = COMMENT_RE.sub("", text)
+    text = REF_RE.sub("", text)
+    previous = None
+    while previous != text:
+        previous = text
+        text = TEMPLATE_RE.sub("", text)
+    text = TABLE_RE.sub("", text)
+    text = FILE_LINK_RE.sub("", text)
+    text = LINK_RE.sub(r"\1", text)
+    text = EXTERNAL_LINK_RE.sub(r"\1", text)
+    text = TAG_RE.sub("", text)
+    text = EMPHASIS_RE.sub("", text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def iter_dump(path: str) -> Iterator[tuple[str, str]]:
+    """
+    Читает дамп Википедии (XML, возможно сжатый bz2) и возвращает пары (название, текст)
+    для статей основного пространства имён, пропуская перенаправления.
+    """
+    opener = bz2.open if path.endswith(".bz2") else open
+    with opener(path, "rb") as file:
+        title, namespace, redirect, text = None, None, False, None
+        root = None
+        for event, element in ET.iterparse(file, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = element
+                continue
+            tag = element.tag.rsplit("}", 1)[-1]
+            if tag == "title":
+                title = element.text
+            elif tag == "ns":
+                namespace = element.text
+            elif tag == "redirect":
+                redirect = True
+            elif tag == "text":
+                text = element.text or ""
+            elif tag == "page":
+                if namespace == "0" and not redirect and title and text:
+                    yield title, strip_wikitext(text)
+                title, namespace, redirect, text = None, None, False, None
+                # Разобранные страницы остаются дочерними элементами корня, пока он не очищен
+                root.clear()
+
+
+def build_index(dump_path: str, out_dir: str) -> int:
+    """
+    Строит офлайн-индекс из дампа Википедии.
+
+    Параметры:
+        dump_path (str): Путь к файлу дампа pages-articles (.xml или .xml.bz2).
+        out_dir (str): Каталог, в который записываются файлы индекса.
+
+    Возвращает:
+        int: Количество проиндексированных статей.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    title_offsets = array("Q", [0])
+    body_offsets = array("Q", [0])
+    tricount = array("H")
+    postings: dict[str, array] = defaultdict(lambda: array("I"))
+
+    with open(os.path.join(out_dir, "titles.bin"), "wb") as titles, \
+            open(os.path.join(out_dir, "bodies.bin"), "wb") as bodies:
+        for number, (title, body) in enumerate(iter_dump(dump_path)):
+            encoded = title.encode("utf-8")
+            titles.write(encoded)
+            title_offsets.append(title_offsets[-1] + len(encoded))
+            compressed = zlib.compress(body.encode("utf-8"))
+            bodies.write(compressed)
+            body_offsets.append(body_offsets[-1] + len(compressed))
+            grams = trigrams(title)
+            tricount.append(min(len(grams), 0xFFFF))
+            for gram in grams:
+                postings[gram].append(number)
+
+    with open(os.path.join(out_dir, "titles.idx"), "wb") as file:
+        title_offsets.tofile(file)
+    with open(os.path.join(out_dir, "bodies.idx"), "wb") as file:
+        body_offsets.tofile(file)
+    with open(os.path.join(out_dir, "tricount.bin"), "wb") as file:
+        tricount.tofile(file)
+
+    # Ключи, обрезанные до 12 байт, могут совпасть — такие списки объединяются
+    merged: dict[bytes, array] = defaultdict(lambda: array("I"))
+    for gram, ids in postings.items():
+        merged[_trigram_key(gram)].extend(ids)
+    with open(os.path.join(out_dir, "trigrams.bin"), "wb") as keys, \
+            open(os.path.join(out_dir, "postings.bin"), "wb") as ids_file:
+        offset = 0
+        for key in sorted(merged):
+            ids = array("I", sorted(set(merged[key])))
+            keys.write(TRIGRAM_RECORD.pack(key, offset, len(ids)))
+            ids.tofile(ids_file)
+            offset += len(ids)
+    return len(tricount)
+
+
+class OfflineWiki:
+    """
+    Поиск по офлайн-индексу Википедии.
+
+    Все файлы индекса отображаются в память через mmap, поэтому открытие индекса
+    почти ничего не стоит, а в память попадают только реально прочитанные страницы.
+    Нечёткий поиск названий выполняется по триграммам с оценкой схожести Дайса.
+    Кандидаты набираются по редким триграммам запроса (хотя бы по одной, самой редкой),
+    поэтому статья, у которой с запросом общие только частые триграммы, не находится.
+
+    Пример использования:
+        index = OfflineWiki("wiki_index")
+        title, score, text = index.best_article("тема поста")
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._files = []
+        self._views = []
+        self._titles = self._map("titles.bin")
+        self._title_offsets = self._map("titles.idx", "Q")
+        self._bodies = self._map("bodies.bin")
+        self._body_offsets = self._map("bodies.idx", "Q")
+        self._tricount = self._map("tricount.bin", "H")
+        self._trigrams = self._map("trigrams.bin")
+        self._postings = self._map("postings.bin", "I")
+        self._trigram_count = len(self._trigrams) // TRIGRAM_RECORD.size
+
+    def __len__(self) -> int:
+        return len(self._tricount)
+
+    def title(self, number: int) -> str:
+        """Возвращает название статьи по её номеру."""
+        start, end = self._title_offsets[number], self._title_offsets[number + 1]
+        return bytes(self._titles[start:end]).decode("utf-8")
+
+    def body(self, number: int) -> str:
+        """Возвращает текст статьи по её номеру."""
+        start, end = self._body_offsets[number], self._body_offsets[number + 1]
+        return zlib.decompress(self._bodies[start:end]).decode("utf-8")
+
+    def search(self, query: str, limit: int = 10) -> list[tuple[str, float]]:
+        """
+        Находит статьи с названиями, наиболее похожими на запрос.
+
+        Параметры:
+            query (str): Запрос.
+            limit (int): Максимальное количество результатов.
+
+        Возвращает:
+            list[tuple[str, float]]: Пары (название, оценка схожести от 0 до 1) по убыванию оценки.
+        """
+        return [(self.title(number), score) for score, number in self._search(query, limit)]
+
+    def best_article(self, query: str) -> Optional[tuple[str, float, str]]:
+        """
+        Возвращает самую похожую на запрос статью.
+
+        Возвращает:
+            Optional[tuple[str, float, str]]: Название, оценка схожести и текст статьи, либо None.
+        """
+        results = self._search(query, limit=1)
+        if not results:
+            return None
+        score, number = results[0]
+        return self.title(number), score, self.body(number)
+
+    def close(self) -> None:
+        """Закрывает отображения файлов в память."""
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        for mapped, file in self._files:
+            mapped.close()
+            file.close()
+        self._files = []
+
+    def _search(self, query: str, limit: int) -> list[tuple[float, int]]:
+        grams = {_trigram_key(gram) for gram in trigrams(query)}
+        if not grams:
+            return []
+        # Списки статей перебираются от самой редкой триграммы; частые списки не перебираются,
+        # а только проверяются двоичным поиском у уже найденных статей (списки отсортированы)
+        found = sorted(
+            (found for found in map(self._find_trigram, grams) if found is not None),
+            key=lambda found: found[1]
+        )
+        frequent = len(self) * FREQUENT_TRIGRAM_SHARE
+        common: dict[int, int] = defaultdict(int)
+        for position, (offset, count) in enumerate(found):
+            postings = self._postings[offset:offset + count]
+            if not position or count <= frequent:
+                for number in postings:
+                    common[number] += 1
+            elif len(common) * count.bit_length() < count:
+                for number in common:
+                    index = bisect.bisect_left(postings, number)
+                    if index < count and postings[index] == number:
+                        common[number] += 1
+            else:
+                # Кандидатов столько, что дешевле пройти по списку, не добавляя новых
+                for number in postings:
+                    if number in common:
+                        common[number] += 1
+        return sorted(
+            ((2 * hits / (len(grams) + self._tricount[number]), number) for number, hits in common.items()),
+            reverse=True
+        )[:limit]
+
+    def _find_trigram(self, key: bytes) -> Optional[tuple[int, int]]:
+        low, high = 0, self._trigram_count
+        while low < high:
+            middle = (low + high) // 2
+            record_key, offset, count = TRIGRAM_RECORD.unpack_from(self._trigrams, middle * TRIGRAM_RECORD.size)
+            if record_key < key:
+                low = middle + 1
+            elif record_key > key:
+                high = middle
+            else:
+                return offset, count
+        return None
+
+    def _map(self, name: str, format: str = "B") -> memoryview:
+        file = open(os.path.join(self.directory, name), "rb")
+        if os.fstat(file.fileno()).st_size == 0:
+            file.close()
+            return memoryview(b"").cast(format)
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._files.append((mapped, file))
+        view = memoryview(mapped)
+        self._views.append(view)
+        if format != "B":
+            view = view.cast(format)
+            self._views.append(view)
+        return view
+
+
+def _main() -> None:
+    parser = argparse.ArgumentParser(description="Офлайн-индекс Википедии")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="построить индекс из дампа")
+    build.add_argument("dump")
+    build.add_argument("out_dir")
+    search = commands.add_parser("search", help="найти статьи по названию")
+    search.add_argument("index_dir")
+    search.add_argument("query")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "build":
+        count = build_index(args.dump, args.out_dir)
+        print(f"Indexed {count} articles in {time.perf_counter() - started:.1f}s")
+    else:
+        index = OfflineWiki(args.index_dir)
+        for title, score in index.search(args.query):
+            print(f"{score:.3f}  {title}")
+        print(f"Search took {(time.perf_counter() - started) * 1000:.2f}ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    _main()
@@ -1,145 +1,231 @@
 import random
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Optional
 
-import requests
-from newspaper import Article
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium_stealth import stealth
-from webdriver_manager.chrome import ChromeDriverManager
+from app.cache import disk_cached
+from app import metrics
+from app.images import posted_images, prepare_image
+from app.settings import CacheSettings, ImageSettings
+from app.resilience import resilient
+from .backends import backend_chain, http_session, search, search_settings
+from .config import ArticleSettings
 
-from app.utils import connection_problems_decorator
+EXCLUDE_SUBSTRINGS = ["yandex", "dzen"]
 
-Y_URL = "https://yandex.ru/images/search?from=tabbar&text=<q_text>"
+cache_settings = CacheSettings()
+article_settings = ArticleSettings()
+image_settings = ImageSettings()
 
-EXCLUDE_SUBSTRINGS = ["yandex", "dzen"]
 
+def __getattr__(name: str):
+    # Selenium загружается только при обращении к браузеру, а не при импорте пакета
+    if name == "SDriver":
+        from .browser import SDriver
+        return SDriver
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-class SDriver:
+
+def warm_up() -> None:
     """
-    Контекстный менеджер для инициализации и корректного завершения
-    Selenium WebDriver с настройками для скрытия автоматизации.
-
-    Использует ChromeDriver с опциями:
-        - headless режим
-        - отключение sandbox и shared memory
-        - применение stealth-методов для маскировки автоматизации
-        - установка пользовательского User-Agent
-
-    Пример использования:
-        with SDriver() as driver:
-            driver.get("https://example.com")
+    Заранее создаёт HTTP-сессию и поисковые бэкенды, а если в цепочке есть
+    браузерный бэкенд — запускает браузеры пула.
     """
-    def __enter__(self):
-        options = Options()
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-        options.add_argument('--headless')
-        options.add_argument("--log-level=3")
-
-        self.driver = webdriver.Chrome(
-            service=ChromeService(ChromeDriverManager().install()),
-            options=options
-        )
-        stealth(
-            self.driver,
-            languages=["en-US", "en"],
-            vendor="Google Inc.",
-            platform="Windows",
-            webgl_vendor="Google Inc.",
-            render="WebKit",
-            fix_hairline=True
-        )
-        self.driver.execute_cdp_cmd('Network.setUserAgentOverride', {
-            'userAgent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
-                         ' AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
-        return self.driver
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.driver.quit()
-
-
-@connection_problems_decorator
-def get_picture(q: str) -> bytes:
+    http_session()
+    for search_backend in backend_chain():
+        if search_backend.name == "selenium":
+            from .pool import driver_pool, image_driver_pool
+            driver_pool.warm_up()
+            image_driver_pool.warm_up()
+
+
+@metrics.timed()
+@resilient("yandex")
+def get_picture(q: str, backend: Optional[str] = None) -> bytes:
     """
     Получает изображение по запросу из яндекса.
 
     Логика работы:
-    1. Открывает страницу поиска изображений Яндекса с заданным текстом запроса.
-    2. Ожидает загрузки элементов изображений.
-    3. Случайным образом выбирает одно из найденных изображений.
-    4. Загружает изображение по URL через requests.
-    5. Возвращает содержимое изображения в байтах.
+    1. Получает ссылки на изображения из выдачи Яндекса через цепочку поисковых бэкендов.
+    2. Перебирает найденные изображения в случайном порядке и загружает их через общую HTTP-сессию.
+    3. Проверяет, уменьшает и пережимает изображение под ограничения Telegram (prepare_image).
+    4. Пропускает изображения, похожие на недавно опубликованные или выбранные для другого
+       поста, без повторного поиска.
+    5. Резервирует изображение (PerceptualIndex.reserve) и возвращает его в байтах;
+       в индекс опубликованных оно попадает только после публикации поста.
 
     Параметры:
         q (str): Текст запроса для поиска изображения.
+        backend (Optional[str]): Бэкенды через запятую вместо настройки search_backend.
 
     Возвращает:
         bytes: Содержимое изображения в бинарном формате.
 
     Особенности:
-        - Использует Selenium в headless режиме с маскировкой автоматизации.
-        - В случае ошибок повторяет попытку загрузки бесконечно благодаря декоратору.
+        - В случае ошибок повторяет попытку с экспоненциальной задержкой (app.resilience).
     """
-    with SDriver() as driver:
-        driver.get(Y_URL.replace("<q_text>", q))
-        img_elements = WebDriverWait(driver, 10).until(
-            EC.presence_of_all_elements_located((By.CSS_SELECTOR, "img.ImagesContentImage-Image"))
-        )
-        img_url = random.choice(img_elements).get_attribute("src")
-    response = requests.get(img_url)
-    return response.content
-
-
-@connection_problems_decorator
-def get_article(q: str) -> str:
+    img_urls = search("images", q, backend)
+    random.shuffle(img_urls)
+    for img_url in img_urls:
+        try:
+            response = http_session().get(img_url, timeout=search_settings.search_timeout)
+            response.raise_for_status()
+            picture, image_hash = prepare_image(response.content, image_settings)
+        except Exception as err:
+            print(f"Skip image {img_url} \n {err}")
+            continue
+        if not posted_images().reserve(image_hash):
+            print(f"Skip image {img_url} \n already posted")
+            continue
+        metrics.inc("picture_bytes_total", len(response.content), kind="downloaded")
+        metrics.inc("picture_bytes_total", len(picture), kind="prepared")
+        return picture
+    raise ValueError(f"No suitable images found for {q}")
+
+
+def _serp_key(q: str, backend: Optional[str] = None) -> str:
+    # Разные цепочки бэкендов могут вернуть разную выдачу, поэтому цепочка входит в ключ
+    return f"{backend or search_settings.search_backend}:{q}"
+
+
+@disk_cached("serp", ttl=lambda: cache_settings.cache_serp_ttl_seconds, key=_serp_key)
+@resilient("yandex")
+def search_urls(q: str, backend: Optional[str] = None) -> list[str]:
     """
-    Выполняет поиск по запросу `q` на Яндексе, извлекает ссылки из результатов поиска,
-    фильтрует их по заданным исключениям, затем пытается скачать и распарсить текст статьи
-    с первой доступной ссылки с помощью библиотеки Article.
+    Выполняет поиск по запросу `q` на Яндексе и возвращает ссылки из результатов поиска,
+    отфильтрованные по заданным исключениям.
 
     Параметры:
         q (str): поисковый запрос.
+        backend (Optional[str]): бэкенды через запятую вместо настройки search_backend.
 
     Возвращает:
-        str: текст первой успешно загруженной и распарсенной статьи.
+        list[str]: ссылки на найденные страницы.
+
+    Особенности:
+        - Бэкенды ("http", "selenium") перебираются по порядку, пока один из них не вернёт ссылки.
+        - В случае ошибок всех бэкендов повторяет попытку с экспоненциальной задержкой (app.resilience).
+        - Результат кешируется на диске по запросу и цепочке бэкендов на время cache_serp_ttl_seconds.
+    """
+    return [
+        s for s in search("urls", q, backend)
+        if not any(sub in s.lower() for sub in EXCLUDE_SUBSTRINGS)
+    ]
+
+
+@disk_cached("article", ttl=lambda: cache_settings.cache_article_ttl_seconds, key=lambda url, *args, **kwargs: url)
+def extract_article(url: str, timeout: float = 10) -> str:
+    """
+    Скачивает страницу по ссылке и извлекает из неё текст статьи с помощью библиотеки Article.
+
+    Параметры:
+        url (str): ссылка на страницу.
+        timeout (float): таймаут скачивания страницы в секундах.
+
+    Результат кешируется на диске по ссылке на время cache_article_ttl_seconds.
+    """
+    from newspaper import Article
+
+    # Без языка newspaper ищет английские стоп-слова и не находит текст в русских статьях
+    article = Article(url, language=article_settings.article_language or "en", request_timeout=timeout)
+    article.download()
+    article.parse()
+    return article.text
+
+
+def is_language(text: str, language: str) -> bool:
+    """
+    Грубо проверяет язык текста по доле букв нужного алфавита.
+
+    Параметры:
+        text (str): проверяемый текст.
+        language (str): "ru" — кириллица, любой другой код — латиница, пустая строка — без проверки.
+
+    Возвращает:
+        bool: True, если не меньше половины букв текста относятся к нужному алфавиту.
+    """
+    if not language:
+        return True
+    letters = [ch for ch in text if ch.isalpha()]
+    if not letters:
+        return False
+    cyrillic = sum('а' <= ch.lower() <= 'я' or ch.lower() == 'ё' for ch in letters)
+    share = cyrillic / len(letters)
+    return share >= 0.5 if language == "ru" else share < 0.5
+
+
+def is_good_article(text: str) -> bool:
+    """Проверяет, что статья проходит порог качества из ArticleSettings (длина и язык)."""
+    return len(text) >= article_settings.article_min_length and is_language(text, article_settings.article_language)
+
+
+def score_article(text: str, q: str) -> float:
+    """
+    Оценивает, насколько статья подходит под запрос.
+
+    Учитывает долю слов запроса, встречающихся в тексте (сравниваются первые 5 букв слова,
+    чтобы не зависеть от окончаний), и длину текста, ограниченную 5000 символами.
+
+    Параметры:
+        text (str): текст статьи.
+        q (str): поисковый запрос.
+
+    Возвращает:
+        float: оценка от 0 до 2, чем больше, тем лучше.
+    """
+    words = {word[:5] for word in q.lower().split() if len(word) > 2}
+    text_words = {word[:5] for word in text.lower().split()}
+    coverage = len(words & text_words) / len(words) if words else 0
+    return coverage + min(len(text), 5000) / 5000
+
+
+@metrics.timed()
+def get_article(q: str, scorer: Callable[[str, str], float] = score_article, backend: Optional[str] = None) -> str:
+    """
+    Выполняет поиск по запросу `q` на Яндексе и извлекает текст статьи из результатов поиска.
+
+    Логика работы:
+    1. Получает ссылки из поисковой выдачи.
+    2. Скачивает страницы одновременно (не больше article_workers), у каждой
+       загрузки свой таймаут, а у всего поиска — общий срок article_deadline_seconds.
+    3. Останавливает загрузку, как только очередная статья прошла порог качества
+       (минимальная длина и язык).
+    4. Среди скачанных статей выбирает лучшую с помощью функции `scorer`.
+
+    Параметры:
+        q (str): поисковый запрос.
+        scorer (callable): функция оценки статьи, принимающая текст и запрос.
+        backend (Optional[str]): поисковые бэкенды через запятую вместо настройки search_backend.
+
+    Возвращает:
+        str: текст лучшей из скачанных статей.
              Если ни одна статья не была получена, возвращает пустую строку.
 
     Особенности:
-        - Использует Selenium для автоматизации браузера и получения ссылок.
-        - Скрывает модальное окно с классом 'DistributionSplashScreenModalScene', если оно появляется,
-          чтобы избежать блокировки клика по элементу ввода.
-        - В случае ошибок повторяет попытку загрузки бесконечно благодаря декоратору.
+        - Ссылки из поисковой выдачи и тексты статей берутся из дискового кеша,
+          если они были получены недавно, поэтому повторные запросы не запускают браузер.
     """
-    with SDriver() as driver:
-        driver.get(f"https://yandex.ru/search/?text={q}")
-        input_el = driver.find_element(By.CSS_SELECTOR, "input")
-        driver.execute_script("""
-            let el = document.querySelector('.DistributionSplashScreenModalScene');
-            if (el) {
-                el.style.display = 'none';
-            }
-        """)
-        input_el.click()
-        a_elements = WebDriverWait(driver, 10).until(
-            EC.presence_of_all_elements_located((By.CSS_SELECTOR, "a.Link.organic__greenurl"))
-        )
-        urls = [a.get_attribute("href") for a in a_elements]
-        urls = [
-            s for s in urls
-            if not any(sub in s.lower() for sub in EXCLUDE_SUBSTRINGS)
-        ]
-    for url in urls:
-        try:
-            article = Article(url)
-            article.download()
-            article.parse()
-            return article.text
-        except:
-            continue
-    return ""
+    urls = search_urls(q, backend)
+    if not urls:
+        return ""
+
+    executor = ThreadPoolExecutor(max_workers=article_settings.article_workers)
+    futures = [executor.submit(extract_article, url, article_settings.article_request_timeout) for url in urls]
+    articles = []
+    try:
+        for future in as_completed(futures, timeout=article_settings.article_deadline_seconds):
+            try:
+                text = future.result()
+            except Exception:
+                continue
+            if text:
+                articles.append(text)
+                if is_good_article(text):
+                    break
+    except TimeoutError:
+        print(f"Article deadline exceeded for {q}, got {len(articles)} articles")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    candidates = [text for text in articles if is_good_article(text)] or articles
+    return max(candidates, key=lambda text: scorer(text, q), default="")
@@ -0,0 +1,169 @@
+import functools
+from abc import ABC, abstractmethod
+from html.parser import HTMLParser
+from typing import Optional
+from urllib.parse import quote_plus, urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import SearchSettings
+
+USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
+    ' AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+)
+
+ARTICLE_LINK_CLASSES = {"Link", "organic__greenurl"}
+IMAGE_CLASSES = {"ImagesContentImage-Image"}
+
+search_settings = SearchSettings()
+
+
+def search_page_url(q: str) -> str:
+    """Возвращает адрес страницы поиска статей по запросу."""
+    return f"{search_settings.search_base_url}/search/?text={quote_plus(q)}"
+
+
+def image_page_url(q: str) -> str:
+    """Возвращает адрес страницы поиска изображений по запросу."""
+    return f"{search_settings.search_base_url}/images/search?from=tabbar&text={quote_plus(q)}"
+
+
+class SearchBackend(ABC):
+    """
+    Интерфейс поискового бэкенда.
+
+    Бэкенд умеет получать из поисковой выдачи ссылки на статьи и ссылки на изображения.
+    """
+    name: str
+
+    @abstractmethod
+    def search_urls(self, q: str) -> list[str]:
+        """Возвращает ссылки на статьи из выдачи по запросу `q`."""
+
+    @abstractmethod
+    def search_images(self, q: str) -> list[str]:
+        """Возвращает ссылки на изображения из выдачи по запросу `q`."""
+
+
+class _ResultParser(HTMLParser):
+    """
+    Разбирает HTML страницы выдачи и собирает ссылки на статьи и изображения
+    по тем же CSS-классам, что используются в браузерном бэкенде.
+    """
+
+    def __init__(self, base_url: str):
+        super().__init__()
+        self.base_url = base_url
+        self.links: list[str] = []
+        self.images: list[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = set((attrs.get("class") or "").split())
+        if tag == "a" and ARTICLE_LINK_CLASSES <= classes and attrs.get("href"):
+            self.links.append(urljoin(self.base_url, attrs["href"]))
+        elif tag == "img" and IMAGE_CLASSES <= classes and attrs.get("src"):
+            self.images.append(urljoin(self.base_url, attrs["src"]))
+
+
+class HttpBackend(SearchBackend):
+    """
+    Поисковый бэкенд, который скачивает HTML выдачи напрямую через пул HTTP-соединений
+    и разбирает его без запуска браузера.
+    """
+    name = "http"
+
+    def __init__(self, session: Optional[requests.Session] = None):
+        self.session = session or http_session()
+
+    def search_urls(self, q: str) -> list[str]:
+        return self._parse(search_page_url(q)).links
+
+    def search_images(self, q: str) -> list[str]:
+        return self._parse(image_page_url(q)).images
+
+    def _parse(self, url: str) -> _ResultParser:
+        response = self.session.get(url, timeout=search_settings.search_timeout)
+        response.raise_for_status()
+        parser = _ResultParser(response.url)
+        parser.feed(response.text)
+        return parser
+
+
+@functools.cache
+def http_session() -> requests.Session:
+    """
+    Возвращает общую для процесса HTTP-сессию с пулом keep-alive соединений.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=search_settings.search_pool_size,
+        pool_maxsize=search_settings.search_pool_size
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+@functools.cache
+def get_backend(name: str) -> SearchBackend:
+    """
+    Возвращает бэкенд по имени ("http" или "selenium").
+
+    Браузерный бэкенд импортируется только при первом обращении,
+    поэтому без него Selenium не загружается вовсе.
+    """
+    if name == "http":
+        return HttpBackend()
+    if name == "selenium":
+        from .browser import SeleniumBackend
+        return SeleniumBackend()
+    raise ValueError(f"Unknown search backend {name}")
+
+
+def backend_chain(backend: Optional[str] = None) -> list[SearchBackend]:
+    """
+    Возвращает бэкенды в порядке использования.
+
+    Параметры:
+        backend (Optional[str]): Список имён бэкендов через запятую.
+            Если не задан, берётся из настройки search_backend.
+    """
+    names = backend or search_settings.search_backend
+    return [get_backend(name.strip()) for name in names.split(",") if name.strip()]
+
+
+def search(kind: str, q: str, backend: Optional[str] = None) -> list[str]:
+    """
+    Выполняет поиск по цепочке бэкендов и возвращает первый непустой результат.
+
+    Параметры:
+        kind (str): "urls" для ссылок на статьи или "images" для изображений.
+        q (str): Поисковый запрос.
+        backend (Optional[str]): Список имён бэкендов через запятую вместо настройки search_backend.
+
+    Возвращает:
+        list[str]: Найденные ссылки, либо пустой список, если ни один бэкенд ничего не нашёл.
+
+    Особенности:
+        - Если все бэкенды упали, пробрасывается последняя ошибка.
+    """
+    error = None
+    failed = 0
+    chain = backend_chain(backend)
+    for search_backend in chain:
+        try:
+            results = getattr(search_backend, f"search_{kind}")(q)
+        except Exception as err:
+            print(f'Exception in {search_backend.name} search backend \n {err}')
+            error = err
+            failed += 1
+            continue
+        if results:
+            return results
+    if error is not None and failed == len(chain):
+        raise error
+    return []
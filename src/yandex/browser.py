@@ -0,0 +1,95 @@
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from app import metrics
+from .backends import SearchBackend, image_page_url, search_page_url
+from .pool import driver_pool, image_driver_pool
+
+# Элементы выдачи, ради которых открываются страницы поиска
+URL_SELECTOR = "a.Link.organic__greenurl"
+IMAGE_SELECTOR = "img.ImagesContentImage-Image"
+
+
+class SDriver:
+    """
+    Контекстный менеджер, выдающий браузер Selenium из общего пула.
+
+    Браузер с настройками для скрытия автоматизации запускается пулом один раз
+    и переиспользуется между вызовами, а после выхода из контекста возвращается в пул.
+    Если внутри контекста браузер перестал отвечать, он закрывается и заменяется новым.
+    Ожидание браузера в пуле и работа с ним измеряются отдельными участками
+    driver_acquire и driver_session (app.metrics).
+
+    В облегчённом режиме (driver_lean_mode, см. launch_driver) браузер не загружает
+    тяжёлые ресурсы и трекеры, а браузер без изображений — и изображения: из страниц
+    поиска статей нужны только ссылки, поэтому они загружаются быстрее и занимают меньше памяти.
+
+    Параметры:
+        images (bool): Нужны ли на странице изображения. Браузер с изображениями
+            (для поиска картинок) берётся из отдельного пула image_driver_pool.
+
+    Пример использования:
+        with SDriver(images=False) as driver:
+            driver.get("https://example.com")
+    """
+    def __init__(self, images: bool = True):
+        self.pool = image_driver_pool if images else driver_pool
+
+    def __enter__(self):
+        with metrics.span("driver_acquire"):
+            self.driver = self.pool.acquire()
+        self.span = metrics.span("driver_session")
+        self.span.__enter__()
+        return self.driver
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        broken = (
+            exc_type is not None
+            and not issubclass(exc_type, TimeoutException)
+            and not self.pool.is_healthy(self.driver)
+        )
+        self.pool.release(self.driver, broken=broken)
+        self.span.__exit__(exc_type, exc_val, exc_tb)
+
+
+class SeleniumBackend(SearchBackend):
+    """
+    Поисковый бэкенд на основе браузера Selenium из общего пула.
+
+    Медленнее HTTP-бэкенда, но выполняет JavaScript страницы, поэтому
+    используется как запасной вариант.
+    """
+    name = "selenium"
+
+    def search_urls(self, q: str) -> list[str]:
+        """
+        Открывает страницу поиска и собирает ссылки из результатов.
+
+        Скрывает модальное окно с классом 'DistributionSplashScreenModalScene', если оно появляется,
+        чтобы избежать блокировки клика по элементу ввода.
+        """
+        with SDriver(images=False) as driver:
+            driver.get(search_page_url(q))
+            input_el = driver.find_element(By.CSS_SELECTOR, "input")
+            driver.execute_script("""
+                let el = document.querySelector('.DistributionSplashScreenModalScene');
+                if (el) {
+                    el.style.display = 'none';
+                }
+            """)
+            input_el.click()
+            a_elements = WebDriverWait(driver, 10).until(
+                EC.presence_of_all_elements_located((By.CSS_SELECTOR, URL_SELECTOR))
+            )
+            return [a.get_attribute("href") for a in a_elements]
+
+    def search_images(self, q: str) -> list[str]:
+        """Открывает страницу поиска изображений и собирает ссылки на найденные изображения."""
+        with SDriver(images=True) as driver:
+            driver.get(image_page_url(q))
+            img_elements = WebDriverWait(driver, 10).until(
+                EC.presence_of_all_elements_located((By.CSS_SELECTOR, IMAGE_SELECTOR))
+            )
+            return [img.get_attribute("src") for img in img_elements]
@@ -0,0 +1,91 @@
+from pydantic_settings import BaseSettings
+
+
+class DriverPoolSettings(BaseSettings):
+    """
+    Настройки пула браузеров Selenium.
+
+    Атрибуты:
+        driver_pool_size (int): Максимальное количество одновременно запущенных браузеров в пуле.
+            Поиск статей и поиск картинок используют отдельные пулы.
+        driver_warm_size (int): Сколько браузеров запускать заранее при первом обращении к пулу.
+        driver_max_uses (int): После скольких использований браузер перезапускается.
+        driver_max_heap_mb (int): Порог памяти JS-кучи страницы (в МБ), после которого браузер перезапускается.
+        driver_acquire_timeout (float): Сколько секунд ждать свободный браузер из пула.
+        driver_lean_mode (bool): Облегчённый режим для страниц выдачи: загрузка без ожидания
+            ресурсов, без изображений при поиске статей, блокировка тяжёлых ресурсов, ограниченное окно.
+        driver_page_load_strategy (str): Стратегия загрузки страницы в облегчённом режиме
+            ("eager" — до DOMContentLoaded, "normal" — до загрузки всех ресурсов).
+        driver_blocked_resources (str): Типы ресурсов через запятую, которые не загружаются
+            в облегчённом режиме: font, stylesheet, media, image. Стили по умолчанию загружаются:
+            без них меняется разметка выдачи, на которую опираются селекторы.
+        driver_blocked_urls (str): Шаблоны адресов через запятую (с подстановкой *), которые
+            не загружаются в облегчённом режиме: счётчики, реклама, трекеры.
+        driver_window_size (str): Размер окна браузера в облегчённом режиме, "ширина,высота".
+    """
+    driver_pool_size: int = 1
+    driver_warm_size: int = 1
+    driver_max_uses: int = 20
+    driver_max_heap_mb: int = 512
+    driver_acquire_timeout: float = 120
+    driver_lean_mode: bool = True
+    driver_page_load_strategy: str = "eager"
+    driver_blocked_resources: str = "font,media"
+    driver_blocked_urls: str = (
+        "*mc.yandex.ru*,*an.yandex.ru*,*yabs.yandex.ru*,*/metrika/*,*/ads/*,"
+        "*doubleclick.net*,*googletagmanager.com*,*google-analytics.com*,*top-fwz1.mail.ru*"
+    )
+    driver_window_size: str = "1024,768"
+
+
+class ArticleSettings(BaseSettings):
+    """
+    Настройки извлечения статей из результатов поиска.
+
+    Атрибуты:
+        article_workers (int): Сколько страниц из выдачи скачивается одновременно.
+        article_request_timeout (float): Таймаут скачивания одной страницы в секундах.
+        article_deadline_seconds (float): Общее время ожидания статей в секундах.
+        article_min_length (int): Минимальная длина текста, при которой статья считается подходящей.
+        article_language (str): Язык, на котором должна быть статья ("ru", "en"),
+            пустая строка отключает проверку языка.
+    """
+    article_workers: int = 4
+    article_request_timeout: float = 10
+    article_deadline_seconds: float = 25
+    article_min_length: int = 500
+    article_language: str = "ru"
+
+
+class SearchSettings(BaseSettings):
+    """
+    Настройки поисковых бэкендов.
+
+    Атрибуты:
+        search_backend (str): Список бэкендов через запятую в порядке использования
+            ("http" — прямые HTTP-запросы, "selenium" — браузер). Следующий бэкенд
+            используется, если предыдущий упал или ничего не нашёл.
+        search_base_url (str): Адрес поисковой системы (можно заменить на локальный сервер с фикстурами).
+        search_timeout (float): Таймаут HTTP-запроса в секундах.
+        search_pool_size (int): Размер пула HTTP-соединений на один хост.
+    """
+    search_backend: str = "http,selenium"
+    search_base_url: str = "https://yandex.ru"
+    search_timeout: float = 10
+    search_pool_size: int = 10
+
+
+class ScrapeSettings(BaseSettings):
+    """
+    Настройки пула рабочих процессов для поиска статей и изображений (yandex.workers).
+
+    Атрибуты:
+        scrape_workers (int): Количество рабочих процессов, у каждого свой браузер.
+            0 — поиск выполняется в основном процессе.
+        scrape_task_timeout (float): Сколько секунд даётся одной задаче; зависший процесс
+            убивается вместе с браузером и запускается заново.
+        scrape_worker_max_tasks (int): После скольких задач рабочий процесс перезапускается.
+    """
+    scrape_workers: int = 0
+    scrape_task_timeout: float = 120
+    scrape_worker_max_tasks: int = 50
@@ -0,0 +1,271 @@
+import atexit
+import functools
+import threading
+import time
+from typing import Optional
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service as ChromeService
+from selenium_stealth import stealth
+from webdriver_manager.chrome import ChromeDriverManager
+
+from .config import DriverPoolSettings
+
+
+def _extensions(*extensions: str) -> list[str]:
+    # Ресурсы часто запрашиваются с параметрами ("font.woff2?v=3"), поэтому нужен и шаблон с "?"
+    return [pattern for extension in extensions for pattern in (f"*.{extension}", f"*.{extension}?*")]
+
+
+# Шаблоны адресов, по которым Network.setBlockedURLs блокирует ресурсы каждого типа
+RESOURCE_PATTERNS = {
+    "font": _extensions("woff", "woff2", "ttf", "otf", "eot"),
+    "stylesheet": _extensions("css"),
+    "media": _extensions("mp4", "webm", "m3u8", "mp3", "ogg"),
+    "image": _extensions("jpg", "jpeg", "png", "gif", "webp", "svg", "ico", "avif") + [
+        "*avatars.mds.yandex.net*", "*.yandex.net/i?id=*",
+    ],
+}
+
+
+@functools.cache
+def driver_path() -> str:
+    """
+    Возвращает путь к ChromeDriver.
+
+    ChromeDriverManager проверяет и при необходимости скачивает драйвер,
+    поэтому путь вычисляется один раз за время работы процесса.
+    """
+    return ChromeDriverManager().install()
+
+
+def blocked_urls(settings: DriverPoolSettings, images: bool = True) -> list[str]:
+    """
+    Возвращает шаблоны адресов, которые браузер не загружает в облегчённом режиме.
+
+    Параметры:
+        settings (DriverPoolSettings): Настройки пула с типами ресурсов и шаблонами адресов.
+        images (bool): Загружать ли изображения. Если нет, они блокируются вместе с ресурсами
+            из driver_blocked_resources.
+    """
+    if not settings.driver_lean_mode:
+        return []
+    resources = {name.strip() for name in settings.driver_blocked_resources.split(",") if name.strip()}
+    if not images:
+        resources.add("image")
+    patterns = [pattern for name in sorted(resources) for pattern in RESOURCE_PATTERNS.get(name, [])]
+    return patterns + [pattern.strip() for pattern in settings.driver_blocked_urls.split(",") if pattern.strip()]
+
+
+def launch_driver(settings: Optional[DriverPoolSettings] = None, images: bool = True) -> webdriver.Chrome:
+    """
+    Запускает headless Chrome с настройками для скрытия автоматизации.
+
+    Использует ChromeDriver с опциями:
+        - headless режим
+        - отключение sandbox и shared memory
+        - применение stealth-методов для маскировки автоматизации
+        - установка пользовательского User-Agent
+
+    В облегчённом режиме (driver_lean_mode) дополнительно:
+        - стратегия загрузки driver_page_load_strategy (по умолчанию eager: driver.get
+          возвращается после разбора HTML, не дожидаясь картинок, шрифтов и скриптов);
+        - ограниченный размер окна driver_window_size;
+        - при images=False изображения не скачиваются и не декодируются
+          (--blink-settings=imagesEnabled=false): со страниц поиска статей нужны только ссылки.
+          Флаг задаётся при запуске, поэтому браузеры для поиска картинок, которым нужны
+          адреса загруженных миниатюр, запускаются отдельным пулом (image_driver_pool);
+        - блокировка тяжёлых ресурсов и трекеров через CDP Network.setBlockedURLs.
+
+    Параметры:
+        settings (Optional[DriverPoolSettings]): Настройки пула браузеров.
+        images (bool): Загружать ли изображения в облегчённом режиме.
+    """
+    settings = settings or DriverPoolSettings()
+    options = Options()
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--headless')
+    options.add_argument("--log-level=3")
+    if settings.driver_lean_mode:
+        options.page_load_strategy = settings.driver_page_load_strategy
+        options.add_argument(f"--window-size={settings.driver_window_size}")
+        if not images:
+            options.add_argument("--blink-settings=imagesEnabled=false")
+
+    driver = webdriver.Chrome(
+        service=ChromeService(driver_path()),
+        options=options
+    )
+    stealth(
+        driver,
+        languages=["en-US", "en"],
+        vendor="Google Inc.",
+        platform="Windows",
+        webgl_vendor="Google Inc.",
+        render="WebKit",
+        fix_hairline=True
+    )
+    driver.execute_cdp_cmd('Network.setUserAgentOverride', {
+        'userAgent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
+                     ' AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    })
+    if settings.driver_lean_mode:
+        driver.execute_cdp_cmd('Network.enable', {})
+        block_urls(driver, blocked_urls(settings, images=images))
+    return driver
+
+
+def block_urls(driver: webdriver.Chrome, patterns: list[str]) -> None:
+    """Задаёт шаблоны адресов, которые браузер не загружает."""
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+
+
+class DriverPool:
+    """
+    Пул заранее запущенных браузеров Selenium.
+
+    Браузеры запускаются лениво при первом запросе и переиспользуются между вызовами.
+    Перед выдачей браузер проверяется на работоспособность, а после возврата
+    перезапускается, если превышено число использований или объём памяти страницы.
+
+    Пример использования:
+        driver = driver_pool.acquire()
+        try:
+            driver.get("https://example.com")
+        finally:
+            driver_pool.release(driver)
+    """
+
+    def __init__(self, settings: DriverPoolSettings, factory=launch_driver):
+        self.settings = settings
+        self._factory = factory
+        self._idle: list = []
+        self._uses: dict[int, int] = {}
+        self._started = 0
+        self._warmed = False
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def acquire(self) -> webdriver.Chrome:
+        """
+        Выдаёт рабочий браузер из пула, при необходимости запуская новый.
+
+        Если все браузеры заняты и пул заполнен, ждёт освобождения не дольше
+        driver_acquire_timeout секунд, после чего выбрасывает TimeoutError.
+        """
+        self.warm_up()
+        deadline = time.monotonic() + self.settings.driver_acquire_timeout
+        while True:
+            with self._condition:
+                if self._closed:
+                    raise RuntimeError("Driver pool is closed")
+                while not self._idle and self._started >= self.settings.driver_pool_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._condition.wait(remaining):
+                        raise TimeoutError("No free browser in driver pool")
+                if self._idle:
+                    driver = self._idle.pop()
+                else:
+                    driver = None
+                    self._started += 1
+
+            if driver is None:
+                return self._start()
+            if self.is_healthy(driver):
+                return driver
+            self._discard(driver)
+
+    def release(self, driver: webdriver.Chrome, broken: bool = False) -> None:
+        """
+        Возвращает браузер в пул.
+
+        Браузер закрывается вместо возврата, если он помечен как сломанный,
+        исчерпал лимит использований или занимает слишком много памяти.
+        """
+        uses = self._uses.get(id(driver), 0) + 1
+        self._uses[id(driver)] = uses
+        if broken or self._closed or uses >= self.settings.driver_max_uses or self._too_heavy(driver):
+            self._discard(driver)
+            return
+        try:
+            driver.get("about:blank")
+        except Exception:
+            self._discard(driver)
+            return
+        with self._condition:
+            self._idle.append(driver)
+            self._condition.notify()
+
+    def close(self) -> None:
+        """Закрывает все свободные браузеры; занятые закроются при возврате."""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            self._discard(driver)
+
+    def warm_up(self) -> None:
+        """Заранее запускает driver_warm_size браузеров (один раз за время жизни пула)."""
+        with self._condition:
+            if self._warmed:
+                return
+            self._warmed = True
+            count = max(0, min(self.settings.driver_warm_size, self.settings.driver_pool_size) - self._started)
+            self._started += count
+        for _ in range(count):
+            try:
+                driver = self._start()
+            except Exception as err:
+                print(f'Exception while warming driver pool \n {err}')
+                continue
+            with self._condition:
+                self._idle.append(driver)
+                self._condition.notify()
+
+    def _start(self) -> webdriver.Chrome:
+        try:
+            driver = self._factory(self.settings)
+        except Exception:
+            with self._condition:
+                self._started -= 1
+                self._condition.notify()
+            raise
+        self._uses[id(driver)] = 0
+        return driver
+
+    def _discard(self, driver: webdriver.Chrome) -> None:
+        self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        with self._condition:
+            self._started -= 1
+            self._condition.notify()
+
+    @staticmethod
+    def is_healthy(driver: webdriver.Chrome) -> bool:
+        """Проверяет, что браузер отвечает на команды."""
+        try:
+            return driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _too_heavy(self, driver: webdriver.Chrome) -> bool:
+        try:
+            heap = driver.execute_script(
+                "return performance.memory ? performance.memory.usedJSHeapSize : 0"
+            )
+        except Exception:
+            return True
+        return (heap or 0) > self.settings.driver_max_heap_mb * 1024 * 1024
+
+
+# Изображения отключаются при запуске браузера, поэтому у поиска статей (без изображений)
+# и поиска картинок (с изображениями) свои пулы, каждый размером driver_pool_size
+driver_pool = DriverPool(DriverPoolSettings(), factory=functools.partial(launch_driver, images=False))
+image_driver_pool = DriverPool(DriverPoolSettings(), factory=functools.partial(launch_driver, images=True))
+atexit.register(driver_pool.close)
+atexit.register(image_driver_pool.close)
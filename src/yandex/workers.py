@@ -0,0 +1,374 @@
+import atexit
+import collections
+import functools
+import itertools
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future, as_completed
+from multiprocessing.connection import Connection, wait
+from typing import Any, Iterable, Iterator, NamedTuple, Optional
+
+from app import metrics
+from app.resilience import DeadlineExceeded, deadline, remaining
+from .config import DriverPoolSettings, ScrapeSettings
+
+KINDS = ("article", "picture")
+
+scrape_settings = ScrapeSettings()
+
+
+class ScrapeError(RuntimeError):
+    """Задача завершилась ошибкой в рабочем процессе или рабочий процесс упал."""
+
+
+class ScrapeTimeout(TimeoutError):
+    """Задача не уложилась в отведённое время, рабочий процесс перезапущен."""
+
+
+class ScrapeResult(NamedTuple):
+    """
+    Результат задачи поиска.
+
+    Атрибуты:
+        kind (str): Вид задачи: "article" или "picture".
+        query (str): Поисковый запрос.
+        ok (bool): True, если задача выполнена успешно.
+        value (Any): Текст статьи или изображение в байтах.
+        error (Optional[str]): Текст ошибки, если задача не выполнена.
+    """
+    kind: str
+    query: str
+    ok: bool
+    value: Any = None
+    error: Optional[str] = None
+
+
+class _Task(NamedTuple):
+    id: int
+    kind: str
+    query: str
+    timeout: float
+    future: Future
+
+
+class _Worker:
+    """Рабочий процесс и каналы связи с ним."""
+
+    def __init__(self, index: int, context):
+        self.index = index
+        # Pipe(duplex=False) возвращает пару (конец для чтения, конец для записи)
+        child_tasks, self.tasks = context.Pipe(duplex=False)
+        self.results, child_results = context.Pipe(duplex=False)
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_tasks, child_results),
+            name=f"scrape-{index}",
+            daemon=True
+        )
+        self.process.start()
+        child_tasks.close()
+        child_results.close()
+        self.task: Optional[_Task] = None
+        self.started_at = 0.0
+        self.completed = 0
+        # Процесс готов принимать задачи, когда загрузил модули и запустил браузер
+        self.ready = False
+
+    def kill(self) -> None:
+        """Завершает процесс вместе с браузерами, которые он запустил."""
+        try:
+            # Рабочий процесс создаёт свою группу, поэтому Chrome и ChromeDriver завершаются вместе с ним
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError, OSError):
+            self.process.kill()
+        self.process.join(5)
+        self.tasks.close()
+        self.results.close()
+
+
+def _run_task(kind: str, query: str) -> Any:
+    from . import get_article, get_picture
+    if kind == "article":
+        return get_article(query)
+    if kind == "picture":
+        return get_picture(query)
+    raise ValueError(f"Unknown scrape task {kind}")
+
+
+def _worker_main(tasks: Connection, results: Connection) -> None:
+    """
+    Цикл рабочего процесса: получает задачи, выполняет их и отправляет результаты.
+
+    Процесс владеет собственными браузерами (по одному в пулах поиска статей и картинок). Сначала он
+    сообщает о готовности (None), затем на каждую задачу (id, вид, запрос, таймаут)
+    отвечает (id, успех, результат или текст ошибки), пока не получит None.
+    """
+    os.setpgrp()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from . import warm_up
+    from .pool import driver_pool, image_driver_pool
+
+    for pool in (driver_pool, image_driver_pool):
+        pool.settings = DriverPoolSettings(driver_pool_size=1, driver_warm_size=1)
+    try:
+        warm_up()
+    except Exception as err:
+        print(f'Exception while warming scrape worker \n {err}')
+    results.send(None)
+    try:
+        while True:
+            try:
+                message = tasks.recv()
+            except EOFError:
+                return
+            if message is None:
+                return
+            task_id, kind, query, seconds = message
+            try:
+                with deadline(seconds):
+                    value = _run_task(kind, query)
+            except Exception as err:
+                results.send((task_id, False, f"{type(err).__name__}: {err}"))
+            else:
+                results.send((task_id, True, value))
+    finally:
+        driver_pool.close()
+        image_driver_pool.close()
+
+
+class ScrapePool:
+    """
+    Пул рабочих процессов для поиска статей и изображений.
+
+    Каждый процесс владеет своим браузером и выполняет по одной задаче за раз,
+    поэтому тяжёлая работа Selenium распределяется по ядрам и не блокирует
+    основной процесс, где продолжают работать генерация и рассылка.
+
+    Особенности:
+        - Задачи ждут в общей очереди и раздаются свободным процессам.
+        - Если задача не уложилась в свой таймаут, процесс вместе с браузером
+          убивается и запускается заново, а задача завершается ScrapeTimeout.
+        - Упавший процесс тоже перезапускается, его задача завершается ScrapeError.
+        - Результаты возвращаются через Future по мере готовности (imap_unordered).
+
+    Пример использования:
+        with ScrapePool(workers=4) as pool:
+            article = pool.submit("article", "Эрмитаж").result()
+    """
+
+    def __init__(self, workers: int = 2, task_timeout: float = 120, max_tasks: int = 50):
+        self.task_timeout = task_timeout
+        self.max_tasks = max_tasks
+        self._context = multiprocessing.get_context("spawn")
+        self._ids = itertools.count()
+        self._pending: collections.deque[_Task] = collections.deque()
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._wakeup = threading.Event()
+        self._workers = [_Worker(index, self._context) for index in range(max(1, workers))]
+        self._thread = threading.Thread(target=self._loop, name="scrape-pool", daemon=True)
+        self._thread.start()
+
+    def submit(self, kind: str, query: str, timeout: Optional[float] = None) -> Future:
+        """
+        Ставит задачу в очередь.
+
+        Параметры:
+            kind (str): "article" или "picture".
+            query (str): Поисковый запрос.
+            timeout (Optional[float]): Таймаут задачи, по умолчанию task_timeout.
+                Срок конвейера (app.resilience.deadline), если он ближе, тоже учитывается.
+
+        Возвращает:
+            Future: Результат задачи (текст статьи или изображение).
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Unknown scrape task {kind}")
+        if self._closed.is_set():
+            raise RuntimeError("Scrape pool is closed")
+        timeout = timeout or self.task_timeout
+        left = remaining()
+        if left is not None:
+            if left <= 0:
+                raise DeadlineExceeded(f"Deadline exceeded before scraping {kind}")
+            timeout = min(timeout, left)
+        future = Future()
+        with self._lock:
+            self._pending.append(_Task(next(self._ids), kind, query, timeout, future))
+        self._wakeup.set()
+        return future
+
+    def imap_unordered(self, tasks: Iterable[tuple[str, str]]) -> Iterator[ScrapeResult]:
+        """Выполняет задачи (вид, запрос) и возвращает результаты по мере их готовности."""
+        futures = {self.submit(kind, query): (kind, query) for kind, query in tasks}
+        for future in as_completed(futures):
+            kind, query = futures[future]
+            try:
+                yield ScrapeResult(kind, query, True, future.result())
+            except Exception as err:
+                yield ScrapeResult(kind, query, False, error=f"{type(err).__name__}: {err}")
+
+    def close(self) -> None:
+        """Останавливает рабочие процессы; невыполненные задачи завершаются ошибкой."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._wakeup.set()
+        self._thread.join(5)
+        with self._lock:
+            pending, self._pending = list(self._pending), collections.deque()
+        for worker in self._workers:
+            if worker.task is not None:
+                pending.append(worker.task)
+        for task in pending:
+            if not task.future.done():
+                task.future.set_exception(ScrapeError("Scrape pool is closed"))
+        for worker in self._workers:
+            try:
+                worker.tasks.send(None)
+            except OSError:
+                pass
+            worker.process.join(5)
+            worker.kill()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _loop(self) -> None:
+        while not self._closed.is_set():
+            try:
+                self._step()
+            except Exception as err:
+                print(f'Exception in scrape pool \n {err}')
+                time.sleep(0.1)
+
+    def _step(self) -> None:
+        self._dispatch()
+        connections = {
+            worker.results: worker for worker in self._workers
+            if worker.task is not None or not worker.ready
+        }
+        for connection in wait(list(connections), timeout=0.05) if connections else ():
+            self._receive(connections[connection])
+        if not connections:
+            self._wakeup.wait(0.5)
+            self._wakeup.clear()
+        self._check()
+
+    def _dispatch(self) -> None:
+        for worker in self._workers:
+            if worker.task is not None or not worker.ready:
+                continue
+            with self._lock:
+                task = None
+                while self._pending:
+                    task = self._pending.popleft()
+                    # Задачу, которую уже отменили, не отправляем; вернувшаяся в очередь уже запущена
+                    if task.future.running() or task.future.set_running_or_notify_cancel():
+                        break
+                    task = None
+            if task is None:
+                return
+            try:
+                worker.tasks.send((task.id, task.kind, task.query, task.timeout))
+            except OSError:
+                # Процесс неожиданно завершился — задача возвращается в начало очереди
+                with self._lock:
+                    self._pending.appendleft(task)
+                self._respawn(worker)
+                continue
+            worker.task = task
+            worker.started_at = time.monotonic()
+
+    def _receive(self, worker: _Worker) -> None:
+        try:
+            message = worker.results.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            worker.ready = True
+            return
+        task_id, ok, value = message
+        task, worker.task = worker.task, None
+        worker.completed += 1
+        if self.max_tasks and worker.completed >= self.max_tasks:
+            # Перезапуск после max_tasks задач не даёт накапливаться утечкам памяти браузера
+            self._respawn(worker)
+        if task is None or task.id != task_id:
+            return
+        if ok:
+            task.future.set_result(value)
+        else:
+            task.future.set_exception(ScrapeError(value))
+
+    def _check(self) -> None:
+        now = time.monotonic()
+        for worker in self._workers:
+            task = worker.task
+            if task is not None and now - worker.started_at > task.timeout:
+                print(f"Scrape worker {worker.index} timed out on {task.kind} {task.query!r}, restarting")
+                worker.task = None
+                self._respawn(worker)
+                task.future.set_exception(ScrapeTimeout(f"{task.kind} task timed out after {task.timeout:.0f}s"))
+            elif not worker.process.is_alive() and not worker.results.poll():
+                worker.task = None
+                self._respawn(worker)
+                if task is not None:
+                    task.future.set_exception(ScrapeError(f"Scrape worker {worker.index} exited"))
+
+    def _respawn(self, worker: _Worker) -> _Worker:
+        worker.kill()
+        fresh = _Worker(worker.index, self._context)
+        self._workers[self._workers.index(worker)] = fresh
+        return fresh
+
+
+@functools.cache
+def get_scrape_pool() -> Optional[ScrapePool]:
+    """Возвращает общий пул рабочих процессов, либо None, если scrape_workers равно 0."""
+    if scrape_settings.scrape_workers <= 0:
+        return None
+    pool = ScrapePool(
+        workers=scrape_settings.scrape_workers,
+        task_timeout=scrape_settings.scrape_task_timeout,
+        max_tasks=scrape_settings.scrape_worker_max_tasks
+    )
+    atexit.register(pool.close)
+    return pool
+
+
+def scrape(kind: str, query: str) -> Any:
+    """
+    Выполняет поиск статьи ("article") или изображения ("picture").
+
+    Если включён пул рабочих процессов (scrape_workers > 0), задача выполняется
+    в нём, иначе — в текущем процессе.
+    """
+    pool = get_scrape_pool()
+    if pool is None:
+        return _run_task(kind, query)
+    with metrics.span(f"scrape_{kind}"):
+        return pool.submit(kind, query).result()
+
+
+def scrape_article(query: str) -> str:
+    """Ищет статью через Яндекс (источник "yandex" в app.sources)."""
+    return scrape("article", query)
+
+
+def scrape_picture(query: str) -> bytes:
+    """Ищет изображение через Яндекс (источник "yandex" в app.sources)."""
+    return scrape("picture", query)
+
+
+def warm_up() -> None:
+    """Готовит HTTP-сессию и браузеры поиска, а также пул рабочих процессов, если он включён."""
+    from . import warm_up as warm_up_search
+    warm_up_search()
+    get_scrape_pool()